@@ -0,0 +1,2 @@
+-- AlterTable
+ALTER TABLE "Cancion" ADD COLUMN     "UrlAudio" TEXT;
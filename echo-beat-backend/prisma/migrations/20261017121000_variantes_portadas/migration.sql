@@ -0,0 +1,5 @@
+-- AlterTable
+ALTER TABLE "Cancion" ADD COLUMN     "PortadaVariantes" JSONB;
+
+-- AlterTable
+ALTER TABLE "Genero" ADD COLUMN     "FotoGeneroVariantes" JSONB;
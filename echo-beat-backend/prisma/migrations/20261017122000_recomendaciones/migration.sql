@@ -0,0 +1,31 @@
+-- CreateTable
+CREATE TABLE "CancionSimilar" (
+    "IdCancion" INTEGER NOT NULL,
+    "Posicion" INTEGER NOT NULL,
+    "IdSimilar" INTEGER NOT NULL,
+    "Puntuacion" DOUBLE PRECISION NOT NULL,
+
+    CONSTRAINT "CancionSimilar_pkey" PRIMARY KEY ("IdCancion","Posicion")
+);
+
+-- CreateTable
+CREATE TABLE "RecomendacionUsuario" (
+    "EmailUsuario" TEXT NOT NULL,
+    "Posicion" INTEGER NOT NULL,
+    "IdCancion" INTEGER NOT NULL,
+    "Puntuacion" DOUBLE PRECISION NOT NULL,
+
+    CONSTRAINT "RecomendacionUsuario_pkey" PRIMARY KEY ("EmailUsuario","Posicion")
+);
+
+-- AddForeignKey
+ALTER TABLE "CancionSimilar" ADD CONSTRAINT "CancionSimilar_IdCancion_fkey" FOREIGN KEY ("IdCancion") REFERENCES "Cancion"("Id") ON DELETE CASCADE ON UPDATE CASCADE;
+
+-- AddForeignKey
+ALTER TABLE "CancionSimilar" ADD CONSTRAINT "CancionSimilar_IdSimilar_fkey" FOREIGN KEY ("IdSimilar") REFERENCES "Cancion"("Id") ON DELETE CASCADE ON UPDATE CASCADE;
+
+-- AddForeignKey
+ALTER TABLE "RecomendacionUsuario" ADD CONSTRAINT "RecomendacionUsuario_EmailUsuario_fkey" FOREIGN KEY ("EmailUsuario") REFERENCES "Usuario"("Email") ON DELETE CASCADE ON UPDATE CASCADE;
+
+-- AddForeignKey
+ALTER TABLE "RecomendacionUsuario" ADD CONSTRAINT "RecomendacionUsuario_IdCancion_fkey" FOREIGN KEY ("IdCancion") REFERENCES "Cancion"("Id") ON DELETE CASCADE ON UPDATE CASCADE;
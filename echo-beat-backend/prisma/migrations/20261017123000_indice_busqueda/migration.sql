@@ -0,0 +1,25 @@
+-- CreateTable
+CREATE TABLE "EntradaBusqueda" (
+    "Id" SERIAL NOT NULL,
+    "Tipo" TEXT NOT NULL,
+    "IdEntidad" TEXT NOT NULL,
+    "Nombre" TEXT NOT NULL,
+    "Texto" TEXT NOT NULL,
+    "Peso" DOUBLE PRECISION NOT NULL DEFAULT 0,
+
+    CONSTRAINT "EntradaBusqueda_pkey" PRIMARY KEY ("Id")
+);
+
+-- CreateTable
+CREATE TABLE "TerminoBusqueda" (
+    "Termino" TEXT NOT NULL,
+    "IdEntrada" INTEGER NOT NULL,
+
+    CONSTRAINT "TerminoBusqueda_pkey" PRIMARY KEY ("Termino","IdEntrada")
+);
+
+-- CreateIndex
+CREATE UNIQUE INDEX "EntradaBusqueda_Tipo_IdEntidad_key" ON "EntradaBusqueda"("Tipo", "IdEntidad");
+
+-- AddForeignKey
+ALTER TABLE "TerminoBusqueda" ADD CONSTRAINT "TerminoBusqueda_IdEntrada_fkey" FOREIGN KEY ("IdEntrada") REFERENCES "EntradaBusqueda"("Id") ON DELETE CASCADE ON UPDATE CASCADE;
@@ -0,0 +1,81 @@
+-- CreateTable
+CREATE TABLE "CambioContador" (
+    "Id" BIGSERIAL NOT NULL,
+    "Transaccion" BIGINT NOT NULL DEFAULT txid_current(),
+    "Contador" TEXT NOT NULL,
+    "IdEntidad" INTEGER NOT NULL,
+    "Delta" INTEGER NOT NULL,
+
+    CONSTRAINT "CambioContador_pkey" PRIMARY KEY ("Id")
+);
+
+-- CreateIndex
+CREATE INDEX "CambioContador_Transaccion_idx" ON "CambioContador"("Transaccion");
+
+-- Los contadores ya no se actualizan en cada petición: cada cambio que les afecta se apunta aquí y
+-- poblado/agregarContadores.py los aplica por lotes. Las reproducciones son un histórico, así que
+-- borrar una fila de CancionEscuchada no las resta; los favoritos y los likes sí.
+
+-- CreateFunction
+CREATE FUNCTION "registrar_cambio_reproducciones"() RETURNS trigger AS $$
+DECLARE
+    delta INTEGER := NEW."NumReproducciones";
+BEGIN
+    IF TG_OP = 'UPDATE' THEN
+        delta := delta - OLD."NumReproducciones";
+    END IF;
+    IF delta <> 0 THEN
+        INSERT INTO "CambioContador" ("Contador", "IdEntidad", "Delta") VALUES ('reproducciones', NEW."IdCancion", delta);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- CreateFunction
+CREATE FUNCTION "registrar_cambio_favoritos"() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO "CambioContador" ("Contador", "IdEntidad", "Delta") VALUES ('favoritos', NEW."IdCancion", 1);
+    ELSE
+        INSERT INTO "CambioContador" ("Contador", "IdEntidad", "Delta") VALUES ('favoritos', OLD."IdCancion", -1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- CreateFunction
+CREATE FUNCTION "registrar_cambio_likes"() RETURNS trigger AS $$
+DECLARE
+    delta INTEGER := 0;
+    id_lista INTEGER;
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        id_lista := OLD."IdLista";
+        IF OLD."tieneLike" THEN
+            delta := delta - 1;
+        END IF;
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        id_lista := NEW."IdLista";
+        IF NEW."tieneLike" THEN
+            delta := delta + 1;
+        END IF;
+    END IF;
+    IF delta <> 0 THEN
+        INSERT INTO "CambioContador" ("Contador", "IdEntidad", "Delta") VALUES ('likes', id_lista, delta);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- CreateTrigger
+CREATE TRIGGER "CancionEscuchada_cambio_contador" AFTER INSERT OR UPDATE OF "NumReproducciones" ON "CancionEscuchada"
+FOR EACH ROW EXECUTE FUNCTION "registrar_cambio_reproducciones"();
+
+-- CreateTrigger
+CREATE TRIGGER "CancionGuardada_cambio_contador" AFTER INSERT OR DELETE ON "CancionGuardada"
+FOR EACH ROW EXECUTE FUNCTION "registrar_cambio_favoritos"();
+
+-- CreateTrigger
+CREATE TRIGGER "Like_cambio_contador" AFTER INSERT OR UPDATE OF "tieneLike" OR DELETE ON "Like"
+FOR EACH ROW EXECUTE FUNCTION "registrar_cambio_likes"();
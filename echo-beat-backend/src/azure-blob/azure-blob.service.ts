@@ -24,12 +24,28 @@ export class AzureBlobService {
  *
  * @param containerName - Nombre del contenedor en Azure Blob Storage.
  * @param blobName - Nombre del blob (archivo) a descargar.
+ * @param offset - (Opcional) Byte desde el que empezar a leer el blob.
  * @returns Un stream legible del blob solicitado.
  */
-  async getStream(containerName: string, blobName: string) {
+  async getStream(containerName: string, blobName: string, offset = 0) {
     const containerClient = this.blobServiceClient.getContainerClient(containerName);
     const blobClient = containerClient.getBlobClient(blobName);
-    const response = await blobClient.download();
+    const response = await blobClient.download(offset);
     return response.readableStreamBody;
   }
+
+  /**
+ * Descarga un blob completo en memoria. Pensado para blobs pequeños, como los índices de las canciones.
+ *
+ * @param containerName - Nombre del contenedor en Azure Blob Storage.
+ * @param blobName - Nombre del blob (archivo) a descargar.
+ * @returns El contenido del blob, o null si no existe.
+ */
+  async getBuffer(containerName: string, blobName: string): Promise<Buffer | null> {
+    const blobClient = this.blobServiceClient.getContainerClient(containerName).getBlobClient(blobName);
+    if (!(await blobClient.exists())) {
+      return null;
+    }
+    return blobClient.downloadToBuffer();
+  }
 }
\ No newline at end of file
@@ -7,7 +7,7 @@ export class CancionService {
 
   /**
  * Añade una canción a los favoritos del usuario.
- * Incrementa el contador de favoritos de la canción.
+ * El contador de favoritos de la canción lo actualiza la agregación periódica de contadores.
  *
  * @param email - Correo electrónico del usuario.
  * @param songId - ID de la canción a guardar.
@@ -22,15 +22,6 @@ export class CancionService {
         },
       });
 
-      await this.prisma.cancion.update({
-        where: { Id: songId },
-        data: {
-          NumFavoritos: {
-            increment: 1,
-          },
-        },
-      });
-
       return result;
     } catch (error) {
       throw new BadRequestException('Error al guardar la canción.');
@@ -39,7 +30,7 @@ export class CancionService {
 
   /**
    * Elimina una canción de los favoritos del usuario.
-   * Decrementa el contador de favoritos de la canción.
+   * El contador de favoritos de la canción lo actualiza la agregación periódica de contadores.
    *
    * @param email - Correo electrónico del usuario.
    * @param songId - ID de la canción a eliminar de favoritos.
@@ -56,15 +47,6 @@ export class CancionService {
         },
       });
 
-      await this.prisma.cancion.update({
-        where: { Id: songId },
-        data: {
-          NumFavoritos: {
-            decrement: 1,
-          },
-        },
-      });
-
       return result;
     } catch (error) {
       throw new BadRequestException('Error al eliminar la canción de favoritos.');
@@ -807,6 +807,24 @@ export class PlaylistsService {
     return songName ? songName.Nombre : null;
   }
 
+  /**
+   * Obtiene el nombre del blob de audio de una canción.
+   * @param songId ID de la canción.
+   * @returns Nombre del blob (último segmento de `UrlAudio`) o null si la canción no tiene `UrlAudio`.
+   */
+  async getSongAudioBlob(songId: number): Promise<string | null> {
+
+    const song = await this.prisma.cancion.findUnique({
+      where: { Id: songId },
+      select: { UrlAudio: true },
+    });
+
+    if (!song?.UrlAudio) {
+      return null;
+    }
+    return decodeURIComponent(song.UrlAudio.split('/').pop() ?? '') || null;
+  }
+
   /**
  * Obtiene la duración de una canción.
  * @param songId ID de la canción.
@@ -880,11 +898,6 @@ export class PlaylistsService {
       },
     });
 
-    await this.prisma.lista.update({
-      where: { Id: playlistId },
-      data: { NumLikes: { increment: 1 } },
-    });
-
     return { message: 'Like agregado a la lista' };
   }
 
@@ -925,11 +938,6 @@ export class PlaylistsService {
       where: { EmailUsuario_IdLista: { EmailUsuario: email, IdLista: playlistId } },
     });
 
-    await this.prisma.lista.update({
-      where: { Id: playlistId },
-      data: { NumLikes: { decrement: 1 } },
-    });
-
     return { message: 'Like quitado de la lista' };
   }
 
@@ -966,48 +974,23 @@ export class PlaylistsService {
   }
 
   /**
-   * Incrementa el contador de reproducciones para canción, álbum y autores.
+   * Registra una reproducción de la canción por parte del usuario.
+   * Los contadores de reproducciones de la canción, su álbum y sus autores los actualiza
+   * la agregación periódica de contadores a partir de CancionEscuchada.
+   * @param email Correo del usuario.
    * @param songIdQuizas ID de la canción.
    * @returns Mensaje de éxito.
    */
-  async incrementSongAlbumAndAuthorPlays(songIdQuizas: number) {
+  async recordSongPlay(email: string, songIdQuizas: number) {
     const songId = typeof songIdQuizas === 'string' ? parseInt(songIdQuizas, 10) : songIdQuizas;
 
-    const song = await this.prisma.cancion.update({
-      where: { Id: songId },
-      data: { NumReproducciones: { increment: 1 } },
-      select: { Id: true },
-    });
-    if (!song) throw new NotFoundException('Canción no encontrada');
-
-    const album = await this.prisma.posicionCancion.findMany({
-      where: {
-        IdCancion: songId,
-        lista: { TipoLista: 'Album' },
-      },
-      select: { IdLista: true },
+    await this.prisma.cancionEscuchada.upsert({
+      where: { EmailUsuario_IdCancion: { EmailUsuario: email, IdCancion: songId } },
+      update: { NumReproducciones: { increment: 1 } },
+      create: { EmailUsuario: email, IdCancion: songId, NumReproducciones: 1 },
     });
-    if (!song) throw new NotFoundException('Canción no encontrada');
-
-    await this.prisma.album.update({
-      where: { Id: album[0].IdLista },
-      data: { NumReproducciones: { increment: 1 } },
-      select: { Id: true },
-    });
-    if (!song) throw new NotFoundException('Canción no encontrada');
-
-    const authors = await this.prisma.autorCancion.findMany({
-      where: { IdCancion: song.Id },
-      select: { NombreArtista: true },
-    });
-    for (const autor of authors) {
-      await this.prisma.artista.updateMany({
-        where: { Nombre: autor.NombreArtista },
-        data: { NumOyentesTotales: { increment: 1 } },
-      });
-    }
 
-    return { message: 'Reproducciones actualizadas correctamente' };
+    return { message: 'Reproducción registrada correctamente' };
   }
 
   /**
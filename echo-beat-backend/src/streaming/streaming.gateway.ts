@@ -24,6 +24,11 @@ export class StreamingGateway {
  */
   private readonly CHUNK_SIZE = 64 * 1024; // 64KB
 
+  /**
+ * Firma de los índices de búsqueda que genera el poblado (`<blob>.idx`).
+ */
+  private readonly INDEX_SIGNATURE = 'EBIX';
+
   constructor(
     private azureBlobService: AzureBlobService,
     private playlistsService: PlaylistsService,
@@ -40,13 +45,37 @@ export class StreamingGateway {
     console.log('Cliente conectado:', client.id);
   }
 
+  /**
+   * Calcula el byte desde el que hay que leer una canción para empezar en `startTime`,
+   * usando el índice tiempo → byte que se guarda junto al blob (`<blob>.idx`).
+   * Formato (little-endian): firma "EBIX", versión (uint8), intervalo en ms (uint16),
+   * duración en ms, bitrate y número de entradas (uint32), y después un offset uint32 por intervalo.
+   * @param containerName Contenedor de la canción
+   * @param blobName Nombre del blob de la canción
+   * @param startTime Segundo en el que se quiere empezar
+   * @returns Byte de inicio, o 0 si la canción no tiene índice
+   */
+  private async getSeekOffset(containerName: string, blobName: string, startTime: number): Promise<number> {
+    const index = await this.azureBlobService.getBuffer(containerName, `${blobName}.idx`);
+    if (!index || index.length < 19 || index.toString('ascii', 0, 4) !== this.INDEX_SIGNATURE) {
+      return 0;
+    }
+    const intervalMs = index.readUInt16LE(5);
+    const entries = index.readUInt32LE(15);
+    if (!intervalMs || !entries) {
+      return 0;
+    }
+    const entry = Math.min(Math.floor((startTime * 1000) / intervalMs), entries - 1);
+    return index.readUInt32LE(19 + entry * 4);
+  }
+
   /**
    * Maneja el evento 'startStream', encargado de transmitir una canción en chunks.
    * @param client Cliente que solicita el streaming
-   * @param payload Objeto que contiene el `songId` y el `userId`
+   * @param payload Objeto que contiene el `songId`, el `userId` y, opcionalmente, el segundo `startTime` desde el que empezar
    */
   @SubscribeMessage('startStream')
-  async handleStartSong(client: Socket, payload: { songId: number, userId: string }) {
+  async handleStartSong(client: Socket, payload: { songId: number, userId: string, startTime?: number }) {
     console.log('Evento startStream recibido para canción:', payload.songId);
     try {
       if (!payload.songId) {
@@ -63,11 +92,17 @@ export class StreamingGateway {
         client.emit('error', 'No se encontró la canción solicitada');
         return;
       }
+      // Las canciones nuevas se guardan con un nombre derivado de su contenido (UrlAudio);
+      // las antiguas siguen usando el nombre de la canción
       const formattedSongName = songName.replace(/ /g, '_');
+      const blobName = (await this.playlistsService.getSongAudioBlob(payload.songId)) ?? `${formattedSongName}.mp3`;
 
-      console.log('Solicitando stream de Azure para:', formattedSongName);
+      console.log('Solicitando stream de Azure para:', blobName);
       const containerName = 'cancionespsoft';
-      const nodeStream = await this.azureBlobService.getStream(containerName, `${formattedSongName}.mp3`);
+      const offset = payload.startTime && payload.startTime > 0
+        ? await this.getSeekOffset(containerName, blobName, payload.startTime)
+        : 0;
+      const nodeStream = await this.azureBlobService.getStream(containerName, blobName, offset);
 
       if (!nodeStream) {
         console.log('No se pudo obtener el stream de Azure');
@@ -98,7 +133,9 @@ export class StreamingGateway {
       console.error('Error al procesar la solicitud de streaming:', error);
       client.emit('error', 'Error al transmitir la canción');
     }
-    this.playlistsService.incrementSongAlbumAndAuthorPlays(payload.songId);
+    this.playlistsService.recordSongPlay(payload.userId, payload.songId).catch((error) => {
+      console.error('Error al registrar la reproducción:', error);
+    });
     console.log(`se guarda la ulitma cancion`);
     this.estadoUsuarioService.storeLastSong(payload.userId, payload.songId);
   }
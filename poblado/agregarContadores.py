@@ -0,0 +1,139 @@
+import argparse
+import time
+from conexiones import cargar_entorno, get_db_connection
+# Al ejecutarlo directamente, el .env tiene que estar cargado antes de importar los módulos que
+# leen sus opciones (POBLADO_*, JAMENDO_*)
+if __name__ == "__main__":
+    cargar_entorno()
+from metricas import contar, cronometro, emitir_resumen, log
+
+# Agregación periódica de los contadores de popularidad.
+# El backend no actualiza los contadores al escuchar una canción, guardarla en favoritos o dar like a
+# una lista: solo escribe en CancionEscuchada, CancionGuardada y Like, y unos disparadores (migración
+# 20261017124000_agregacion_contadores) apuntan cada cambio en CambioContador con el id de su
+# transacción. Este trabajo suma esos cambios y los aplica con una sentencia por tabla:
+#   reproducciones  Cancion.NumReproducciones, Album.NumReproducciones y Artista.NumOyentesTotales
+#   favoritos       Cancion.NumFavoritos
+#   likes           Lista.NumLikes
+# La marca de agua es la transacción abierta más antigua: todas las anteriores han terminado, así que
+# sus cambios ya no pueden aparecer más tarde. Se consumen (y borran) los cambios de esas transacciones
+# y los demás esperan a la siguiente ejecución, de modo que cada cambio se cuenta exactamente una vez.
+# Las cargas masivas que ya escriben los contadores finales desactivan esos disparadores mientras
+# cargan (generarCatalogo.py, DISPARADORES_CONTADORES); si no, este trabajo volvería a sumarlos.
+#
+#   python agregarContadores.py                  una ejecución
+#   python agregarContadores.py --intervalo 60   cada minuto, hasta que se interrumpa
+
+# 🔹 Aplicar los cambios pendientes; devuelve cuántos contadores de entidades han cambiado
+def agregar_contadores():
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            # Dos ejecuciones a la vez consumirían los mismos cambios en transacciones distintas
+            cursor.execute("SELECT pg_advisory_xact_lock(hashtext('agregacion_contadores'))")
+            cursor.execute("SELECT txid_snapshot_xmin(txid_current_snapshot())")
+            marca = cursor.fetchone()[0]
+
+            cursor.execute("""
+                CREATE TEMP TABLE cambios ("Contador" text, "IdEntidad" integer, delta bigint) ON COMMIT DROP
+            """)
+            with cronometro("contadores.consumir"):
+                cursor.execute("""
+                    WITH consumidos AS (
+                        DELETE FROM "CambioContador" WHERE "Transaccion" < %s
+                        RETURNING "Contador", "IdEntidad", "Delta"
+                    )
+                    INSERT INTO cambios
+                    SELECT "Contador", "IdEntidad", SUM("Delta") FROM consumidos
+                    GROUP BY 1, 2
+                    HAVING SUM("Delta") <> 0
+                """, (marca,))
+                cursor.execute("SELECT COUNT(*) FROM cambios")
+                entidades = cursor.fetchone()[0]
+
+            if entidades:
+                with cronometro("contadores.canciones"):
+                    cursor.execute("""
+                        UPDATE "Cancion" c
+                        SET "NumReproducciones" = c."NumReproducciones" + t.reproducciones,
+                            "NumFavoritos" = c."NumFavoritos" + t.favoritos
+                        FROM (
+                            SELECT "IdEntidad",
+                                   COALESCE(SUM(delta) FILTER (WHERE "Contador" = 'reproducciones'), 0) AS reproducciones,
+                                   COALESCE(SUM(delta) FILTER (WHERE "Contador" = 'favoritos'), 0) AS favoritos
+                            FROM cambios
+                            WHERE "Contador" IN ('reproducciones', 'favoritos')
+                            GROUP BY "IdEntidad"
+                        ) t
+                        WHERE c."Id" = t."IdEntidad"
+                    """)
+                    contar("contadores.canciones", cursor.rowcount)
+
+                with cronometro("contadores.albumes"):
+                    cursor.execute("""
+                        UPDATE "Album" a
+                        SET "NumReproducciones" = a."NumReproducciones" + t.delta
+                        FROM (
+                            SELECT pc."IdLista", SUM(c.delta) AS delta
+                            FROM cambios c
+                            JOIN "PosicionCancion" pc ON pc."IdCancion" = c."IdEntidad"
+                            WHERE c."Contador" = 'reproducciones'
+                            GROUP BY pc."IdLista"
+                        ) t
+                        WHERE a."Id" = t."IdLista"
+                    """)
+                    contar("contadores.albumes", cursor.rowcount)
+
+                with cronometro("contadores.artistas"):
+                    cursor.execute("""
+                        UPDATE "Artista" ar
+                        SET "NumOyentesTotales" = ar."NumOyentesTotales" + t.delta
+                        FROM (
+                            SELECT ac."NombreArtista", SUM(c.delta) AS delta
+                            FROM cambios c
+                            JOIN "AutorCancion" ac ON ac."IdCancion" = c."IdEntidad"
+                            WHERE c."Contador" = 'reproducciones'
+                            GROUP BY ac."NombreArtista"
+                        ) t
+                        WHERE ar."Nombre" = t."NombreArtista"
+                    """)
+                    contar("contadores.artistas", cursor.rowcount)
+
+                with cronometro("contadores.listas"):
+                    cursor.execute("""
+                        UPDATE "Lista" l
+                        SET "NumLikes" = l."NumLikes" + c.delta
+                        FROM cambios c
+                        WHERE c."Contador" = 'likes' AND l."Id" = c."IdEntidad"
+                    """)
+                    contar("contadores.listas", cursor.rowcount)
+        conn.commit()
+
+    contar("contadores.entidades", entidades)
+    log(f"✅ Contadores agregados hasta la transacción {marca}: {entidades} entidades con cambios")
+    return entidades
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Agrega los contadores de reproducciones, favoritos y likes")
+    parser.add_argument("--intervalo", type=float, help="segundos entre ejecuciones (por defecto, una sola)")
+    args = parser.parse_args(argv)
+
+    try:
+        while True:
+            inicio = time.monotonic()
+            try:
+                agregar_contadores()
+            except Exception as e:
+                if args.intervalo is None:
+                    raise
+                # En modo periódico un fallo no detiene el trabajo: los cambios siguen pendientes para la próxima
+                print(f"❌ Error al agregar los contadores: {str(e)}")
+            if args.intervalo is None:
+                break
+            time.sleep(max(0, args.intervalo - (time.monotonic() - inicio)))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        emitir_resumen()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from almacenamiento import get_almacen
+from metricas import log, sumar_bytes
+
+# Manifiesto local con lo que ya se ha subido, para no repetir descargas ni subidas entre ejecuciones
+RUTA_MANIFIESTO = os.getenv("POBLADO_MANIFIESTO", os.path.join(os.path.dirname(os.path.abspath(__file__)), "manifiesto_blobs.sqlite3"))
+
+TAMANO_LECTURA = 1024 * 1024
+
+# 🔹 Manifiesto de blobs direccionados por contenido
+# Guarda qué blobs existen ya en cada contenedor y de qué origen (URL de Jamendo o fichero
+# local) salió cada uno. Se puede usar desde varios hilos.
+class ManifiestoBlobs:
+    def __init__(self, ruta=RUTA_MANIFIESTO):
+        self._conn = sqlite3.connect(ruta, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("CREATE TABLE IF NOT EXISTS blobs (contenedor TEXT, blob TEXT, PRIMARY KEY (contenedor, blob))")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS origenes (contenedor TEXT, origen TEXT, blob TEXT, PRIMARY KEY (contenedor, origen))")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS audios (contenedor TEXT, blob TEXT, duracion REAL, bitrate INTEGER, PRIMARY KEY (contenedor, blob))")
+
+    def blob_de_origen(self, contenedor, origen):
+        with self._lock:
+            fila = self._conn.execute("SELECT blob FROM origenes WHERE contenedor = ? AND origen = ?", (contenedor, origen)).fetchone()
+        return fila[0] if fila else None
+
+    def existe(self, contenedor, blob):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM blobs WHERE contenedor = ? AND blob = ?", (contenedor, blob)).fetchone() is not None
+
+    def registrar(self, contenedor, blob, origen=None):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR IGNORE INTO blobs VALUES (?, ?)", (contenedor, blob))
+            if origen is not None:
+                self._conn.execute("INSERT OR REPLACE INTO origenes VALUES (?, ?, ?)", (contenedor, origen, blob))
+
+    # Duración y bitrate medidos de un audio, para no tener que volver a descargarlo
+    def guardar_medidas(self, contenedor, blob, duracion, bitrate):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO audios VALUES (?, ?, ?, ?)", (contenedor, blob, duracion, bitrate))
+
+    def medidas(self, contenedor, blob):
+        with self._lock:
+            fila = self._conn.execute("SELECT duracion, bitrate FROM audios WHERE contenedor = ? AND blob = ?", (contenedor, blob)).fetchone()
+        return fila if fila else (None, None)
+
+_manifiesto = None
+_lock_manifiesto = threading.Lock()
+
+def get_manifiesto():
+    global _manifiesto
+    with _lock_manifiesto:
+        if _manifiesto is None:
+            _manifiesto = ManifiestoBlobs()
+    return _manifiesto
+
+# 🔹 Nombre del blob a partir del contenido: el SHA-256 en hexadecimal más la extensión
+def nombre_por_contenido(digest, extension):
+    return f"{digest}{extension}"
+
+def hash_de_fichero(ruta_archivo):
+    sha = hashlib.sha256()
+    with open(ruta_archivo, "rb") as f:
+        for trozo in iter(lambda: f.read(TAMANO_LECTURA), b""):
+            sha.update(trozo)
+    return sha.hexdigest()
+
+# 🔹 Comprueba si un blob ya está en el contenedor, mirando primero el manifiesto local
+def blob_existe(contenedor, blob):
+    manifiesto = get_manifiesto()
+    if manifiesto.existe(contenedor, blob):
+        return True
+    if get_almacen().existe(contenedor, blob):
+        manifiesto.registrar(contenedor, blob)
+        return True
+    return False
+
+# 🔹 Función para subir un fichero local con su hash como nombre, saltándose la subida si ya está
+def subir_fichero_por_contenido(contenedor, ruta_archivo, content_type=None):
+    extension = os.path.splitext(ruta_archivo)[1].lower()
+    nombre_blob = nombre_por_contenido(hash_de_fichero(ruta_archivo), extension)
+
+    if blob_existe(contenedor, nombre_blob):
+        log(f"⏭️ Ya estaba en el almacén: {os.path.basename(ruta_archivo)}")
+    else:
+        with open(ruta_archivo, "rb") as data:
+            get_almacen().subir(contenedor, nombre_blob, data, content_type)
+        sumar_bytes("blobs.subidos", os.path.getsize(ruta_archivo))
+        get_manifiesto().registrar(contenedor, nombre_blob)
+        log(f"✅ Fichero subido al almacén: {os.path.basename(ruta_archivo)}")
+
+    return get_almacen().url(contenedor, nombre_blob)
+
+# 🔹 Igual que subir_fichero_por_contenido, pero con datos que ya están en memoria
+def subir_datos_por_contenido(contenedor, datos, extension, content_type=None):
+    nombre_blob = nombre_por_contenido(hashlib.sha256(datos).hexdigest(), extension)
+
+    if not blob_existe(contenedor, nombre_blob):
+        get_almacen().subir(contenedor, nombre_blob, datos, content_type)
+        sumar_bytes("blobs.subidos", len(datos))
+        get_manifiesto().registrar(contenedor, nombre_blob)
+
+    return get_almacen().url(contenedor, nombre_blob)
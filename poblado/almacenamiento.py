@@ -0,0 +1,165 @@
+import base64
+import itertools
+import mimetypes
+import mmap
+import os
+import shutil
+import tempfile
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from functools import lru_cache
+from azure.core.exceptions import ResourceExistsError
+from azure.storage.blob import BlobBlock, ContentSettings
+from conexiones import cargar_entorno, get_blob_service_client, get_container_client
+
+# Almacenes de blobs donde el poblado deja audios, índices y portadas. Se elige con POBLADO_ALMACEN:
+#   azure   Azure Blob Storage (o Azurite) con AZURE_STORAGE_CONNECTION_STRING, por defecto
+#   local   un directorio por contenedor en POBLADO_RUTA_ALMACEN; servidorAlmacen.py lo sirve por HTTP
+#           con las mismas rutas que Azure (<cuenta>/<contenedor>/<blob>), así que las URLs guardadas en la
+#           base de datos y el AzureBlobService del backend funcionan igual apuntando a POBLADO_URL_ALMACEN
+# El manifiesto de blobs recuerda lo que ya existe en cada contenedor sin distinguir de almacén: al
+# cambiar de almacén hay que usar otro POBLADO_MANIFIESTO.
+
+# Tamaño de cada bloque que se sube a Azure y número máximo de bloques subiéndose a la vez.
+# La memoria usada por una subida es como mucho TAMANO_BLOQUE * (BLOQUES_EN_VUELO + 1),
+# independientemente de lo que ocupe el fichero.
+TAMANO_BLOQUE = 4 * 1024 * 1024
+BLOQUES_EN_VUELO = 4
+
+RUTA_LOCAL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "almacen_local")
+# Misma cuenta y puerto que Azurite, para poder cambiar uno por otro sin tocar la cadena de conexión
+URL_LOCAL = "http://127.0.0.1:10000/devstoreaccount1"
+
+def id_bloque(indice):
+    return base64.b64encode(f"{indice:08d}".encode()).decode()
+
+# 🔹 Azure Blob Storage
+class AlmacenAzure:
+    def existe(self, contenedor, blob):
+        return get_container_client(contenedor).get_blob_client(blob).exists()
+
+    def crear_contenedor(self, contenedor):
+        try:
+            get_blob_service_client().create_container(contenedor)
+        except ResourceExistsError:
+            pass
+
+    # datos puede ser bytes o un fichero abierto; los ficheros que no caben en un bloque se suben por
+    # bloques preparados (stage_block) en paralelo
+    def subir(self, contenedor, blob, datos, content_type=None, tamano_bloque=TAMANO_BLOQUE, bloques_en_vuelo=BLOQUES_EN_VUELO):
+        blob_client = get_container_client(contenedor).get_blob_client(blob)
+        ajustes = ContentSettings(content_type=content_type)
+        if isinstance(datos, (bytes, bytearray, memoryview)):
+            blob_client.upload_blob(datos, overwrite=True, content_settings=ajustes)
+            return
+
+        bloques = iter(lambda: datos.read(tamano_bloque), b"")
+        primero = next(bloques, b"")
+        segundo = next(bloques, None)
+        if segundo is None:
+            # Lo que cabe en un bloque se sube con una sola petición
+            blob_client.upload_blob(primero, overwrite=True, content_settings=ajustes)
+        else:
+            self.subir_bloques(blob_client, itertools.chain([primero, segundo], bloques), ajustes, bloques_en_vuelo)
+
+    def subir_bloques(self, blob_client, bloques, ajustes, bloques_en_vuelo):
+        lista_bloques = []
+        with ThreadPoolExecutor(max_workers=bloques_en_vuelo) as executor:
+            en_vuelo = set()
+            for indice, bloque in enumerate(bloques):
+                # Si ya hay demasiados bloques subiéndose, esperar a que termine alguno
+                if len(en_vuelo) >= bloques_en_vuelo:
+                    terminados, en_vuelo = wait(en_vuelo, return_when=FIRST_COMPLETED)
+                    for futuro in terminados:
+                        futuro.result()
+
+                block_id = id_bloque(indice)
+                lista_bloques.append(BlobBlock(block_id=block_id))
+                en_vuelo.add(executor.submit(blob_client.stage_block, block_id, bloque))
+
+            for futuro in en_vuelo:
+                futuro.result()
+
+        blob_client.commit_block_list(lista_bloques, content_settings=ajustes)
+
+    # Bytes [inicio, fin) del blob (hasta el final si fin es None)
+    def leer(self, contenedor, blob, inicio=0, fin=None):
+        longitud = fin - inicio if fin is not None else None
+        return get_container_client(contenedor).get_blob_client(blob).download_blob(offset=inicio, length=longitud).readall()
+
+    # La URL la construye el SDK a partir de la cadena de conexión (también la de Azurite)
+    def url(self, contenedor, blob):
+        return get_container_client(contenedor).get_blob_client(blob).url
+
+# 🔹 Sistema de ficheros local: raiz/<contenedor>/<blob>
+class AlmacenLocal:
+    def __init__(self, raiz=RUTA_LOCAL, url_base=URL_LOCAL):
+        self.raiz = os.path.abspath(raiz)
+        self.url_base = url_base.rstrip("/")
+
+    # Ruta del blob, sin dejar que un nombre con .. o una ruta absoluta se salga del contenedor
+    def ruta(self, contenedor, blob):
+        directorio = os.path.join(self.raiz, contenedor)
+        ruta = os.path.normpath(os.path.join(directorio, blob))
+        if not contenedor or "/" in contenedor or contenedor.startswith(".") or not ruta.startswith(directorio + os.sep):
+            raise Exception(f"Nombre de blob no válido: {contenedor}/{blob}")
+        return ruta
+
+    def existe(self, contenedor, blob):
+        return os.path.isfile(self.ruta(contenedor, blob))
+
+    def crear_contenedor(self, contenedor):
+        os.makedirs(os.path.join(self.raiz, contenedor), exist_ok=True)
+
+    # Se escribe en un temporal y se renombra: quien lea el blob a la vez ve el contenido anterior o el
+    # nuevo completo, nunca uno a medias. Los temporales van a raiz/.temporales, en el mismo sistema de
+    # ficheros (os.replace es atómico) pero fuera de los contenedores, así que nunca se sirven como
+    # blobs. El tipo de contenido se deduce de la extensión al servirlo.
+    def subir(self, contenedor, blob, datos, content_type=None, tamano_bloque=TAMANO_BLOQUE, bloques_en_vuelo=BLOQUES_EN_VUELO):
+        ruta = self.ruta(contenedor, blob)
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        temporales = os.path.join(self.raiz, ".temporales")
+        os.makedirs(temporales, exist_ok=True)
+        descriptor, temporal = tempfile.mkstemp(dir=temporales, prefix="subiendo-")
+        try:
+            with os.fdopen(descriptor, "wb") as f:
+                if isinstance(datos, (bytes, bytearray, memoryview)):
+                    f.write(datos)
+                else:
+                    shutil.copyfileobj(datos, f, tamano_bloque)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporal, ruta)
+        except BaseException:
+            os.unlink(temporal)
+            raise
+
+    # El blob entero proyectado en memoria y su os.stat, los dos del mismo fichero aunque se sustituya a
+    # la vez. El fichero sigue proyectado mientras exista la vista (o alguna vista sacada de ella).
+    def proyectar(self, contenedor, blob):
+        with open(self.ruta(contenedor, blob), "rb") as f:
+            estado = os.fstat(f.fileno())
+            if estado.st_size == 0:
+                return memoryview(b""), estado
+            return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)), estado
+
+    # Vista de los bytes [inicio, fin) sin copiarlos
+    def leer(self, contenedor, blob, inicio=0, fin=None):
+        return self.proyectar(contenedor, blob)[0][inicio:fin]
+
+    def url(self, contenedor, blob):
+        return f"{self.url_base}/{contenedor}/{urllib.parse.quote(blob)}"
+
+    def content_type(self, blob):
+        return mimetypes.guess_type(blob)[0] or "application/octet-stream"
+
+# 🔹 Almacén configurado en el .env (uno compartido por todos los hilos)
+@lru_cache(maxsize=None)
+def get_almacen():
+    cargar_entorno()
+    tipo = os.getenv("POBLADO_ALMACEN", "azure")
+    if tipo == "azure":
+        return AlmacenAzure()
+    if tipo == "local":
+        return AlmacenLocal(os.getenv("POBLADO_RUTA_ALMACEN", RUTA_LOCAL), os.getenv("POBLADO_URL_ALMACEN", URL_LOCAL))
+    raise Exception(f"POBLADO_ALMACEN debe ser azure o local, no {tipo}")
@@ -0,0 +1,88 @@
+import threading
+from collections import OrderedDict
+from conexiones import get_db_connection
+from metricas import log
+
+# 🔹 Caché en memoria de artistas y álbumes para una sesión de ingesta
+# Guarda los nombres de artista que ya existen y el id de cada álbum, de modo que las búsquedas
+# repetidas no hacen ninguna consulta. Las entradas menos usadas se descartan al superar el máximo;
+# si se vuelven a necesitar se consultan de nuevo.
+# La última posición de cada álbum no se guarda: otro proceso puede haber añadido canciones, así que
+# insertar_metadata_lote la vuelve a leer con el álbum bloqueado.
+class CacheCatalogo:
+    def __init__(self, max_artistas=200000, max_albumes=100000):
+        self.max_artistas = max_artistas
+        self.max_albumes = max_albumes
+        self.aciertos = 0
+        self.fallos = 0
+        self._artistas = OrderedDict()
+        self._albumes = OrderedDict()
+        self._lock = threading.Lock()
+
+    # Cargar de una vez los artistas y álbumes existentes
+    def cargar(self):
+        with get_db_connection() as conn, conn.cursor() as cursor:
+            cursor.execute("SELECT \"Nombre\" FROM \"Artista\" LIMIT %s", (self.max_artistas,))
+            artistas = [nombre for (nombre,) in cursor.fetchall()]
+
+            cursor.execute("""
+                SELECT DISTINCT ON (l.\"Nombre\") l.\"Nombre\", l.\"Id\"
+                FROM \"Lista\" l
+                JOIN \"Album\" a ON a.\"Id\" = l.\"Id\"
+                ORDER BY l.\"Nombre\", l.\"Id\"
+                LIMIT %s
+            """, (self.max_albumes,))
+            albumes = dict(cursor.fetchall())
+
+        self.agregar_artistas(artistas)
+        self.guardar_albumes(albumes)
+        log(f"✅ Caché cargada: {len(artistas)} artistas y {len(albumes)} álbumes")
+
+    # Devuelve los artistas que no están en la caché (los que sí están se marcan como usados)
+    def artistas_desconocidos(self, nombres):
+        desconocidos = []
+        with self._lock:
+            for nombre in nombres:
+                if nombre in self._artistas:
+                    self._artistas.move_to_end(nombre)
+                    self.aciertos += 1
+                else:
+                    desconocidos.append(nombre)
+                    self.fallos += 1
+        return desconocidos
+
+    def agregar_artistas(self, nombres):
+        with self._lock:
+            for nombre in nombres:
+                self._artistas[nombre] = None
+                self._artistas.move_to_end(nombre)
+            while len(self._artistas) > self.max_artistas:
+                self._artistas.popitem(last=False)
+
+    # Devuelve {nombre: id} con los álbumes que están en la caché
+    def buscar_albumes(self, nombres):
+        encontrados = {}
+        with self._lock:
+            for nombre in nombres:
+                entrada = self._albumes.get(nombre)
+                if entrada is None:
+                    self.fallos += 1
+                    continue
+                self._albumes.move_to_end(nombre)
+                encontrados[nombre] = entrada
+                self.aciertos += 1
+        return encontrados
+
+    def guardar_albumes(self, albumes):
+        with self._lock:
+            for nombre, album_id in albumes.items():
+                self._albumes[nombre] = album_id
+                self._albumes.move_to_end(nombre)
+            while len(self._albumes) > self.max_albumes:
+                self._albumes.popitem(last=False)
+
+    # Olvidar unos álbumes, p. ej. cuando la transacción que los modificó se deshace
+    def invalidar_albumes(self, nombres):
+        with self._lock:
+            for nombre in nombres:
+                self._albumes.pop(nombre, None)
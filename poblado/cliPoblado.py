@@ -0,0 +1,106 @@
+import argparse
+import importlib
+import sys
+
+# Punto de entrada único de los trabajos del poblado. Cada subcomando importa solo lo que necesita.
+#
+#   python cliPoblado.py etapas                                  lista las etapas, sus dependencias y su última ejecución
+#   python cliPoblado.py ejecutar                                ingesta completa (canciones y pasos posteriores)
+#   python cliPoblado.py ejecutar actualizar_listas --solo       repite una etapa sin volver a recorrer Jamendo
+#   python cliPoblado.py ejecutar subir_portadas asignar_portadas
+#   python cliPoblado.py ejecutar indice_busqueda --solo         índice de búsqueda sin ingesta
+#   python cliPoblado.py catalogo --canciones 1000000            catálogo sintético para pruebas de carga
+#   python cliPoblado.py contadores --intervalo 60               agregación periódica de los contadores
+#   python cliPoblado.py recomendaciones --similares 20          similares y "para ti" con otros parámetros
+#   python cliPoblado.py benchmark --tamanos 1000 10000          pruebas de rendimiento contra servicios locales
+#   python cliPoblado.py jamendo-falso --canciones 5000          servidor local que imita a Jamendo
+#   python cliPoblado.py almacen-local --puerto 10000            sirve el almacén local de blobs como Azure
+
+# Subcomandos que delegan en el main de otro módulo: (módulo, descripción, si necesita el .env)
+DELEGADOS = {
+    "catalogo": ("generarCatalogo", "Genera un catálogo sintético para pruebas de carga", True),
+    "contadores": ("agregarContadores", "Agrega los contadores de reproducciones, favoritos y likes", True),
+    "recomendaciones": ("recomendaciones", "Calcula las canciones similares y las recomendaciones de cada usuario", True),
+    "benchmark": ("benchmarkPoblado", "Pruebas de rendimiento del poblado contra servicios locales", False),
+    "jamendo-falso": ("jamendoFalso", "Servidor local que imita la API de Jamendo", False),
+    "almacen-local": ("servidorAlmacen", "Sirve el almacén local de blobs con la API de lectura de Azure", True),
+}
+
+def mostrar_etapas():
+    from etapasPoblado import ETAPAS, OBJETIVOS_POR_DEFECTO
+    from planificador import leer_estado
+
+    estado = leer_estado()
+    for etapa in ETAPAS:
+        ultima = estado.get(etapa.nombre)
+        ejecucion = f"última: {ultima['fin']} ({ultima['segundos']} s)" if ultima else "nunca ejecutada"
+        por_defecto = " *" if etapa.nombre in OBJETIVOS_POR_DEFECTO else ""
+        dependencias = f" ← {', '.join(etapa.depende_de)}" if etapa.depende_de else ""
+        print(f"{etapa.nombre}{por_defecto}{dependencias}")
+        print(f"    {etapa.descripcion} · {ejecucion}")
+    print("* objetivos por defecto de 'ejecutar'")
+
+def ejecutar(args):
+    from conexiones import cargar_entorno
+    # Las opciones POBLADO_* del .env deben estar cargadas antes de importar los módulos que las leen
+    cargar_entorno()
+    from etapasPoblado import ETAPAS, OBJETIVOS_POR_DEFECTO
+    from metricas import emitir_resumen, perfilar
+    from planificador import FALLIDA, CANCELADA, ejecutar_etapas
+
+    opciones_ingesta = {}
+    for opcion in ("concurrencia", "trabajadores_bd", "tamano_lote"):
+        if getattr(args, opcion) is not None:
+            opciones_ingesta[opcion] = getattr(args, opcion)
+    if args.max_canciones is not None:
+        opciones_ingesta["max_canciones"] = args.max_canciones or None
+
+    try:
+        resultados = perfilar(ejecutar_etapas, ETAPAS, args.etapas or OBJETIVOS_POR_DEFECTO,
+                              con_dependencias=not args.solo, forzar=args.forzar, paralelo=args.paralelo,
+                              contexto={"opciones_ingesta": opciones_ingesta})
+    finally:
+        emitir_resumen()
+
+    for nombre, estado in sorted(resultados.items()):
+        print(f"   {nombre}: {estado}")
+    if any(estado in (FALLIDA, CANCELADA) for estado in resultados.values()):
+        sys.exit(1)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Trabajos del poblado de la base de datos de EchoBeat")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    subparsers.add_parser("etapas", help="Lista las etapas, sus dependencias y su última ejecución")
+
+    parser_ejecutar = subparsers.add_parser("ejecutar", help="Ejecuta etapas del poblado respetando sus dependencias")
+    parser_ejecutar.add_argument("etapas", nargs="*", help="etapas a ejecutar (por defecto, la ingesta completa)")
+    parser_ejecutar.add_argument("--solo", action="store_true", help="no ejecutar las etapas de las que dependen")
+    parser_ejecutar.add_argument("--forzar", action="store_true", help="ejecutar aunque sus entradas no hayan cambiado")
+    parser_ejecutar.add_argument("--paralelo", type=int, default=4, help="etapas independientes a la vez")
+    parser_ejecutar.add_argument("--max-canciones", type=int, help="canciones nuevas a pedir a Jamendo (0 para todas)")
+    parser_ejecutar.add_argument("--concurrencia", type=int, help="transferencias simultáneas")
+    parser_ejecutar.add_argument("--trabajadores-bd", type=int, help="escrituras simultáneas en la base de datos")
+    parser_ejecutar.add_argument("--tamano-lote", type=int, help="canciones por transacción")
+
+    for comando, (_, descripcion, _) in DELEGADOS.items():
+        subparsers.add_parser(comando, help=descripcion, add_help=False)
+
+    args, resto = parser.parse_known_args(argv)
+    if args.comando in DELEGADOS:
+        modulo, _, necesita_entorno = DELEGADOS[args.comando]
+        if necesita_entorno:
+            from conexiones import cargar_entorno
+            cargar_entorno()
+        importlib.import_module(modulo).main(resto)
+        return
+    if resto:
+        parser.error(f"argumentos no reconocidos: {' '.join(resto)}")
+
+    if args.comando == "etapas":
+        mostrar_etapas()
+    elif args.comando == "ejecutar":
+        ejecutar(args)
+
+if __name__ == "__main__":
+    main()
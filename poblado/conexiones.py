@@ -0,0 +1,108 @@
+import os
+import threading
+import urllib.parse
+from contextlib import contextmanager
+from functools import lru_cache
+from psycopg2.extensions import cursor as CursorPsycopg
+from psycopg2.pool import ThreadedConnectionPool
+from azure.storage.blob import BlobServiceClient
+from dotenv import load_dotenv
+
+# Obtener la ruta correcta del archivo .env
+env_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "echo-beat-backend", ".env"))
+
+# 🔹 Cargar el archivo .env (una sola vez y sin pisar las variables que ya estén definidas)
+# No se hace al importar el módulo: lo llaman el punto de entrada y las funciones que lo necesitan.
+@lru_cache(maxsize=None)
+def cargar_entorno():
+    load_dotenv(env_path)
+
+# 🔹 URL de la base de datos con la contraseña codificada correctamente si es necesario
+def url_base_datos():
+    cargar_entorno()
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        raise Exception("No se encontró DATABASE_URL en el archivo .env")
+
+    parsed_url = urllib.parse.urlparse(database_url)
+    password = urllib.parse.quote(parsed_url.password) if parsed_url.password else ""
+    return database_url.replace(parsed_url.password, password) if password else database_url
+
+# Número de conexiones que se mantienen abiertas y compartidas por todos los módulos
+def tamano_pool():
+    cargar_entorno()
+    return int(os.getenv("POBLADO_TAMANO_POOL", "4"))
+
+# Contador de sentencias enviadas a la base de datos (idas y vueltas), para medir el coste de cada etapa
+_consultas = 0
+_lock_consultas = threading.Lock()
+
+def contar_consulta():
+    global _consultas
+    with _lock_consultas:
+        _consultas += 1
+
+def consultas_ejecutadas():
+    return _consultas
+
+class CursorContado(CursorPsycopg):
+    def execute(self, query, vars=None):
+        contar_consulta()
+        return super().execute(query, vars)
+
+    def executemany(self, query, vars_list):
+        contar_consulta()
+        return super().executemany(query, vars_list)
+
+    def copy_expert(self, sql, file, size=8192):
+        contar_consulta()
+        return super().copy_expert(sql, file, size)
+
+_pool = None
+_lock_pool = threading.Lock()
+# El pool de psycopg2 lanza un error si se agota, así que los hilos esperan aquí a que quede una libre
+_conexiones_libres = None
+
+def get_pool():
+    global _pool, _conexiones_libres
+    if _pool is None:
+        with _lock_pool:
+            if _pool is None:
+                tamano = tamano_pool()
+                _conexiones_libres = threading.BoundedSemaphore(tamano)
+                # El search_path se fija al abrir cada conexión, sin una consulta adicional
+                _pool = ThreadedConnectionPool(tamano, tamano, url_base_datos(),
+                                               options="-c search_path=public", cursor_factory=CursorContado)
+    return _pool
+
+# 🔹 Conectar a la base de datos: presta una conexión del pool y la devuelve al terminar
+@contextmanager
+def get_db_connection():
+    pool = get_pool()
+    _conexiones_libres.acquire()
+    try:
+        conn = pool.getconn()
+        try:
+            yield conn
+        except Exception:
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            # El pool deshace cualquier transacción que haya quedado abierta
+            pool.putconn(conn)
+    finally:
+        _conexiones_libres.release()
+
+# 🔹 Cliente de Azure Blob Storage compartido (es seguro usarlo desde varios hilos)
+@lru_cache(maxsize=None)
+def get_blob_service_client():
+    cargar_entorno()
+    cadena_conexion = os.getenv("AZURE_STORAGE_CONNECTION_STRING")
+    if not cadena_conexion:
+        raise Exception("No se encontró AZURE_STORAGE_CONNECTION_STRING en el archivo .env")
+    return BlobServiceClient.from_connection_string(cadena_conexion)
+
+@lru_cache(maxsize=None)
+def get_container_client(nombre_contenedor):
+    return get_blob_service_client().get_container_client(nombre_contenedor)
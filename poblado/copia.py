@@ -0,0 +1,53 @@
+from metricas import contar, cronometro, log
+
+# Carga de filas en Postgres con COPY FROM STDIN, sin construir antes todo el texto en memoria.
+# La usan el generador de catálogos sintéticos y los trabajos que rellenan tablas enteras
+# (recomendaciones, índice de búsqueda).
+
+TAMANO_COPY = 1024 * 1024
+
+# Caracteres que hay que escapar en el formato de texto de COPY
+ESCAPES_COPY = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+# 🔹 Fichero de solo lectura que va generando las líneas de COPY a medida que Postgres las pide
+class FlujoCopy:
+    def __init__(self, filas):
+        self._filas = filas
+        self._pendiente = b""
+        self.filas = 0
+
+    def read(self, size=-1):
+        partes = [self._pendiente]
+        longitud = len(self._pendiente)
+        while size < 0 or longitud < size:
+            fila = next(self._filas, None)
+            if fila is None:
+                break
+            linea = ("\t".join(valor_copy(valor) for valor in fila) + "\n").encode("utf-8")
+            partes.append(linea)
+            longitud += len(linea)
+            self.filas += 1
+        datos = b"".join(partes)
+        if size < 0:
+            self._pendiente = b""
+            return datos
+        self._pendiente = datos[size:]
+        return datos[:size]
+
+def valor_copy(valor):
+    if valor is None:
+        return "\\N"
+    if isinstance(valor, bool):
+        return "t" if valor else "f"
+    if isinstance(valor, str):
+        return valor.translate(ESCAPES_COPY)
+    return str(valor)
+
+# 🔹 Copiar en una tabla las filas (tuplas en el orden de columnas) que va dando un iterador
+def copiar(cursor, tabla, columnas, filas):
+    flujo = FlujoCopy(filas)
+    lista_columnas = ", ".join(f'"{columna}"' for columna in columnas)
+    with cronometro(f"copia.{tabla}"):
+        cursor.copy_expert(f'COPY "{tabla}" ({lista_columnas}) FROM STDIN', flujo, size=TAMANO_COPY)
+    contar(f"filas.{tabla}", flujo.filas)
+    log(f"✅ {flujo.filas} filas copiadas en {tabla}")
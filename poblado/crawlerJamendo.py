@@ -0,0 +1,198 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from metricas import contar, cronometro
+
+# Client ID de Jamendo
+CLIENT_ID = "4ca1da2f"
+
+URL_TRACKS = os.getenv("JAMENDO_URL_TRACKS", "https://api.jamendo.com/v3.0/tracks/")
+
+# Jamendo no devuelve más de 200 canciones por petición
+LIMITE_PAGINA = 200
+PAGINAS_CONCURRENTES = int(os.getenv("JAMENDO_PAGINAS_CONCURRENTES", "4"))
+PETICIONES_POR_SEGUNDO = float(os.getenv("JAMENDO_PETICIONES_POR_SEGUNDO", "5"))
+REINTENTOS = 3
+# Ejecuciones en las que se intenta guardar una canción antes de darla por perdida
+MAX_INTENTOS = 3
+
+# Fichero donde se guarda por dónde va el recorrido para poder continuarlo
+RUTA_CHECKPOINT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "checkpoint_jamendo.json")
+
+# 🔹 Limitador de peticiones compartido por todos los hilos que piden páginas
+class LimitadorPeticiones:
+    def __init__(self, peticiones_por_segundo):
+        self.intervalo = 1 / peticiones_por_segundo if peticiones_por_segundo > 0 else 0
+        self.siguiente = 0
+        self._lock = threading.Lock()
+
+    def esperar(self):
+        with self._lock:
+            ahora = time.monotonic()
+            turno = max(ahora, self.siguiente)
+            self.siguiente = turno + self.intervalo
+        if turno > ahora:
+            time.sleep(turno - ahora)
+
+# Checkpoint vacío: ninguna canción terminada
+def leer_checkpoint(ruta=RUTA_CHECKPOINT):
+    checkpoint = {"ultima_fecha": None, "ids_ultima_fecha": [], "adelantadas": [], "fallidas": []}
+    if os.path.exists(ruta):
+        with open(ruta, encoding="utf-8") as f:
+            checkpoint.update(json.load(f))
+    return checkpoint
+
+def guardar_checkpoint(checkpoint, ruta=RUTA_CHECKPOINT):
+    # Escribir en un fichero temporal y renombrarlo para no dejar nunca un checkpoint a medias
+    temporal = f"{ruta}.tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+    os.replace(temporal, ruta)
+
+# 🔹 Función para pedir una página de canciones, reintentando si Jamendo falla o limita
+def pedir_pagina(offset, limitador, desde=None, limite=LIMITE_PAGINA):
+    params = {
+        "client_id": CLIENT_ID,
+        "format": "json",
+        "limit": limite,
+        "offset": offset,
+        "license": "ccplus",
+        # Ordenar por fecha de publicación para que las canciones nuevas queden al final
+        # y los offsets ya recorridos no cambien entre ejecuciones
+        "order": "releasedate_asc",
+    }
+    if desde:
+        params["datebetween"] = f"{desde}_{time.strftime('%Y-%m-%d')}"
+
+    for intento in range(REINTENTOS):
+        limitador.esperar()
+        try:
+            with cronometro("jamendo.pagina"):
+                response = requests.get(URL_TRACKS, params=params, timeout=30)
+            if response.status_code == 200:
+                return response.json().get("results", [])
+            contar("jamendo.reintentos")
+            print(f"❌ Jamendo respondió {response.status_code} para offset {offset}")
+        except requests.RequestException as e:
+            contar("jamendo.reintentos")
+            print(f"❌ Error al pedir la página con offset {offset}: {str(e)}")
+        time.sleep(2 ** intento)
+
+    raise Exception(f"No se pudo obtener la página con offset {offset} de Jamendo")
+
+# 🔹 Recorrido del catálogo de Jamendo página a página
+# canciones() pide varias páginas a la vez respetando el límite de peticiones por segundo y entrega
+# las canciones en orden de publicación. Quien las procesa llama a terminar(id, error) cuando cada una
+# se ha guardado del todo (o ha fallado), y solo entonces cuenta para el checkpoint:
+#   ultima_fecha, ids_ultima_fecha   marca de agua: todas las canciones entregadas hasta ahí, y las de
+#                                    esa fecha que ya se han terminado
+#   adelantadas                      [id, fecha] de las canciones terminadas por delante de la marca
+#                                    mientras alguna anterior sigue en curso
+#   fallidas                         canciones que fallaron, con sus intentos
+# Cada ejecución pide solo lo publicado desde ultima_fecha, saltándose lo ya terminado, y empieza
+# reintentando las fallidas, así que sirve tanto para continuar un recorrido interrumpido (lo que
+# estaba en curso se vuelve a pedir) como para traer únicamente las novedades.
+class RecorridoJamendo:
+    def __init__(self, max_canciones=None, paginas_concurrentes=PAGINAS_CONCURRENTES,
+                 peticiones_por_segundo=PETICIONES_POR_SEGUNDO, ruta_checkpoint=RUTA_CHECKPOINT):
+        self.max_canciones = max_canciones
+        self.paginas_concurrentes = paginas_concurrentes
+        self.limitador = LimitadorPeticiones(peticiones_por_segundo)
+        self.ruta_checkpoint = ruta_checkpoint
+        self.checkpoint = leer_checkpoint(ruta_checkpoint)
+        # Canciones nuevas entregadas y aún no cubiertas por la marca de agua, en orden: id -> [track, terminada]
+        self.en_curso = OrderedDict()
+        self.reintentos = {}
+        self._lock = threading.Lock()
+
+    def canciones(self):
+        checkpoint = self.checkpoint
+        with self._lock:
+            fallidas = list(checkpoint["fallidas"])
+            # Canciones que Jamendo volverá a devolver y no hay que entregar otra vez
+            vistas = set(checkpoint["ids_ultima_fecha"]) | {id_track for id_track, _ in checkpoint["adelantadas"]}
+            vistas.update(fallida["track"]["id"] for fallida in fallidas)
+
+        entregadas = 0
+        for fallida in fallidas:
+            if self.max_canciones is not None and entregadas >= self.max_canciones:
+                return
+            with self._lock:
+                self.reintentos[fallida["track"]["id"]] = fallida
+            contar("jamendo.reintentadas")
+            yield fallida["track"]
+            entregadas += 1
+
+        desde = checkpoint["ultima_fecha"]
+        offset = 0
+        with ThreadPoolExecutor(max_workers=self.paginas_concurrentes) as executor:
+            while True:
+                offsets = [offset + i * LIMITE_PAGINA for i in range(self.paginas_concurrentes)]
+                paginas = executor.map(lambda o: pedir_pagina(o, self.limitador, desde), offsets)
+
+                for pagina in paginas:
+                    for track in pagina:
+                        if track["id"] in vistas:
+                            continue
+                        if self.max_canciones is not None and entregadas >= self.max_canciones:
+                            return
+                        with self._lock:
+                            self.en_curso[track["id"]] = [track, False]
+                        yield track
+                        entregadas += 1
+
+                    # Una página incompleta indica que ya no quedan más canciones
+                    if len(pagina) < LIMITE_PAGINA:
+                        return
+
+                offset = offsets[-1] + LIMITE_PAGINA
+
+    # 🔹 Una canción entregada ya está guardada (error None) o ha fallado; se puede llamar desde cualquier hilo
+    def terminar(self, id_track, error=None):
+        with self._lock:
+            checkpoint = self.checkpoint
+            if id_track in self.reintentos:
+                fallida = self.reintentos.pop(id_track)
+                checkpoint["fallidas"] = [f for f in checkpoint["fallidas"] if f["track"]["id"] != id_track]
+                if error is not None:
+                    self.registrar_fallo(fallida["track"], fallida["intentos"] + 1, error)
+            elif id_track in self.en_curso:
+                entrada = self.en_curso[id_track]
+                entrada[1] = True
+                if error is not None:
+                    self.registrar_fallo(entrada[0], 1, error)
+                self.avanzar_marca()
+            else:
+                return
+            guardar_checkpoint(checkpoint, self.ruta_checkpoint)
+
+    def registrar_fallo(self, track, intentos, error):
+        if intentos >= MAX_INTENTOS:
+            contar("jamendo.descartadas")
+            print(f"❌ Canción {track['id']} descartada tras {intentos} intentos: {error}")
+            return
+        self.checkpoint["fallidas"].append({"track": track, "intentos": intentos})
+
+    # Mover la marca de agua sobre las canciones terminadas del principio
+    def avanzar_marca(self):
+        checkpoint = self.checkpoint
+        while self.en_curso:
+            id_track, (track, terminada) = next(iter(self.en_curso.items()))
+            if not terminada:
+                break
+            self.en_curso.popitem(last=False)
+            if track["releasedate"] != checkpoint["ultima_fecha"]:
+                checkpoint["ultima_fecha"] = track["releasedate"]
+                checkpoint["ids_ultima_fecha"] = []
+            checkpoint["ids_ultima_fecha"].append(id_track)
+
+        # Las adelantadas de fechas anteriores a la marca ya no se vuelven a pedir a Jamendo
+        adelantadas = dict(checkpoint["adelantadas"])
+        adelantadas.update((id_track, track["releasedate"]) for id_track, (track, terminada) in self.en_curso.items() if terminada)
+        hechas = set(checkpoint["ids_ultima_fecha"])
+        checkpoint["adelantadas"] = [[id_track, fecha] for id_track, fecha in adelantadas.items()
+                                     if id_track not in hechas and (checkpoint["ultima_fecha"] is None or fecha >= checkpoint["ultima_fecha"])]
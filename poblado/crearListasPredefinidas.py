@@ -1,102 +1,117 @@
 import os
-import urllib.parse
-import psycopg2
-from azure.storage.blob import BlobServiceClient
-from dotenv import load_dotenv
-
-# Obtener la ruta correcta del archivo .env
-env_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "echo-beat-backend", ".env"))
-
-# Cargar el archivo .env desde la ubicación correcta
-load_dotenv(env_path)
+from psycopg2.extras import Json, execute_values
+from conexiones import get_db_connection
+from procesarPortadas import procesar_portadas
+from metricas import log
 
 # Configuración de Azure Blob Storage
-AZURE_CONNECTION_STRING = os.getenv("AZURE_STORAGE_CONNECTION_STRING")
 CONTAINER_NAME = "default-genero-fotos"
 
-database_url = os.getenv("DATABASE_URL")
-if not database_url:
-    print("Error: No se encontró DATABASE_URL en el archivo .env")
-    exit()
-
-# Codificar correctamente la contraseña si es necesario
-parsed_url = urllib.parse.urlparse(database_url)
-password = urllib.parse.quote(parsed_url.password) if parsed_url.password else ""
-database_url_fixed = database_url.replace(parsed_url.password, password) if password else database_url
-
-# Conectar a la base de datos
-def get_db_connection():
-    conn = psycopg2.connect(database_url_fixed)
-    conn.cursor().execute("SET search_path TO public;") 
-    return conn
-
-# 🔹 Función para subir foto genero a blob
-def subir_imagen_a_blob(nombre_archivo, ruta_archivo):
-    blob_service_client = BlobServiceClient.from_connection_string(AZURE_CONNECTION_STRING)
-    blob_client = blob_service_client.get_blob_client(container=CONTAINER_NAME, blob=nombre_archivo)
-
-    # Subir archivo al blob
-    with open(ruta_archivo, "rb") as data:
-        blob_client.upload_blob(data, overwrite=True)
-        print(f"✅ Imagen subida a Azure: {nombre_archivo}")
-
-        # Devolver la URL pública del archivo
-        return f"https://{blob_service_client.account_name}.blob.core.windows.net/{CONTAINER_NAME}/{nombre_archivo}"
-
-def crear_listas_predefinidas():
-    ruta_imagenes = "C:\\Users\\jorda\\Downloads\\genero"
+RUTA_IMAGENES = os.getenv("POBLADO_RUTA_FOTOS_GENERO", "C:\\Users\\jorda\\Downloads\\genero")
+
+# Autor de las listas predefinidas
+EMAIL_ADMIN = "admin"
+
+# Criterios para ordenar las canciones dentro de cada lista (siempre deterministas)
+ORDENES = {
+    "popularidad": "c.\"NumReproducciones\" DESC, c.\"Id\"",
+    "recientes": "c.\"Id\" DESC",
+    "nombre": "c.\"Nombre\", c.\"Id\"",
+}
+
+# 🔹 Función para crear las listas de los géneros que todavía no tienen una
+# Se llama con el bloqueo de las listas predefinidas ya tomado.
+# Devuelve {genero: id_lista} con las listas creadas
+def crear_listas_que_faltan(cursor):
+    cursor.execute("""
+        SELECT g.\"NombreGenero\"
+        FROM \"Genero\" g
+        WHERE NOT EXISTS (
+            SELECT 1 FROM \"ListaReproduccion\" lr
+            WHERE lr.\"EmailAutor\" = %s AND lr.\"Genero\" = g.\"NombreGenero\" AND lr.\"Nombre\" = g.\"NombreGenero\"
+        )
+    """, (EMAIL_ADMIN,))
+    generos = [genero for (genero,) in cursor.fetchall()]
+    if not generos:
+        return {}
+
+    rutas = {genero: os.path.join(RUTA_IMAGENES, f"{genero}.jpg") for genero in generos}
+    for genero, ruta_archivo in rutas.items():
+        if not os.path.exists(ruta_archivo):
+            print(f"❌ No se encontró la imagen para {genero}")
+
+    # Subir a la vez las fotos de todos los géneros (y sus versiones reducidas)
+    portadas = procesar_portadas(CONTAINER_NAME, [ruta for ruta in rutas.values() if os.path.exists(ruta)])
+    generos = [genero for genero in generos if rutas[genero] in portadas]
+    if not generos:
+        return {}
+
+    # 🔹 ACTUALIZAR campo FotoGenero en la tabla Genero
+    execute_values(cursor, """
+        UPDATE \"Genero\" g
+        SET \"FotoGenero\" = v.portada, \"FotoGeneroVariantes\" = v.variantes
+        FROM (VALUES %s) AS v(genero, portada, variantes)
+        WHERE g.\"NombreGenero\" = v.genero
+    """, [(genero, portadas[rutas[genero]][0], Json(portadas[rutas[genero]][1])) for genero in generos],
+        template="(%s, %s, %s::jsonb)")
+
+    # Insertar las listas predefinidas en la tabla Lista y en ListaReproduccion
+    filas = execute_values(cursor, """
+        INSERT INTO \"Lista\" (\"Nombre\", \"NumCanciones\", \"Duracion\", \"NumLikes\", \"Descripcion\", \"Portada\", \"TipoLista\")
+        SELECT v.genero, 0, 0, 0, 'Lista predefinida de ' || v.genero, v.portada, 'ListaReproduccion'
+        FROM (VALUES %s) AS v(genero, portada)
+        RETURNING \"Id\", \"Nombre\"
+    """, [(genero, portadas[rutas[genero]][0]) for genero in generos], fetch=True)
+    listas = {genero: id_lista for id_lista, genero in filas}
+
+    execute_values(cursor, """
+        INSERT INTO \"ListaReproduccion\" (\"Id\", \"Nombre\", \"EmailAutor\", \"Genero\") VALUES %s
+    """, [(id_lista, genero, EMAIL_ADMIN, genero) for genero, id_lista in listas.items()])
+
+    return listas
+
+# 🔹 Función para crear las listas predefinidas de cada género y añadirles sus canciones
+# Es idempotente: solo crea las listas que faltan y solo añade las canciones que aún no están,
+# detrás de las que ya había, en el orden indicado. Con reconstruir=True se vacían antes las
+# listas para volver a ordenarlas enteras.
+# Devuelve los ids de las listas creadas o modificadas
+def crear_listas_predefinidas(orden="popularidad", reconstruir=False):
     with get_db_connection() as conn, conn.cursor() as cursor:
-        cursor.execute("SELECT \"NombreGenero\" FROM \"Genero\"")
-        generos = cursor.fetchall()
-
-        for (genero,) in generos:
-            nombre_archivo = f"{genero}.jpg"
-            ruta_archivo = os.path.join(ruta_imagenes, nombre_archivo)
-
-            if not os.path.exists(ruta_archivo):
-                print(f"❌ No se encontró la imagen para {genero}")
-                continue
-            
-            # Subir imagen a Azure Blob Storage y obtener la URL
-            url_portada = subir_imagen_a_blob(nombre_archivo, ruta_archivo)
-
-            # 🔹 ACTUALIZAR campo FotoGenero en la tabla Genero
-            cursor.execute("""
-                UPDATE \"Genero\"
-                SET \"FotoGenero\" = %s
-                WHERE \"NombreGenero\" = %s
-            """, (url_portada, genero))
-
-            # Insertar lista predefinida en tabla Lista
-            cursor.execute("""
-                INSERT INTO \"Lista\" (\"Nombre\", \"NumCanciones\", \"Duracion\", \"NumLikes\", \"Descripcion\", \"Portada\", \"TipoLista\")
-                VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING \"Id\"
-            """, (genero, 0, 0, 0, f"Lista predefinida de {genero}", url_portada, 'ListaReproduccion'))
-
-            id_lista, = cursor.fetchone()
-
-            # Insertar en ListaReproduccion
-            cursor.execute("""
-                INSERT INTO \"ListaReproduccion\" (\"Id\", \"Nombre\", \"EmailAutor\", \"Genero\")
-                VALUES (%s, %s, %s, %s)
-            """, (id_lista, genero, 'admin', genero))
-
-            # Obtener canciones del mismo genero
-            cursor.execute("""
-                SELECT \"Id\" FROM \"Cancion\" WHERE \"Genero\" = %s
-            """, (genero,))
-            canciones = cursor.fetchall()
-
-            # Insertar canciones en la Lista
-            for posicion, (id_cancion,) in enumerate(canciones):
-                cursor.execute("""
-                    INSERT INTO \"PosicionCancion\" (\"IdLista\", \"IdCancion\", \"Posicion\")
-                    VALUES (%s, %s, %s)
-                """, (id_lista, id_cancion, posicion))
-
-            print(f"✅ Lista predefinida de {genero} con {len(canciones)} canciones creada con éxito\n")
-        
-        conn.commit()
-
+        # Dos ejecuciones a la vez (p. ej. el planificador y una manual) crearían la misma lista o
+        # repetirían posiciones: la segunda espera aquí a que la primera confirme y ya no ve nada que hacer
+        cursor.execute("SELECT pg_advisory_xact_lock(hashtext('listas_predefinidas'))")
+        nuevas = crear_listas_que_faltan(cursor)
+        for genero in nuevas:
+            log(f"✅ Lista predefinida de {genero} creada con éxito")
+
+        cursor.execute("SELECT \"Id\" FROM \"ListaReproduccion\" WHERE \"EmailAutor\" = %s AND \"Nombre\" = \"Genero\"", (EMAIL_ADMIN,))
+        ids_predefinidas = [id_lista for (id_lista,) in cursor.fetchall()]
+
+        modificadas = set(nuevas.values())
+        if reconstruir:
+            cursor.execute("DELETE FROM \"PosicionCancion\" WHERE \"IdLista\" = ANY(%s)", (ids_predefinidas,))
+            modificadas.update(ids_predefinidas)
+
+        # Añadir las canciones de cada género que no estén ya en su lista, en una sola sentencia
+        cursor.execute(f"""
+            INSERT INTO \"PosicionCancion\" (\"IdLista\", \"IdCancion\", \"Posicion\")
+            SELECT lr.\"Id\", c.\"Id\",
+                   COALESCE(ultima.posicion, -1) + row_number() OVER (PARTITION BY lr.\"Id\" ORDER BY {ORDENES[orden]})
+            FROM \"ListaReproduccion\" lr
+            JOIN \"Cancion\" c ON c.\"Genero\" = lr.\"Genero\"
+            LEFT JOIN LATERAL (
+                SELECT MAX(pc.\"Posicion\") AS posicion FROM \"PosicionCancion\" pc WHERE pc.\"IdLista\" = lr.\"Id\"
+            ) ultima ON true
+            WHERE lr.\"Id\" = ANY(%s)
+              AND NOT EXISTS (
+                  SELECT 1 FROM \"PosicionCancion\" pc WHERE pc.\"IdLista\" = lr.\"Id\" AND pc.\"IdCancion\" = c.\"Id\"
+              )
+            RETURNING \"IdLista\"
+        """, (ids_predefinidas,))
+        insertadas = cursor.fetchall()
+        modificadas.update(id_lista for (id_lista,) in insertadas)
 
+        conn.commit()
+        log(f"✅ {len(insertadas)} canciones añadidas a {len(modificadas)} listas predefinidas")
 
+    return list(modificadas)
@@ -0,0 +1,148 @@
+import hashlib
+import os
+from planificador import Etapa
+
+# Etapas del poblado y sus dependencias:
+#
+#   canciones ──────────┬──> autores_albumes
+#                       ├──> listas_predefinidas ──> actualizar_listas
+#   generos ────────────┘                            ^
+#   canciones ───────────────────────────────────────┘
+#   subir_portadas ─────┬──> asignar_portadas
+#   canciones ──────────┘
+#   canciones ──────────┬──> indice_busqueda
+#   listas_predefinidas ┘
+#   recomendaciones, contadores (solo leen lo que hacen los usuarios en la aplicación)
+#
+# Los módulos de cada etapa se importan al ejecutarla, así que listar las etapas o lanzar solo una
+# no carga el resto. Las huellas resumen lo que lee cada etapa (filas de la base de datos o ficheros
+# locales) para que el planificador pueda saltarse las que no tienen nada nuevo que hacer.
+
+# Etapas que se ejecutan si no se pide ninguna en concreto (las portadas necesitan imágenes locales)
+OBJETIVOS_POR_DEFECTO = ["autores_albumes", "actualizar_listas", "indice_busqueda"]
+
+# 🔹 Huellas de las entradas
+def consultar(sql):
+    from conexiones import get_db_connection
+    with get_db_connection() as conn, conn.cursor() as cursor:
+        cursor.execute(sql)
+        return list(cursor.fetchone())
+
+# Último id de canción y de álbum: cambian cuando la ingesta inserta cualquier canción o álbum.
+# No se usa el de Lista, que también cambia al crear las listas predefinidas: la huella se calcula antes
+# de ejecutar la etapa y no debe incluir lo que escribe la propia etapa (ni una que corre a la vez)
+def huella_catalogo(contexto):
+    return consultar("SELECT (SELECT MAX(\"Id\") FROM \"Cancion\"), (SELECT MAX(\"Id\") FROM \"Album\")")
+
+# Nombre, tamaño y fecha de modificación de los ficheros de un directorio
+def huella_directorio(ruta):
+    sha = hashlib.sha256()
+    if os.path.isdir(ruta):
+        for entrada in sorted(os.scandir(ruta), key=lambda e: e.name):
+            if entrada.is_file():
+                datos = entrada.stat()
+                sha.update(f"{entrada.name}\0{datos.st_size}\0{datos.st_mtime_ns}\n".encode("utf-8"))
+    return sha.hexdigest()
+
+def huella_generos(contexto):
+    from subirMetadatos import GENEROS_FIJOS
+    return [GENEROS_FIJOS, consultar("SELECT COUNT(*) FROM \"Genero\"")]
+
+def huella_listas_predefinidas(contexto):
+    from crearListasPredefinidas import RUTA_IMAGENES
+    return [consultar("SELECT MAX(\"Id\") FROM \"Cancion\""), consultar("SELECT COUNT(*) FROM \"Genero\""),
+            huella_directorio(RUTA_IMAGENES)]
+
+# Las listas nuevas (predefinidas o de los usuarios) ya existen cuando se calcula: listas_predefinidas va antes
+def huella_actualizar_listas(contexto):
+    return [huella_catalogo(contexto),
+            consultar("SELECT (SELECT MAX(\"Id\") FROM \"Lista\"), (SELECT COUNT(*) FROM \"PosicionCancion\")")]
+
+def huella_subir_portadas(contexto):
+    from insertarFotosCanciones import RUTA_IMAGENES
+    return huella_directorio(RUTA_IMAGENES)
+
+def huella_asignar_portadas(contexto):
+    return [huella_subir_portadas(contexto), consultar("SELECT MAX(\"Id\") FROM \"Cancion\"")]
+
+# Lo que usa el cálculo de recomendaciones: canciones, listas, escuchas y preferencias
+def huella_recomendaciones(contexto):
+    return consultar("SELECT (SELECT MAX(\"Id\") FROM \"Cancion\"), (SELECT COUNT(*) FROM \"PosicionCancion\"), "
+                     "(SELECT COUNT(*) FROM \"CancionEscuchada\"), (SELECT SUM(\"NumReproducciones\") FROM \"CancionEscuchada\"), "
+                     "(SELECT COUNT(*) FROM \"Preferencia\")")
+
+# Álbumes tocados por la ingesta de esta ejecución, o None si no se ha ejecutado (entonces se revisan todos)
+def albumes_ingeridos(contexto):
+    ingesta = contexto.get("canciones")
+    return ingesta["ids_albumes"] if ingesta is not None else None
+
+# 🔹 Trabajo de cada etapa
+def etapa_canciones(contexto):
+    from obtencionCanciones import ingerir
+    insertadas, fallos = ingerir(**contexto.get("opciones_ingesta", {}))
+    return {"insertadas": insertadas, "fallos": fallos, "ids_albumes": {cancion["id_album"] for cancion in insertadas}}
+
+def etapa_generos(contexto):
+    from subirMetadatos import insertar_generos_aleatorios
+    insertar_generos_aleatorios()
+
+def etapa_autores_albumes(contexto):
+    from subirMetadatos import verificar_autores_de_todos_los_albumes
+    verificar_autores_de_todos_los_albumes(albumes_ingeridos(contexto))
+
+def etapa_listas_predefinidas(contexto):
+    from crearListasPredefinidas import crear_listas_predefinidas
+    return crear_listas_predefinidas()
+
+def etapa_actualizar_listas(contexto):
+    from subirMetadatos import actualizar_listas
+    ids_albumes = albumes_ingeridos(contexto)
+    if ids_albumes is None:
+        actualizar_listas()
+    else:
+        # Solo las listas en las que se han insertado canciones en esta ejecución
+        actualizar_listas(ids_albumes | set(contexto.get("listas_predefinidas") or []))
+
+def etapa_subir_portadas(contexto):
+    from insertarFotosCanciones import subir_portadas_canciones
+    return subir_portadas_canciones()
+
+def etapa_asignar_portadas(contexto):
+    from insertarFotosCanciones import asignar_portadas
+    # Si subir_portadas se ha saltado, asignar_portadas usa las portadas que guardó en su última ejecución
+    asignar_portadas(contexto.get("subir_portadas"))
+
+def etapa_indice_busqueda(contexto):
+    from indiceBusqueda import actualizar_indice
+    actualizar_indice()
+
+def etapa_contadores(contexto):
+    from agregarContadores import agregar_contadores
+    agregar_contadores()
+
+def etapa_recomendaciones(contexto):
+    from recomendaciones import Recomendador, generar_recomendaciones
+    generar_recomendaciones(Recomendador())
+
+ETAPAS = [
+    Etapa("canciones", etapa_canciones,
+          descripcion="Recorre Jamendo, sube los audios y guarda sus metadatos"),
+    Etapa("generos", etapa_generos, huella=huella_generos,
+          descripcion="Inserta los géneros fijos"),
+    Etapa("autores_albumes", etapa_autores_albumes, ["canciones"], huella_catalogo,
+          descripcion="Asigna autor a los álbumes cuyas canciones son todas del mismo artista"),
+    Etapa("listas_predefinidas", etapa_listas_predefinidas, ["canciones", "generos"], huella_listas_predefinidas,
+          descripcion="Crea y rellena las listas de cada género"),
+    Etapa("actualizar_listas", etapa_actualizar_listas, ["canciones", "listas_predefinidas"], huella_actualizar_listas,
+          descripcion="Recalcula el número de canciones y la duración de las listas"),
+    Etapa("subir_portadas", etapa_subir_portadas, huella=huella_subir_portadas,
+          descripcion="Sube las portadas de canciones y sus versiones reducidas"),
+    Etapa("asignar_portadas", etapa_asignar_portadas, ["canciones", "subir_portadas"], huella_asignar_portadas,
+          descripcion="Asigna las portadas subidas a las últimas canciones"),
+    Etapa("indice_busqueda", etapa_indice_busqueda, ["canciones", "listas_predefinidas"],
+          descripcion="Pone al día el índice de búsqueda con lo nuevo, lo renombrado y la popularidad"),
+    Etapa("recomendaciones", etapa_recomendaciones, huella=huella_recomendaciones,
+          descripcion="Calcula las canciones similares y las recomendaciones de cada usuario"),
+    Etapa("contadores", etapa_contadores,
+          descripcion="Aplica a los contadores de popularidad las escuchas, favoritos y likes pendientes"),
+]
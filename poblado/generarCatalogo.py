@@ -0,0 +1,362 @@
+import argparse
+import datetime
+import math
+import random
+from conexiones import cargar_entorno, get_db_connection
+# Al ejecutarlo directamente, el .env tiene que estar cargado antes de importar los módulos que
+# leen sus opciones (POBLADO_*, JAMENDO_*)
+if __name__ == "__main__":
+    cargar_entorno()
+from copia import copiar
+from metricas import cronometro, emitir_resumen, log, metricas
+from subirMetadatos import GENEROS_FIJOS
+
+# Generador de un catálogo sintético grande para las pruebas de carga del backend.
+# Escribe con COPY millones de filas deterministas (misma semilla → mismos datos) respetando las
+# claves ajenas de schema.prisma: Artista, Lista/Album, Cancion, AutorAlbum, AutorCancion,
+# PosicionCancion, Usuario, ListaReproduccion, Like, CancionEscuchada y Amistad.
+# La popularidad de canciones, artistas, listas y usuarios sigue una ley de Zipf. Nada se guarda
+# en memoria por fila: cada entidad tiene su propio generador aleatorio derivado de la semilla, así
+# que cualquier fila se puede volver a calcular cuando otra tabla la necesita.
+# Todo se escribe en una sola transacción; para cargar otro lote en la misma base de datos hay
+# que usar otra semilla (los nombres de artistas y los emails la incluyen).
+#
+#   python generarCatalogo.py --canciones 1000000 --semilla 1
+
+PALABRAS = ["amor", "noche", "fuego", "mar", "cielo", "sombra", "luz", "viento", "ciudad", "sueño",
+            "camino", "tiempo", "lluvia", "corazón", "estrella", "río", "silencio", "verano", "eco", "latido"]
+PRIVACIDADES = ["publico", "protegido", "privado"]
+FECHA_INICIAL = datetime.date(1990, 1, 1)
+MAX_REPRODUCCIONES = 50_000_000
+
+# Flujos aleatorios independientes, uno por tipo de entidad
+FLUJO_ALBUM, FLUJO_CANCION, FLUJO_USUARIO, FLUJO_LISTA, FLUJO_ESCUCHAS, FLUJO_LIKES, FLUJO_AMIGOS = range(7)
+
+# Disparadores de migrations/20261017124000_agregacion_contadores en las tablas que se cargan con COPY
+DISPARADORES_CONTADORES = [("Like", "Like_cambio_contador"), ("CancionEscuchada", "CancionEscuchada_cambio_contador")]
+
+# 🔹 Muestreo de rangos con ley de Zipf (exponente s) entre 0 y n - 1 sin tablas en memoria,
+# invirtiendo la función de distribución de la aproximación continua
+def rango_zipf(aleatorio, n, s):
+    u = aleatorio.random()
+    if s == 1:
+        x = n ** u
+    else:
+        x = ((n ** (1 - s) - 1) * u + 1) ** (1 / (1 - s))
+    return min(n, int(x)) - 1
+
+# 🔹 Permutación de 0..n-1 para que los elementos más populares no sean siempre los primeros ids
+class Permutacion:
+    def __init__(self, n, semilla):
+        self.n = n
+        self.desplazamiento = semilla % n if n else 0
+        self.factor = max(1, int(n * 0.6180339887)) if n > 1 else 1
+        while math.gcd(self.factor, max(n, 1)) != 1:
+            self.factor += 1
+        self.inverso = pow(self.factor, -1, n) if n > 1 else 0
+
+    def elemento(self, rango):
+        return (rango * self.factor + self.desplazamiento) % self.n if self.n > 1 else 0
+
+    def rango(self, elemento):
+        return ((elemento - self.desplazamiento) * self.inverso) % self.n if self.n > 1 else 0
+
+# 🔹 Reservar n ids consecutivos de la secuencia de una tabla; devuelve el primero
+# (no debe haber otros procesos insertando en la tabla a la vez)
+def reservar_rango(cursor, tabla, n):
+    if n == 0:
+        return None
+    secuencia = f'"{tabla}"'
+    cursor.execute("SELECT setval(pg_get_serial_sequence(%s, 'Id'), nextval(pg_get_serial_sequence(%s, 'Id')) + %s - 1)",
+                   (secuencia, secuencia, n))
+    return cursor.fetchone()[0] - n + 1
+
+# 🔹 Catálogo sintético: sabe calcular cada fila de cada tabla a partir de la semilla
+class CatalogoSintetico:
+    def __init__(self, canciones, semilla=1, artistas=None, usuarios=None, canciones_por_album=10,
+                 listas_por_usuario=2, canciones_por_lista=30, escuchas_por_usuario=20,
+                 likes_por_usuario=5, amigos_por_usuario=5, zipf=1.1, hash_password="sin-password"):
+        self.semilla = semilla
+        self.canciones = canciones
+        self.artistas = artistas or max(1, canciones // 20)
+        self.usuarios = usuarios or max(1, canciones // 10)
+        self.canciones_por_album = canciones_por_album
+        self.albumes = math.ceil(canciones / canciones_por_album)
+        self.listas_por_usuario = listas_por_usuario
+        self.canciones_por_lista = canciones_por_lista
+        self.escuchas_por_usuario = escuchas_por_usuario
+        self.likes_por_usuario = likes_por_usuario
+        self.amigos_por_usuario = amigos_por_usuario
+        self.zipf = zipf
+        self.hash_password = hash_password
+
+        self.popularidad_canciones = Permutacion(canciones, semilla)
+        self.popularidad_artistas = Permutacion(self.artistas, semilla + 1)
+        self.popularidad_usuarios = Permutacion(self.usuarios, semilla + 2)
+        self.popularidad_listas = None
+
+    def aleatorio(self, flujo, i):
+        return random.Random((self.semilla * 64 + flujo) * 2 ** 40 + i)
+
+    # Muestra k elementos distintos de 0..n-1 según su popularidad
+    def muestra_zipf(self, aleatorio, permutacion, k):
+        # Sin pedir más de la mitad, para que los últimos elementos distintos no cuesten demasiados intentos
+        k = min(k, max(1, permutacion.n // 2)) if permutacion.n else 0
+        elegidos = {}
+        while len(elegidos) < k:
+            elegidos.setdefault(permutacion.elemento(rango_zipf(aleatorio, permutacion.n, self.zipf)), None)
+        return list(elegidos)
+
+    def cantidad(self, aleatorio, media):
+        return int(aleatorio.expovariate(1 / media)) if media > 0 else 0
+
+    # Nombres y datos derivados de los índices
+    def nombre_artista(self, i):
+        return f"Sintetico {self.semilla} Artista {i}"
+
+    def email(self, i):
+        return f"sintetico{self.semilla}.{i}@echobeat.test"
+
+    def nick(self, i):
+        return f"sintetico{self.semilla}_{i}"
+
+    def duracion(self, cancion):
+        return 90 + (cancion * 2654435761 + self.semilla) % 240
+
+    def reproducciones(self, cancion):
+        return int(MAX_REPRODUCCIONES / (self.popularidad_canciones.rango(cancion) + 1) ** self.zipf)
+
+    def canciones_album(self, album):
+        inicio = album * self.canciones_por_album
+        return range(inicio, min(self.canciones, inicio + self.canciones_por_album))
+
+    def artista_album(self, album):
+        return self.popularidad_artistas.elemento(rango_zipf(self.aleatorio(FLUJO_ALBUM, album), self.artistas, self.zipf))
+
+    def autores_cancion(self, cancion):
+        principal = self.artista_album(cancion // self.canciones_por_album)
+        aleatorio = self.aleatorio(FLUJO_CANCION, cancion)
+        if self.artistas > 1 and aleatorio.random() < 0.1:
+            invitado = self.popularidad_artistas.elemento(rango_zipf(aleatorio, self.artistas, self.zipf))
+            if invitado != principal:
+                return [principal, invitado]
+        return [principal]
+
+    # Listas de reproducción de cada usuario: cuántas tiene y qué canciones lleva cada una
+    def listas_de_usuario(self, usuario):
+        return self.cantidad(self.aleatorio(FLUJO_USUARIO, usuario), self.listas_por_usuario)
+
+    def canciones_lista(self, lista):
+        aleatorio = self.aleatorio(FLUJO_LISTA, lista)
+        # Longitud log-normal con la media pedida: la mayoría son cortas y unas pocas muy largas
+        longitud = min(5000, int(aleatorio.lognormvariate(math.log(self.canciones_por_lista) - 0.5, 1)) + 1)
+        return self.muestra_zipf(aleatorio, self.popularidad_canciones, longitud)
+
+    # 🔹 Filas de cada tabla
+    # Los oyentes de cada artista se calculan después, al cargar, sumando las reproducciones de sus canciones
+    def filas_artista(self):
+        for i in range(self.artistas):
+            yield self.nombre_artista(i), "Biografía no disponible", 0, "URL_por_defecto"
+
+    def filas_lista_album(self, primer_id):
+        for album in range(self.albumes):
+            canciones = self.canciones_album(album)
+            yield (primer_id + album, f"Album sintetico {self.semilla}-{album}", len(canciones),
+                   sum(self.duracion(c) for c in canciones), 0, "Álbum musical", "URL_por_defecto", "Album")
+
+    # Las reproducciones de un álbum son las de sus canciones, como las mantiene agregarContadores
+    def filas_album(self, primer_id):
+        for album in range(self.albumes):
+            fecha = FECHA_INICIAL + datetime.timedelta(days=(album * 7919) % 12000)
+            yield primer_id + album, sum(self.reproducciones(c) for c in self.canciones_album(album)), fecha
+
+    def filas_cancion(self, primer_id):
+        for cancion in range(self.canciones):
+            aleatorio = self.aleatorio(FLUJO_CANCION, cancion)
+            nombre = f"{aleatorio.choice(PALABRAS).capitalize()} {aleatorio.choice(PALABRAS)} {cancion}"
+            reproducciones = self.reproducciones(cancion)
+            yield (primer_id + cancion, nombre, self.duracion(cancion), aleatorio.choice(GENEROS_FIJOS),
+                   reproducciones, reproducciones // 50, "URL_por_defecto")
+
+    def filas_autor_album(self, primer_id_lista):
+        for album in range(self.albumes):
+            yield primer_id_lista + album, self.nombre_artista(self.artista_album(album))
+
+    def filas_autor_cancion(self, primer_id_cancion):
+        for cancion in range(self.canciones):
+            for artista in self.autores_cancion(cancion):
+                yield primer_id_cancion + cancion, self.nombre_artista(artista)
+
+    def filas_posicion_album(self, primer_id_lista, primer_id_cancion):
+        for album in range(self.albumes):
+            for posicion, cancion in enumerate(self.canciones_album(album), start=1):
+                yield primer_id_lista + album, primer_id_cancion + cancion, posicion
+
+    def filas_usuario(self):
+        for i in range(self.usuarios):
+            aleatorio = self.aleatorio(FLUJO_USUARIO, i)
+            nacimiento = datetime.date(1960, 1, 1) + datetime.timedelta(days=aleatorio.randrange(16000))
+            yield self.email(i), f"Usuario sintetico {i}", self.hash_password, nacimiento, self.nick(i), aleatorio.choice(PRIVACIDADES)
+
+    # Recorre las listas de reproducción en orden: (índice global, usuario)
+    def listas_de_reproduccion(self):
+        lista = 0
+        for usuario in range(self.usuarios):
+            for _ in range(self.listas_de_usuario(usuario)):
+                yield lista, usuario
+                lista += 1
+
+    def filas_lista_reproduccion_lista(self, primer_id):
+        for lista, usuario in self.listas_de_reproduccion():
+            canciones = self.canciones_lista(lista)
+            yield (primer_id + lista, f"Lista {lista}", len(canciones), sum(self.duracion(c) for c in canciones),
+                   0, f"Lista de {self.nick(usuario)}", "URL_por_defecto", "ListaReproduccion")
+
+    def filas_lista_reproduccion(self, primer_id):
+        for lista, usuario in self.listas_de_reproduccion():
+            aleatorio = self.aleatorio(FLUJO_LISTA, lista)
+            yield (primer_id + lista, f"Lista {lista}", PRIVACIDADES[lista % 3], self.email(usuario),
+                   GENEROS_FIJOS[lista % len(GENEROS_FIJOS)] if aleatorio.random() < 0.5 else "Sin genero")
+
+    def filas_posicion_lista(self, primer_id, primer_id_cancion):
+        for lista, _ in self.listas_de_reproduccion():
+            for posicion, cancion in enumerate(self.canciones_lista(lista), start=1):
+                yield primer_id + lista, primer_id_cancion + cancion, posicion
+
+    def filas_like(self, primer_id_lista):
+        for usuario in range(self.usuarios):
+            aleatorio = self.aleatorio(FLUJO_LIKES, usuario)
+            for lista in self.muestra_zipf(aleatorio, self.popularidad_listas, self.cantidad(aleatorio, self.likes_por_usuario)):
+                yield self.email(usuario), primer_id_lista + lista, True
+
+    def filas_cancion_escuchada(self, primer_id_cancion):
+        for usuario in range(self.usuarios):
+            aleatorio = self.aleatorio(FLUJO_ESCUCHAS, usuario)
+            for cancion in self.muestra_zipf(aleatorio, self.popularidad_canciones, self.cantidad(aleatorio, self.escuchas_por_usuario)):
+                yield self.email(usuario), primer_id_cancion + cancion, 1 + self.cantidad(aleatorio, 5)
+
+    def filas_amistad(self):
+        for usuario in range(self.usuarios):
+            aleatorio = self.aleatorio(FLUJO_AMIGOS, usuario)
+            for amigo in self.muestra_zipf(aleatorio, self.popularidad_usuarios, self.cantidad(aleatorio, self.amigos_por_usuario)):
+                if amigo == usuario:
+                    continue
+                aceptada = aleatorio.random() < 0.8
+                fecha = datetime.datetime(2024, 1, 1) + datetime.timedelta(minutes=aleatorio.randrange(1_000_000)) if aceptada else None
+                yield self.nick(usuario), self.nick(amigo), "aceptada" if aceptada else "pendiente", fecha
+
+    # 🔹 Escribir todo el catálogo en el orden que exigen las claves ajenas
+    def cargar(self, cursor):
+        listas_reproduccion = sum(1 for _ in self.listas_de_reproduccion())
+        primer_album = reservar_rango(cursor, "Lista", self.albumes + listas_reproduccion)
+        primera_lista = primer_album + self.albumes
+        primera_cancion = reservar_rango(cursor, "Cancion", self.canciones)
+        # Los likes se reparten entre álbumes y listas de reproducción, que tienen ids consecutivos
+        self.popularidad_listas = Permutacion(self.albumes + listas_reproduccion, self.semilla + 3)
+
+        cursor.execute("""
+            INSERT INTO "Genero" ("NombreGenero") SELECT unnest(%s::text[]) ON CONFLICT DO NOTHING
+        """, (GENEROS_FIJOS,))
+
+        copiar(cursor, "Artista", ["Nombre", "Biografia", "NumOyentesTotales", "FotoPerfil"], self.filas_artista())
+        copiar(cursor, "Lista", ["Id", "Nombre", "NumCanciones", "Duracion", "NumLikes", "Descripcion", "Portada", "TipoLista"],
+               self.filas_lista_album(primer_album))
+        copiar(cursor, "Album", ["Id", "NumReproducciones", "FechaLanzamiento"], self.filas_album(primer_album))
+        copiar(cursor, "Cancion", ["Id", "Nombre", "Duracion", "Genero", "NumReproducciones", "NumFavoritos", "Portada"],
+               self.filas_cancion(primera_cancion))
+        copiar(cursor, "AutorAlbum", ["IdAlbum", "NombreArtista"], self.filas_autor_album(primer_album))
+        copiar(cursor, "AutorCancion", ["IdCancion", "NombreArtista"], self.filas_autor_cancion(primera_cancion))
+        copiar(cursor, "PosicionCancion", ["IdLista", "IdCancion", "Posicion"], self.filas_posicion_album(primer_album, primera_cancion))
+        copiar(cursor, "Usuario", ["Email", "NombreCompleto", "Password", "FechaNacimiento", "Nick", "Privacidad"], self.filas_usuario())
+        copiar(cursor, "Lista", ["Id", "Nombre", "NumCanciones", "Duracion", "NumLikes", "Descripcion", "Portada", "TipoLista"],
+               self.filas_lista_reproduccion_lista(primera_lista))
+        copiar(cursor, "ListaReproduccion", ["Id", "Nombre", "TipoPrivacidad", "EmailAutor", "Genero"],
+               self.filas_lista_reproduccion(primera_lista))
+        copiar(cursor, "PosicionCancion", ["IdLista", "IdCancion", "Posicion"], self.filas_posicion_lista(primera_lista, primera_cancion))
+        # Los contadores generados ya cuentan las escuchas y los likes: los disparadores de CambioContador
+        # no deben apuntarlas otra vez para agregarContadores (y con COPY serían millones de ejecuciones).
+        # Desactivarlos solo afecta a esta transacción, que bloquea las dos tablas hasta terminar.
+        for tabla, disparador in DISPARADORES_CONTADORES:
+            cursor.execute(f'ALTER TABLE "{tabla}" DISABLE TRIGGER "{disparador}"')
+        copiar(cursor, "Like", ["EmailUsuario", "IdLista", "tieneLike"], self.filas_like(primer_album))
+        copiar(cursor, "CancionEscuchada", ["EmailUsuario", "IdCancion", "NumReproducciones"], self.filas_cancion_escuchada(primera_cancion))
+        for tabla, disparador in DISPARADORES_CONTADORES:
+            cursor.execute(f'ALTER TABLE "{tabla}" ENABLE TRIGGER "{disparador}"')
+        copiar(cursor, "Amistad", ["NickFriendSender", "NickFriendReceiver", "EstadoSolicitud", "FechaComienzoAmistad"], self.filas_amistad())
+
+        # Contadores de likes coherentes con las filas de Like generadas
+        with cronometro("sql.num_likes"):
+            cursor.execute("""
+                UPDATE "Lista" l
+                SET "NumLikes" = t.total
+                FROM (
+                    SELECT "IdLista", COUNT(*) AS total FROM "Like"
+                    WHERE "tieneLike" AND "IdLista" BETWEEN %s AND %s
+                    GROUP BY "IdLista"
+                ) t
+                WHERE l."Id" = t."IdLista"
+            """, (primer_album, primer_album + self.albumes + listas_reproduccion - 1))
+
+        # Oyentes de cada artista: las reproducciones de las canciones en las que aparece (los artistas
+        # de esta semilla solo tienen canciones de esta semilla)
+        with cronometro("sql.num_oyentes"):
+            cursor.execute("""
+                UPDATE "Artista" a
+                SET "NumOyentesTotales" = t.total
+                FROM (
+                    SELECT ac."NombreArtista", SUM(c."NumReproducciones") AS total
+                    FROM "AutorCancion" ac
+                    JOIN "Cancion" c ON c."Id" = ac."IdCancion"
+                    WHERE ac."IdCancion" BETWEEN %s AND %s
+                    GROUP BY ac."NombreArtista"
+                ) t
+                WHERE a."Nombre" = t."NombreArtista"
+            """, (primera_cancion, primera_cancion + self.canciones - 1))
+
+# 🔹 Generar el catálogo y actualizar las estadísticas para que el planificador vea los nuevos volúmenes
+def generar_catalogo(catalogo):
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            # Si el proceso se cae no se pierde nada que no se pueda volver a generar
+            cursor.execute("SET LOCAL synchronous_commit = off")
+            catalogo.cargar(cursor)
+        conn.commit()
+
+        with cronometro("sql.analyze"):
+            conn.autocommit = True
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute('ANALYZE "Artista", "Lista", "Album", "Cancion", "AutorAlbum", "AutorCancion", "PosicionCancion", '
+                                   '"Usuario", "ListaReproduccion", "Like", "CancionEscuchada", "Amistad"')
+            finally:
+                conn.autocommit = False
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera un catálogo sintético para pruebas de carga")
+    parser.add_argument("--canciones", type=int, default=1_000_000)
+    parser.add_argument("--semilla", type=int, default=1)
+    parser.add_argument("--artistas", type=int, help="por defecto, una vigésima parte de las canciones")
+    parser.add_argument("--usuarios", type=int, help="por defecto, una décima parte de las canciones")
+    parser.add_argument("--canciones-por-album", type=int, default=10)
+    parser.add_argument("--listas-por-usuario", type=float, default=2, help="media")
+    parser.add_argument("--canciones-por-lista", type=float, default=30, help="media")
+    parser.add_argument("--escuchas-por-usuario", type=float, default=20, help="media")
+    parser.add_argument("--likes-por-usuario", type=float, default=5, help="media")
+    parser.add_argument("--amigos-por-usuario", type=float, default=5, help="media")
+    parser.add_argument("--zipf", type=float, default=1.1, help="exponente de la ley de Zipf")
+    parser.add_argument("--hash-password", default="sin-password",
+                        help="hash bcrypt que tendrán todos los usuarios (por defecto no pueden iniciar sesión)")
+    args = parser.parse_args(argv)
+
+    catalogo = CatalogoSintetico(args.canciones, args.semilla, args.artistas, args.usuarios, args.canciones_por_album,
+                                 args.listas_por_usuario, args.canciones_por_lista, args.escuchas_por_usuario,
+                                 args.likes_por_usuario, args.amigos_por_usuario, args.zipf, args.hash_password)
+    try:
+        generar_catalogo(catalogo)
+    finally:
+        filas = sum(total for nombre, total in metricas.contadores.items() if nombre.startswith("filas."))
+        log(f"✅ {filas} filas generadas")
+        emitir_resumen()
+
+if __name__ == "__main__":
+    main()
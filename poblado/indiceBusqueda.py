@@ -0,0 +1,153 @@
+import argparse
+import re
+import unicodedata
+from conexiones import cargar_entorno, get_db_connection
+# Al ejecutarlo directamente, el .env tiene que estar cargado antes de importar los módulos que
+# leen sus opciones (POBLADO_*, JAMENDO_*)
+if __name__ == "__main__":
+    cargar_entorno()
+from copia import copiar
+from metricas import contar, cronometro, emitir_resumen, log
+
+# Índice de búsqueda precalculado para el servicio de búsqueda del backend.
+#   EntradaBusqueda   una fila por canción, artista, álbum, lista de reproducción o usuario, con su
+#                     nombre normalizado (Texto) y su popularidad (Peso)
+#   TerminoBusqueda   los términos de cada entrada: los trigramas de cada palabra y sus prefijos de
+#                     una y dos letras ("^a", "^ab")
+# Normalizar es pasar a minúsculas, quitar tildes y cambiar todo lo que no sea letra o número por un
+# espacio. Para buscar, se normaliza la consulta igual y se piden las entradas que tienen todos sus
+# términos (terminos_consulta) y cuyo Texto la contiene:
+#
+#   SELECT e."IdEntidad" FROM "EntradaBusqueda" e
+#   WHERE e."Tipo" = $1 AND e."Texto" LIKE '%' || $2 || '%' AND e."Id" IN (
+#       SELECT "IdEntrada" FROM "TerminoBusqueda" WHERE "Termino" = ANY($3)
+#       GROUP BY "IdEntrada" HAVING COUNT(*) = cardinality($3))
+#   ORDER BY e."Peso" DESC LIMIT 50
+#
+# Las palabras de la consulta de una o dos letras solo encuentran palabras que empiezan por ellas.
+# Cada ejecución es incremental: solo normaliza las entidades nuevas o renombradas, borra las que ya
+# no existen y actualiza la popularidad del resto con una sentencia por tipo.
+#
+#   python indiceBusqueda.py
+
+# Cada tipo de entrada: consulta con el id de la entidad, el texto que se indexa y su popularidad
+FUENTES = {
+    "cancion": 'SELECT "Id"::text AS id, "Nombre" AS nombre, "NumReproducciones"::float8 AS peso FROM "Cancion"',
+    "artista": 'SELECT "Nombre" AS id, "Nombre" AS nombre, "NumOyentesTotales"::float8 AS peso FROM "Artista"',
+    "album": """
+        SELECT l."Id"::text AS id, l."Nombre" AS nombre, a."NumReproducciones"::float8 AS peso
+        FROM "Lista" l JOIN "Album" a ON a."Id" = l."Id"
+    """,
+    "lista": """
+        SELECT l."Id"::text AS id, lr."Nombre" AS nombre, l."NumLikes"::float8 AS peso
+        FROM "Lista" l JOIN "ListaReproduccion" lr ON lr."Id" = l."Id"
+    """,
+    # Los usuarios no tienen popularidad; se buscan por nick y por nombre
+    "usuario": 'SELECT "Email" AS id, "Nick" || \' \' || "NombreCompleto" AS nombre, 0::float8 AS peso FROM "Usuario"',
+}
+
+NO_ALFANUMERICO = re.compile(r"[\W_]+")
+
+# 🔹 Normalización del texto (la misma que debe aplicar el backend a la consulta)
+def normalizar(texto):
+    sin_tildes = "".join(c for c in unicodedata.normalize("NFKD", texto) if not unicodedata.combining(c))
+    return NO_ALFANUMERICO.sub(" ", sin_tildes.lower()).strip()
+
+def terminos(texto):
+    resultado = set()
+    for palabra in texto.split():
+        resultado.add("^" + palabra[:1])
+        if len(palabra) > 1:
+            resultado.add("^" + palabra[:2])
+        resultado.update(palabra[i:i + 3] for i in range(len(palabra) - 2))
+    return resultado
+
+# Términos que debe tener una entrada para contener la consulta ya normalizada
+def terminos_consulta(consulta):
+    resultado = set()
+    for palabra in consulta.split():
+        if len(palabra) < 3:
+            resultado.add("^" + palabra)
+        else:
+            resultado.update(palabra[i:i + 3] for i in range(len(palabra) - 2))
+    return resultado
+
+# 🔹 Poner al día las entradas de un tipo
+def actualizar_tipo(cursor, tipo, fuente):
+    cursor.execute(f"""
+        DELETE FROM "EntradaBusqueda" e
+        WHERE e."Tipo" = %s AND NOT EXISTS (SELECT 1 FROM ({fuente}) f WHERE f.id = e."IdEntidad")
+    """, (tipo,))
+    contar("indice.borradas", cursor.rowcount)
+
+    cursor.execute(f"""
+        UPDATE "EntradaBusqueda" e
+        SET "Peso" = f.peso
+        FROM ({fuente}) f
+        WHERE e."Tipo" = %s AND e."IdEntidad" = f.id AND e."Peso" IS DISTINCT FROM f.peso
+    """, (tipo,))
+    contar("indice.pesos", cursor.rowcount)
+
+    # Entidades sin entrada o cuyo nombre ha cambiado desde la última ejecución
+    cursor.execute(f"""
+        SELECT f.id, f.nombre, f.peso
+        FROM ({fuente}) f
+        LEFT JOIN "EntradaBusqueda" e ON e."Tipo" = %s AND e."IdEntidad" = f.id
+        WHERE e."Id" IS NULL OR e."Nombre" IS DISTINCT FROM f.nombre
+    """, (tipo,))
+    pendientes = [(id_entidad, nombre, normalizar(nombre), peso) for id_entidad, nombre, peso in cursor.fetchall()]
+    if not pendientes:
+        log(f"✅ Índice de {tipo} al día")
+        return
+
+    cursor.execute("TRUNCATE indice_pendientes")
+    copiar(cursor, "indice_pendientes", ["IdEntidad", "Nombre", "Texto", "Peso"], iter(pendientes))
+    # xmax = 0 solo en las filas recién insertadas: las demás ya tenían términos que hay que sustituir
+    cursor.execute("""
+        INSERT INTO "EntradaBusqueda" ("Tipo", "IdEntidad", "Nombre", "Texto", "Peso")
+        SELECT %s, "IdEntidad", "Nombre", "Texto", "Peso" FROM indice_pendientes
+        ON CONFLICT ("Tipo", "IdEntidad") DO UPDATE
+        SET "Nombre" = EXCLUDED."Nombre", "Texto" = EXCLUDED."Texto", "Peso" = EXCLUDED."Peso"
+        RETURNING "Id", "IdEntidad", xmax = 0
+    """, (tipo,))
+    ids_entradas, renombradas = {}, []
+    for id_entrada, id_entidad, insertada in cursor.fetchall():
+        ids_entradas[id_entidad] = id_entrada
+        if not insertada:
+            renombradas.append(id_entrada)
+    if renombradas:
+        cursor.execute('DELETE FROM "TerminoBusqueda" WHERE "IdEntrada" = ANY(%s)', (renombradas,))
+
+    filas = ((termino, ids_entradas[id_entidad]) for id_entidad, _, texto, _ in pendientes for termino in terminos(texto))
+    copiar(cursor, "TerminoBusqueda", ["Termino", "IdEntrada"], filas)
+    contar("indice.nuevas", len(pendientes) - len(renombradas))
+    contar("indice.renombradas", len(renombradas))
+    log(f"✅ Índice de {tipo}: {len(pendientes) - len(renombradas)} nuevas y {len(renombradas)} renombradas")
+
+# 🔹 Actualizar el índice de todos los tipos en una transacción (dos ejecuciones a la vez se esperan)
+def actualizar_indice(tipos=None):
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(hashtext('indice_busqueda'))")
+            cursor.execute("""
+                CREATE TEMP TABLE indice_pendientes ("IdEntidad" text, "Nombre" text, "Texto" text, "Peso" float8)
+                ON COMMIT DROP
+            """)
+            for tipo in tipos or FUENTES:
+                with cronometro(f"indice.{tipo}"):
+                    actualizar_tipo(cursor, tipo, FUENTES[tipo])
+        conn.commit()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Actualiza el índice de búsqueda")
+    parser.add_argument("--tipo", dest="tipos", action="append", choices=list(FUENTES),
+                        help="tipo de entrada a actualizar; se puede repetir (por defecto, todos)")
+    args = parser.parse_args(argv)
+
+    try:
+        actualizar_indice(args.tipos)
+    finally:
+        emitir_resumen()
+
+if __name__ == "__main__":
+    main()
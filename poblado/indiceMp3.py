@@ -0,0 +1,145 @@
+import struct
+import sys
+from array import array
+
+# Formato del índice que se guarda junto a cada canción (blob "<canción>.idx"), en little-endian:
+# cabecera "<4sBHIII" = firma b"EBIX", versión, intervalo en ms, duración en ms, bitrate en bits/s
+# y número de entradas; después, una entrada uint32 por intervalo con el byte donde empieza el
+# frame que suena en ese instante.
+FIRMA_INDICE = b"EBIX"
+VERSION_INDICE = 1
+CABECERA_INDICE = "<4sBHIII"
+
+# Bitrates en kbps según (versión MPEG, capa); el índice 0 (formato libre) y el 15 no son válidos
+BITRATES = {
+    (1, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (1, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (1, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (2, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (2, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (2, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+FRECUENCIAS = {1: (44100, 48000, 32000), 2: (22050, 24000, 16000), 2.5: (11025, 12000, 8000)}
+VERSIONES = {0b00: 2.5, 0b10: 2, 0b11: 1}
+CAPAS = {0b01: 3, 0b10: 2, 0b11: 1}
+
+# 🔹 Lee la cabecera de un frame MPEG de audio en buf[i:i+4]
+# Devuelve (longitud del frame en bytes, muestras por frame, frecuencia) o None si no es válida
+def leer_cabecera(buf, i):
+    if buf[i] != 0xFF or (buf[i + 1] & 0xE0) != 0xE0:
+        return None
+
+    version = VERSIONES.get((buf[i + 1] >> 3) & 0b11)
+    capa = CAPAS.get((buf[i + 1] >> 1) & 0b11)
+    indice_bitrate = buf[i + 2] >> 4
+    indice_frecuencia = (buf[i + 2] >> 2) & 0b11
+    if version is None or capa is None or indice_bitrate in (0, 15) or indice_frecuencia == 3:
+        return None
+
+    bitrate = BITRATES[(1 if version == 1 else 2, capa)][indice_bitrate] * 1000
+    frecuencia = FRECUENCIAS[version][indice_frecuencia]
+    relleno = (buf[i + 2] >> 1) & 1
+
+    if capa == 1:
+        return (12 * bitrate // frecuencia + relleno) * 4, 384, frecuencia
+    if capa == 3 and version != 1:
+        return 72 * bitrate // frecuencia + relleno, 576, frecuencia
+    return 144 * bitrate // frecuencia + relleno, 1152, frecuencia
+
+# 🔹 Analizador incremental de MP3
+# Se le van pasando los trozos del fichero según llegan (alimentar) y recorre las cabeceras de
+# los frames sin guardar el audio: calcula la duración real, el bitrate medio y, cada
+# `intervalo` segundos, el byte en el que empieza el frame que suena en ese momento.
+class AnalizadorMp3:
+    def __init__(self, intervalo=1.0):
+        self.intervalo = intervalo
+        self.indice = []
+        self.segundos = 0.0
+        self.frames = 0
+        self.bytes_audio = 0
+        self._buffer = bytearray()
+        self._posicion = 0  # byte del fichero en el que empieza _buffer
+        self._saltar = 0
+        self._al_inicio = True
+        self._sincronizado = False
+
+    def alimentar(self, trozo):
+        self._buffer += trozo
+        buf = self._buffer
+        i = 0
+        while True:
+            # Saltar etiquetas ID3v2 (pueden no haber llegado enteras todavía)
+            if self._saltar:
+                avance = min(self._saltar, len(buf) - i)
+                i += avance
+                self._saltar -= avance
+                if self._saltar:
+                    break
+
+            if self._al_inicio:
+                if len(buf) - i < 10:
+                    break
+                if buf[i:i + 3] == b"ID3":
+                    tamano = (buf[i + 6] << 21) | (buf[i + 7] << 14) | (buf[i + 8] << 7) | buf[i + 9]
+                    self._saltar = 10 + tamano + (10 if buf[i + 5] & 0x10 else 0)
+                    continue
+                self._al_inicio = False
+
+            if len(buf) - i < 4:
+                break
+
+            cabecera = leer_cabecera(buf, i)
+            if cabecera is None:
+                # Buscar la siguiente posible marca de sincronización
+                self._sincronizado = False
+                siguiente = buf.find(b"\xff", i + 1)
+                i = siguiente if siguiente != -1 else len(buf)
+                continue
+
+            longitud, muestras, frecuencia = cabecera
+            if not self._sincronizado:
+                # Antes de fiarse de una cabecera suelta, comprobar que detrás empieza otro frame
+                if len(buf) - i < longitud + 4:
+                    break
+                if leer_cabecera(buf, i + longitud) is None:
+                    i += 1
+                    continue
+                self._sincronizado = True
+
+            if len(buf) - i < longitud:
+                break
+
+            while self.segundos >= len(self.indice) * self.intervalo:
+                self.indice.append(self._posicion + i)
+            self.segundos += muestras / frecuencia
+            self.frames += 1
+            self.bytes_audio += longitud
+            i += longitud
+
+        del buf[:i]
+        self._posicion += i
+
+    @property
+    def bitrate(self):
+        return int(self.bytes_audio * 8 / self.segundos) if self.segundos else 0
+
+    # 🔹 Serializa el índice en el formato compacto descrito arriba
+    def serializar(self):
+        entradas = array("I", self.indice)
+        if sys.byteorder != "little":
+            entradas.byteswap()
+        cabecera = struct.pack(CABECERA_INDICE, FIRMA_INDICE, VERSION_INDICE, int(self.intervalo * 1000),
+                               int(self.segundos * 1000), self.bitrate, len(entradas))
+        return cabecera + entradas.tobytes()
+
+# 🔹 Lee un índice serializado; devuelve (intervalo en s, duración en s, bitrate, lista de offsets)
+def leer_indice(datos):
+    firma, version, intervalo_ms, duracion_ms, bitrate, n = struct.unpack_from(CABECERA_INDICE, datos)
+    if firma != FIRMA_INDICE or version != VERSION_INDICE:
+        raise ValueError("El índice no tiene un formato válido")
+    entradas = array("I")
+    inicio = struct.calcsize(CABECERA_INDICE)
+    entradas.frombytes(datos[inicio:inicio + 4 * n])
+    if sys.byteorder != "little":
+        entradas.byteswap()
+    return intervalo_ms / 1000, duracion_ms / 1000, bitrate, list(entradas)
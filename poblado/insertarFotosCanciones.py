@@ -1,74 +1,97 @@
+import json
 import os
-import urllib.parse
-import psycopg2
-from azure.storage.blob import BlobServiceClient
-from dotenv import load_dotenv
-
-# Obtener la ruta correcta del archivo .env
-env_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "echo-beat-backend", ".env"))
-
-# Cargar el archivo .env desde la ubicación correcta
-load_dotenv(env_path)
+from psycopg2.extras import Json, execute_values
+from conexiones import cargar_entorno, get_db_connection
+# Al ejecutarlo directamente, el .env tiene que estar cargado antes de importar los módulos que
+# leen sus opciones (POBLADO_*, JAMENDO_*)
+if __name__ == "__main__":
+    cargar_entorno()
+from procesarPortadas import procesar_portadas
+from metricas import log
 
 # Configuración de Azure Blob Storage
-AZURE_CONNECTION_STRING = os.getenv("AZURE_STORAGE_CONNECTION_STRING")
 CONTAINER_NAME = "default-canciones-fotos"
 
-database_url = os.getenv("DATABASE_URL")
-if not database_url:
-    print("Error: No se encontró DATABASE_URL en el archivo .env")
-    exit()
+RUTA_IMAGENES = os.getenv("POBLADO_RUTA_FOTOS_CANCIONES", "C:\\Users\\jorda\\Downloads\\fotoscanciones")
 
-RUTA_IMAGENES = "C:\\Users\\jorda\\Downloads\\fotoscanciones"
+# Portadas subidas en la última ejecución, para asignarlas sin volver a procesar las imágenes
+RUTA_PORTADAS_SUBIDAS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "portadas_canciones.json")
 
-# Codificar correctamente la contraseña si es necesario
-parsed_url = urllib.parse.urlparse(database_url)
-password = urllib.parse.quote(parsed_url.password) if parsed_url.password else ""
-database_url_fixed = database_url.replace(parsed_url.password, password) if password else database_url
+def imagenes_a_subir():
+    imagenes = sorted(os.listdir(RUTA_IMAGENES))[:100]  # Limitar a 100 imágenes
+    return [os.path.join(RUTA_IMAGENES, imagen) for imagen in imagenes]
 
-# Conectar a la base de datos
-def get_db_connection():
-    conn = psycopg2.connect(database_url_fixed)
-    conn.cursor().execute("SET search_path TO public;") 
-    return conn
+# Tamaño y fecha de modificación de una imagen, para saber si ha cambiado desde que se subió
+def firma_imagen(ruta_archivo):
+    datos = os.stat(ruta_archivo)
+    return [datos.st_size, datos.st_mtime_ns]
 
-# 🔹 Función para subir foto genero a blob
-def subir_imagen_a_blob(nombre_archivo, ruta_archivo):
-    blob_service_client = BlobServiceClient.from_connection_string(AZURE_CONNECTION_STRING)
-    blob_client = blob_service_client.get_blob_client(container=CONTAINER_NAME, blob=nombre_archivo)
+def guardar_portadas(portadas, ruta=RUTA_PORTADAS_SUBIDAS):
+    datos = {ruta_archivo: {"firma": firma_imagen(ruta_archivo), "url": url, "variantes": variantes}
+             for ruta_archivo, (url, variantes) in portadas.items()}
+    temporal = f"{ruta}.tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(datos, f)
+    os.replace(temporal, ruta)
 
-    # Subir archivo al blob
-    with open(ruta_archivo, "rb") as data:
-        blob_client.upload_blob(data, overwrite=True)
-        print(f"✅ Imagen subida a Azure: {nombre_archivo}")
+# Portadas ya subidas de las rutas indicadas cuya imagen no ha cambiado desde entonces
+def leer_portadas(rutas, ruta=RUTA_PORTADAS_SUBIDAS):
+    if not os.path.exists(ruta):
+        return {}
+    with open(ruta, encoding="utf-8") as f:
+        datos = json.load(f)
+    return {ruta_archivo: (datos[ruta_archivo]["url"], datos[ruta_archivo]["variantes"]) for ruta_archivo in rutas
+            if ruta_archivo in datos and os.path.exists(ruta_archivo) and datos[ruta_archivo]["firma"] == firma_imagen(ruta_archivo)}
 
-        # Devolver la URL pública del archivo
-        return f"https://{blob_service_client.account_name}.blob.core.windows.net/{CONTAINER_NAME}/{nombre_archivo}"
+# 🔹 Subir todas las portadas (y sus versiones reducidas) a la vez
+# No toca la base de datos, así que se puede hacer mientras se insertan las canciones.
+# Devuelve {ruta: (url, variantes)} con las portadas de las primeras 100 imágenes y lo guarda para
+# asignar_portadas, que así no tiene que repetir el trabajo cuando esta etapa se salta
+def subir_portadas_canciones():
+    portadas = procesar_portadas(CONTAINER_NAME, imagenes_a_subir())
+    guardar_portadas(portadas)
+    return portadas
+
+# 🔹 Asignar las portadas a las últimas 100 canciones
+# Si no se pasan, se usan las guardadas en la última subida y solo se procesan las imágenes que falten
+def asignar_portadas(portadas=None):
+    rutas = imagenes_a_subir()
+    if portadas is None:
+        portadas = leer_portadas(rutas)
+        faltan = [ruta_archivo for ruta_archivo in rutas if ruta_archivo not in portadas]
+        if faltan:
+            portadas.update(procesar_portadas(CONTAINER_NAME, faltan))
+            guardar_portadas(portadas)
 
-def insertar_fotos_en_canciones():
-    imagenes = sorted(os.listdir(RUTA_IMAGENES))[:100]  # Limitar a 100 imágenes
     with get_db_connection() as conn, conn.cursor() as cursor:
         cursor.execute("SELECT \"Id\", \"Nombre\" FROM \"Cancion\" ORDER BY \"Id\" DESC LIMIT 100")
         canciones = cursor.fetchall()
 
-        if len(canciones) != len(imagenes):
-            print(f"❌ El número de canciones ({len(canciones)}) no coincide con el número de imágenes ({len(imagenes)})")
+        if len(canciones) != len(rutas):
+            print(f"❌ El número de canciones ({len(canciones)}) no coincide con el número de imágenes ({len(rutas)})")
             return
-        
-        for (id_cancion, nombre_cancion), imagen in zip(canciones, imagenes):
-            ruta_archivo = os.path.join(RUTA_IMAGENES, imagen)
-            url_portada = subir_imagen_a_blob(imagen, ruta_archivo)
-
-            cursor.execute("""
-                UPDATE \"Cancion\"
-                SET \"Portada\" = %s
-                WHERE \"Id\" = %s
-            """, (url_portada, id_cancion))
-            print(f"✅ Portada actualizada para la canción: {nombre_cancion}")
+
+        valores = []
+        for (id_cancion, nombre_cancion), ruta_archivo in zip(canciones, rutas):
+            if ruta_archivo not in portadas:
+                continue
+            url_portada, variantes = portadas[ruta_archivo]
+            valores.append((id_cancion, url_portada, Json(variantes)))
+
+        # Actualizar todas las canciones en una sola sentencia
+        execute_values(cursor, """
+            UPDATE \"Cancion\" c
+            SET \"Portada\" = v.portada, \"PortadaVariantes\" = v.variantes
+            FROM (VALUES %s) AS v(id, portada, variantes)
+            WHERE c.\"Id\" = v.id
+        """, valores, template="(%s, %s, %s::jsonb)", page_size=1000)
 
         conn.commit()
-        print("✅ Todas las portadas han sido actualizadas en la base de datos.")
+        log(f"✅ {len(valores)} portadas han sido actualizadas en la base de datos.")
+
+def insertar_fotos_en_canciones():
+    asignar_portadas(subir_portadas_canciones())
 
 if __name__ == "__main__":
     insertar_fotos_en_canciones()
-    print("✅ Proceso de inserción de fotos en canciones completado.")
\ No newline at end of file
+    log("✅ Proceso de inserción de fotos en canciones completado.")
@@ -0,0 +1,123 @@
+import argparse
+import bisect
+import datetime
+import json
+import random
+import struct
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Servidor HTTP que imita la API de canciones de Jamendo para las pruebas de rendimiento.
+# Sirve /v3.0/tracks/ (limit, offset y datebetween, ordenado por fecha de publicación) con un
+# catálogo sintético y determinista, y /audio/<id>.mp3 con un MP3 válido de la duración pedida.
+
+CANCIONES_POR_ALBUM = 10
+CANCIONES_POR_DIA = 50
+FECHA_INICIAL = datetime.date(2000, 1, 1)
+
+# Frame MPEG-1 capa III a 128 kbps y 44,1 kHz sin relleno: 417 bytes y 1152 muestras
+CABECERA_FRAME = b"\xff\xfb\x90\x00"
+LONGITUD_FRAME = 417
+SEGUNDOS_FRAME = 1152 / 44100
+
+# 🔹 Catálogo sintético: la canción i se genera siempre igual a partir de su número
+class CatalogoFalso:
+    def __init__(self, total, segundos, semilla=0):
+        self.total = total
+        self.semilla = semilla
+        self.frames = max(1, round(segundos / SEGUNDOS_FRAME))
+        # Fechas de publicación ya ordenadas, para buscar el inicio de datebetween por bisección
+        self.fechas = [self.fecha(i).isoformat() for i in range(total)]
+        # Todas las canciones comparten el audio salvo el primer frame, que lleva el id y la semilla
+        # para que cada fichero tenga un hash distinto
+        frame_vacio = CABECERA_FRAME + bytes(LONGITUD_FRAME - len(CABECERA_FRAME))
+        self.resto_audio = frame_vacio * (self.frames - 1)
+
+    def fecha(self, i):
+        return FECHA_INICIAL + datetime.timedelta(days=i // CANCIONES_POR_DIA)
+
+    def track(self, i, url_base):
+        aleatorio = random.Random(i)
+        album = i // CANCIONES_POR_ALBUM
+        # Pocos artistas con muchos álbumes y muchos artistas con pocos, como en el catálogo real
+        artista = int(random.Random(album).paretovariate(1.2)) % max(1, self.total // 20)
+        artistas = [f"Artista {artista}"]
+        if aleatorio.random() < 0.1:
+            artistas.append(f"Artista {aleatorio.randrange(max(1, self.total // 20))}")
+        return {
+            "id": str(i + 1),
+            "name": f"Cancion {i + 1}",
+            "duration": round(self.frames * SEGUNDOS_FRAME),
+            "artist_name": ",".join(artistas),
+            "album_name": f"Album {album}",
+            "releasedate": self.fechas[i],
+            "audio": f"{url_base}/audio/{i + 1}.mp3",
+            "license_ccurl": "http://creativecommons.org/licenses/by/3.0/",
+        }
+
+    def pagina(self, offset, limite, desde, url_base):
+        inicio = bisect.bisect_left(self.fechas, desde) if desde else 0
+        primero = min(self.total, inicio + offset)
+        ultimo = min(self.total, primero + limite)
+        return [self.track(i, url_base) for i in range(primero, ultimo)]
+
+    def audio(self, id_cancion):
+        marca = struct.pack("<QQ", id_cancion, self.semilla)
+        primer_frame = CABECERA_FRAME + marca + bytes(LONGITUD_FRAME - len(CABECERA_FRAME) - len(marca))
+        return primer_frame + self.resto_audio
+
+class ManejadorJamendo(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        catalogo = self.server.catalogo
+
+        if url.path.rstrip("/") == "/v3.0/tracks":
+            params = urllib.parse.parse_qs(url.query)
+            offset = int(params.get("offset", ["0"])[0])
+            limite = min(200, int(params.get("limit", ["10"])[0]))
+            desde = params["datebetween"][0].split("_")[0] if "datebetween" in params else None
+            url_base = f"http://{self.headers.get('Host')}"
+            resultados = catalogo.pagina(offset, limite, desde, url_base)
+            cuerpo = json.dumps({"headers": {"status": "success", "results_count": len(resultados)},
+                                 "results": resultados}).encode("utf-8")
+            self.responder(200, "application/json", cuerpo)
+        elif url.path.startswith("/audio/") and url.path.endswith(".mp3"):
+            id_cancion = int(url.path[len("/audio/"):-len(".mp3")])
+            if not 1 <= id_cancion <= catalogo.total:
+                self.responder(404, "text/plain", b"")
+            else:
+                self.responder(200, "audio/mpeg", catalogo.audio(id_cancion))
+        else:
+            self.responder(404, "text/plain", b"")
+
+    def responder(self, estado, content_type, cuerpo):
+        self.send_response(estado)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, format, *args):
+        pass
+
+# 🔹 Crea el servidor (puerto 0 para que el sistema elija uno libre)
+def crear_servidor(total, segundos=10, semilla=0, host="127.0.0.1", puerto=0):
+    servidor = ThreadingHTTPServer((host, puerto), ManejadorJamendo)
+    servidor.daemon_threads = True
+    servidor.catalogo = CatalogoFalso(total, segundos, semilla)
+    return servidor
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor local que imita la API de Jamendo")
+    parser.add_argument("--canciones", type=int, default=1000)
+    parser.add_argument("--segundos", type=float, default=10, help="duración de cada MP3")
+    parser.add_argument("--semilla", type=int, default=0, help="cambia el contenido (y el hash) de los audios")
+    parser.add_argument("--puerto", type=int, default=8765)
+    args = parser.parse_args(argv)
+
+    servidor = crear_servidor(args.canciones, args.segundos, args.semilla, puerto=args.puerto)
+    print(f"🎧 Jamendo falso en http://127.0.0.1:{servidor.server_address[1]}/v3.0/tracks/ con {args.canciones} canciones")
+    servidor.serve_forever()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+import cProfile
+import json
+import math
+import os
+import pstats
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Métricas del poblado: contadores, bytes transferidos e histogramas de latencia por operación.
+# Se acumulan en memoria desde cualquier hilo y se vuelcan como JSON al terminar la ejecución.
+#   POBLADO_SILENCIOSO=1     no muestra los mensajes de progreso (los errores sí)
+#   POBLADO_METRICAS=ruta    guarda el resumen JSON en un fichero en lugar de mostrarlo
+#   POBLADO_PERFIL=ruta      ejecuta el poblado con cProfile (en todos sus hilos) y guarda las estadísticas
+#   POBLADO_TRAZA=ruta       guarda cada operación medida en formato Trace Event (chrome://tracing, Perfetto)
+SILENCIOSO = os.getenv("POBLADO_SILENCIOSO", "") not in ("", "0")
+RUTA_METRICAS = os.getenv("POBLADO_METRICAS")
+RUTA_PERFIL = os.getenv("POBLADO_PERFIL")
+RUTA_TRAZA = os.getenv("POBLADO_TRAZA")
+
+# Cubetas de los histogramas: ocho por cada potencia de dos de microsegundos (un 9 % de ancho)
+CUBETAS_POR_OCTAVA = 8
+
+# 🔹 Histograma de latencias con cubetas logarítmicas: ocupa lo mismo con 10 medidas que con 10 millones
+class Histograma:
+    def __init__(self):
+        self.cubetas = {}
+        self.cuenta = 0
+        self.total = 0.0
+        self.minimo = math.inf
+        self.maximo = 0.0
+
+    def observar(self, segundos):
+        microsegundos = max(segundos * 1e6, 1)
+        cubeta = int(math.log2(microsegundos) * CUBETAS_POR_OCTAVA)
+        self.cubetas[cubeta] = self.cubetas.get(cubeta, 0) + 1
+        self.cuenta += 1
+        self.total += segundos
+        self.minimo = min(self.minimo, segundos)
+        self.maximo = max(self.maximo, segundos)
+
+    # Límite superior de la cubeta en la que cae el percentil p (nunca más que el máximo observado)
+    def percentil(self, p):
+        objetivo = math.ceil(self.cuenta * p / 100)
+        acumulado = 0
+        for cubeta in sorted(self.cubetas):
+            acumulado += self.cubetas[cubeta]
+            if acumulado >= objetivo:
+                return min(2 ** ((cubeta + 1) / CUBETAS_POR_OCTAVA) / 1e6, self.maximo)
+        return self.maximo
+
+    def resumen(self):
+        return {
+            "cuenta": self.cuenta,
+            "total_s": round(self.total, 6),
+            "media_ms": round(self.total / self.cuenta * 1000, 3),
+            "min_ms": round(self.minimo * 1000, 3),
+            "p50_ms": round(self.percentil(50) * 1000, 3),
+            "p90_ms": round(self.percentil(90) * 1000, 3),
+            "p99_ms": round(self.percentil(99) * 1000, 3),
+            "max_ms": round(self.maximo * 1000, 3),
+        }
+
+# 🔹 Registro de todas las métricas de una ejecución (se puede usar desde varios hilos)
+class Metricas:
+    def __init__(self, ruta_traza=RUTA_TRAZA):
+        self._lock = threading.Lock()
+        self._traza = None
+        if ruta_traza:
+            self._traza = open(ruta_traza, "w", encoding="utf-8")
+            self._traza.write("[\n")
+        self.reiniciar()
+
+    def reiniciar(self):
+        with self._lock:
+            self.inicio = time.perf_counter()
+            self.contadores = {}
+            self.bytes = {}
+            self.latencias = {}
+
+    def contar(self, nombre, n=1):
+        with self._lock:
+            self.contadores[nombre] = self.contadores.get(nombre, 0) + n
+
+    def sumar_bytes(self, nombre, n):
+        with self._lock:
+            self.bytes[nombre] = self.bytes.get(nombre, 0) + n
+
+    def observar(self, nombre, segundos, inicio=None):
+        with self._lock:
+            histograma = self.latencias.get(nombre)
+            if histograma is None:
+                histograma = self.latencias[nombre] = Histograma()
+            histograma.observar(segundos)
+            if self._traza is not None:
+                inicio = inicio if inicio is not None else time.perf_counter() - segundos
+                self._traza.write(json.dumps({"name": nombre, "ph": "X", "pid": os.getpid(), "tid": threading.get_ident(),
+                                              "ts": round((inicio - self.inicio) * 1e6), "dur": round(segundos * 1e6)}) + ",\n")
+
+    def resumen(self):
+        with self._lock:
+            segundos = time.perf_counter() - self.inicio
+            return {
+                "segundos": round(segundos, 3),
+                "contadores": dict(self.contadores),
+                "bytes": dict(self.bytes),
+                "bytes_por_segundo": {nombre: round(total / segundos) for nombre, total in self.bytes.items()} if segundos else {},
+                "latencias": {nombre: histograma.resumen() for nombre, histograma in sorted(self.latencias.items())},
+            }
+
+    def cerrar_traza(self):
+        with self._lock:
+            if self._traza is not None:
+                # El formato admite que el array quede sin cerrar, así que la traza sirve aunque el proceso muera antes
+                self._traza.close()
+                self._traza = None
+
+metricas = Metricas()
+
+def contar(nombre, n=1):
+    metricas.contar(nombre, n)
+
+def sumar_bytes(nombre, n):
+    metricas.sumar_bytes(nombre, n)
+
+def observar(nombre, segundos):
+    metricas.observar(nombre, segundos)
+
+# 🔹 Mide lo que tarda el bloque with (también si termina con una excepción, que además se cuenta)
+@contextmanager
+def cronometro(nombre):
+    inicio = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        metricas.contar(f"{nombre}.errores")
+        raise
+    finally:
+        metricas.observar(nombre, time.perf_counter() - inicio, inicio)
+
+# 🔹 Mensajes de progreso: no se muestran en modo silencioso
+def log(mensaje):
+    if not SILENCIOSO:
+        print(mensaje)
+
+# 🔹 Resumen JSON de la ejecución: a un fichero si se indica, si no por la salida estándar
+def emitir_resumen(ruta=RUTA_METRICAS):
+    metricas.cerrar_traza()
+    resumen = metricas.resumen()
+    if ruta:
+        with open(ruta, "w", encoding="utf-8") as f:
+            json.dump(resumen, f, indent=2, ensure_ascii=False)
+    else:
+        print(json.dumps(resumen, ensure_ascii=False))
+    return resumen
+
+# 🔹 Ejecuta una función con cProfile si se ha pedido un fichero de perfil
+# El trabajo de verdad se hace en los hilos del pipeline, del planificador y de los ThreadPoolExecutor,
+# así que se perfilan todos los hilos que se arrancan mientras dura la función y las estadísticas se
+# juntan en un único fichero. Hasta Python 3.11 cada hilo necesita su propio Profile (se crea con
+# threading.setprofile al arrancar el hilo); desde 3.12 cProfile usa sys.monitoring, que ya ve todos los
+# hilos y solo admite un perfilador activo.
+def perfilar(funcion, *args, ruta=RUTA_PERFIL, **kwargs):
+    if not ruta:
+        return funcion(*args, **kwargs)
+
+    perfiles = [cProfile.Profile()]
+    lock_perfiles = threading.Lock()
+
+    def perfilar_hilo(*_):
+        perfil = cProfile.Profile()
+        with lock_perfiles:
+            perfiles.append(perfil)
+        # Sustituye a perfilar_hilo como función de perfil de este hilo
+        perfil.enable()
+
+    por_hilo = sys.version_info < (3, 12)
+    if por_hilo:
+        threading.setprofile(perfilar_hilo)
+    try:
+        return perfiles[0].runcall(funcion, *args, **kwargs)
+    finally:
+        if por_hilo:
+            threading.setprofile(None)
+        with lock_perfiles:
+            estadisticas = pstats.Stats(*perfiles)
+        estadisticas.dump_stats(ruta)
+        if not SILENCIOSO:
+            estadisticas.sort_stats("cumulative").print_stats(25)
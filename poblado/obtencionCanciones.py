@@ -1,67 +1,130 @@
-import requests
-from subirCancionesAlContainer import subir_a_azure
-from subirMetadatos import insertar_metadata, verificar_autores_de_todos_los_albumes, actualizar_listas, insertar_generos_aleatorios
-from crearListasPredefinidas import crear_listas_predefinidas
+import os
+from conexiones import cargar_entorno
+# Al ejecutarlo directamente, el .env tiene que estar cargado antes de importar los módulos que
+# leen sus opciones (POBLADO_*, JAMENDO_*)
+if __name__ == "__main__":
+    cargar_entorno()
+from cacheCatalogo import CacheCatalogo
+from etapasPoblado import ETAPAS, OBJETIVOS_POR_DEFECTO
+from planificador import ejecutar_etapas
+from crawlerJamendo import RecorridoJamendo
+from pipelineIngesta import ejecutar_pipeline
+from subirCancionesAlContainer import transferir_cancion
+from subirMetadatos import insertar_metadata_lote
+from metricas import contar, emitir_resumen, log, observar, perfilar
 
-# Client ID de Jamendo
-CLIENT_ID = "4ca1da2f"
+# Número de transferencias simultáneas (las escrituras en la base de datos van aparte)
+CONCURRENCIA = int(os.getenv("POBLADO_CONCURRENCIA", "4"))
+TRABAJADORES_BD = int(os.getenv("POBLADO_TRABAJADORES_BD", "1"))
+# Número de canciones que se escriben en la base de datos en cada transacción
+TAMANO_LOTE = int(os.getenv("POBLADO_TAMANO_LOTE", "100"))
+# Número de canciones nuevas que se piden a Jamendo en cada ejecución (vacío para todo el catálogo)
+MAX_CANCIONES = os.getenv("POBLADO_MAX_CANCIONES", "100")
+MAX_CANCIONES = int(MAX_CANCIONES) if MAX_CANCIONES else None
 
-# URL de la API para obtener 50 canciones libres de copyright
-URL = f"https://api.jamendo.com/v3.0/tracks/?client_id={CLIENT_ID}&format=json&limit=100&license=ccplus"
+# 🔹 Función para quedarse con los campos de Jamendo que se usan en la base de datos
+def extraer_datos(track):
+    nombre = track["name"]
+    return {
+        "id_jamendo": track["id"],
+        "nombre": nombre,
+        "artistas": track["artist_name"].split(","),  # Puede haber varios artistas
+        "album": track["album_name"],
+        "duracion": track["duration"],  # en segundos
+        "audio_url": track["audio"],
+        "licencia": track["license_ccurl"],  # Enlace a la licencia
+        "fecha_publicacion": track["releasedate"],  # Fecha de publicación
+        "generos": [genre["name"] for genre in track.get("musicinfo", {}).get("tags", [])],  # Obtener géneros
+        "nombre_archivo": f"{nombre.replace(' ', '_')}.mp3",
+    }
 
-# Hacer la petición a la API de Jamendo
-response = requests.get(URL)
+def mostrar_cancion(idx, cancion):
+    log(f"{idx+1}. 🎵 {cancion['nombre']} · {', '.join(cancion['artistas'])} · {cancion['album']} ({cancion['fecha_publicacion']})")
 
-if response.status_code == 200:
-    data = response.json()
+# 🔹 Etapas del pipeline: cada una recibe la canción y la devuelve con su resultado añadido
+def etapa_transferencia(cancion):
+    transferencia = transferir_cancion(cancion["nombre_archivo"], cancion["audio_url"])
+    if transferencia is None:
+        raise Exception(f"Error al descargar {cancion['nombre_archivo']}")
+    cancion["url_blob"] = transferencia["url"]
+    cancion["bytes"] = transferencia["bytes"]
+    # Guardar la duración medida en el propio MP3 en lugar de la que indica Jamendo
+    if transferencia["duracion"]:
+        cancion["duracion"] = round(transferencia["duracion"])
+    return cancion
 
-    if "results" in data:
-        for idx, track in enumerate(data["results"]):
-            nombre = track["name"]
-            artista = track["artist_name"].split(",")  # Puede haber varios artistas
-            album = track["album_name"]
-            duracion = track["duration"]  # en segundos
-            audio_url = track["audio"]
-            licencia = track["license_ccurl"]  # Enlace a la licencia
-            fecha_publicacion = track["releasedate"]  # Fecha de publicación
-            generos = [genre["name"] for genre in track.get("musicinfo", {}).get("tags", [])]  # Obtener géneros
-            nombre_archivo = f"{nombre.replace(' ', '_')}.mp3"
+def etapa_metadatos(canciones, cache=None):
+    ids = insertar_metadata_lote(canciones, cache)
+    if ids is None:
+        raise Exception(f"No se pudo guardar la metadata de {len(canciones)} canciones")
+    for cancion, (cancion_id, album_id) in zip(canciones, ids):
+        cancion["id"] = cancion_id
+        cancion["id_album"] = album_id
+    return canciones
 
-            print(f"{idx+1}. 🎵 {nombre}")
-            print(f"   🎤 Artista: {artista}")
-            print(f"   📀 Álbum: {album}")
-            print(f"   ⏱️ Duración: {duracion} segundos")
-            print(f"   🔗 Descargar: {audio_url}")
-            print(f"   📜 Licencia: {licencia}")
-            print(f"   📅 Publicado en: {fecha_publicacion}")
-            print(f"   🎶 Géneros: {', '.join(generos)}")
-            print("-" * 50)  # Separador entre canciones
+def canciones_a_procesar(tracks):
+    for idx, track in enumerate(tracks):
+        cancion = extraer_datos(track)
+        mostrar_cancion(idx, cancion)
+        yield cancion
 
-            #🔹 Subir canción a Azure Blob Storage
-            url_blob = subir_a_azure(nombre_archivo, audio_url)
-            if url_blob:
-            #🔹 Guardar metadata en Azure SQL Database
-                insertar_metadata(nombre, artista, album, duracion, licencia, url_blob, fecha_publicacion, generos)
+# Devuelve la función que registra la duración de cada etapa en las métricas y,
+# si se pasa medir, también se la comunica
+def medidor(medir=None):
+    def medir_etapa(etapa, segundos, elementos):
+        observar(f"etapa.{etapa}", segundos)
+        contar(f"etapa.{etapa}.elementos", elementos)
+        if medir is not None:
+            medir(etapa, segundos, elementos)
+    return medir_etapa
 
-        #🔹 Una vez que todas las canciones han sido insertadas, verificar autores de los álbumes
-        print("🔍 Verificando autores de todos los álbumes...")
-        verificar_autores_de_todos_los_albumes()
-        print("✅ Verificación de autores completada.")
+# 🔹 Función para transferir y guardar todas las canciones con varios trabajadores a la vez
+# Si se pasa medir, se llama como medir(etapa, segundos, elementos) tras cada llamada a una etapa del pipeline.
+# Devuelve (canciones insertadas, fallos)
+def ingerir(concurrencia=CONCURRENCIA, trabajadores_bd=TRABAJADORES_BD, tamano_lote=TAMANO_LOTE, max_canciones=MAX_CANCIONES,
+            medir=None, **opciones_crawler):
+    medir = medidor(medir)
+    recorrido = RecorridoJamendo(max_canciones, **opciones_crawler)
 
-        print("🎶 Insertando generos aleatorios...")
-        insertar_generos_aleatorios()
-        print("✅ Generos insertados.")
-        
-        print("🎵 Creando listas predefinidas...")
-        crear_listas_predefinidas()
-        print("✅ Listas predefinidas creadas.")
+    cache = CacheCatalogo()
+    cache.cargar()
 
-        print("🔄 Actualizando listas...")
-        actualizar_listas()
-        print("✅ Duracion y numCanciones de las listas actualizadas.")
-    else:
-        print("No se encontraron canciones.")
-else:
-    print("Error al conectar con la API de Jamendo")
+    etapas = [
+        ("transferencia", etapa_transferencia, concurrencia),
+        ("metadatos", lambda canciones: etapa_metadatos(canciones, cache), trabajadores_bd, tamano_lote),
+    ]
+    # El checkpoint solo avanza sobre las canciones que ya tienen su metadata guardada (o han fallado
+    # y quedan para reintentarlas en la próxima ejecución)
+    insertadas, fallos = ejecutar_pipeline(canciones_a_procesar(recorrido.canciones()), etapas, capacidad=concurrencia * 2,
+                                           medir=medir, al_terminar=lambda cancion, error: recorrido.terminar(cancion["id_jamendo"], error))
 
+    if not insertadas and not fallos:
+        log("No se encontraron canciones nuevas.")
+        return insertadas, fallos
 
+    log(f"✅ {len(insertadas)} canciones insertadas, {len(fallos)} con errores.")
+    contar("cache.aciertos", cache.aciertos)
+    contar("cache.fallos", cache.fallos)
+    contar("canciones.fallidas", len(fallos))
+    for fallo in fallos:
+        nombre = fallo["elemento"]["nombre"] if fallo["elemento"] else "-"
+        print(f"❌ [{fallo['etapa']}] {nombre}: {fallo['error']}")
+    return insertadas, fallos
+
+# 🔹 Ingesta completa: las canciones y después los pasos que dependen de ellas (ver etapasPoblado),
+# con los que son independientes en paralelo
+# Devuelve (canciones insertadas, fallos)
+def poblar(concurrencia=CONCURRENCIA, trabajadores_bd=TRABAJADORES_BD, tamano_lote=TAMANO_LOTE, max_canciones=MAX_CANCIONES,
+           medir=None, **opciones_crawler):
+    contexto = {"opciones_ingesta": dict(concurrencia=concurrencia, trabajadores_bd=trabajadores_bd, tamano_lote=tamano_lote,
+                                         max_canciones=max_canciones, medir=medir, **opciones_crawler)}
+    # Sin fichero de estado: todas las etapas se ejecutan
+    ejecutar_etapas(ETAPAS, OBJETIVOS_POR_DEFECTO, contexto=contexto, ruta_estado=None, medir=medir)
+    ingesta = contexto.get("canciones") or {}
+    return ingesta.get("insertadas", []), ingesta.get("fallos", [])
+
+if __name__ == "__main__":
+    try:
+        perfilar(poblar)
+    finally:
+        emitir_resumen()
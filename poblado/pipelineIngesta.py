@@ -0,0 +1,128 @@
+import queue
+import threading
+import time
+
+# Marca de fin que se propaga de una etapa a la siguiente
+FIN = object()
+
+# 🔹 Función para ejecutar una serie de etapas conectadas por colas acotadas
+# Cada etapa es una tupla (nombre, funcion, trabajadores). La función recibe el elemento
+# producido por la etapa anterior y devuelve el que se pasará a la siguiente. Las colas
+# tienen un tamaño máximo (capacidad), de modo que una etapa lenta frena a las anteriores
+# y nunca hay más de capacidad + trabajadores elementos en memoria por etapa.
+# Los errores de un elemento se recogen en la lista de fallos y no detienen al resto.
+# Una etapa puede llevar un cuarto valor, tamano_lote: entonces su función recibe una lista
+# de hasta tamano_lote elementos y devuelve la lista de resultados.
+# Si se pasa medir, se llama como medir(etapa, segundos, elementos) tras cada llamada a una etapa.
+# Si se pasa al_terminar, se llama como al_terminar(elemento, error) en cuanto cada elemento sale de
+# la última etapa (error None) o falla en cualquiera; puede llamarse desde varios hilos a la vez.
+def ejecutar_pipeline(elementos, etapas, capacidad=8, espera_lote=0.5, medir=None, al_terminar=None):
+    colas = [queue.Queue(maxsize=capacidad) for _ in etapas] + [queue.Queue()]
+    fallos = []
+    lock_fallos = threading.Lock()
+
+    def registrar_fallo(elemento, etapa, error):
+        with lock_fallos:
+            fallos.append({"elemento": elemento, "etapa": etapa, "error": str(error)})
+        if al_terminar is not None and elemento is not None:
+            al_terminar(elemento, error)
+
+    def productor():
+        try:
+            for elemento in elementos:
+                colas[0].put(elemento)
+        except Exception as e:
+            registrar_fallo(None, "origen", e)
+        finally:
+            for _ in range(etapas[0][2]):
+                colas[0].put(FIN)
+
+    def medida(nombre, funcion, tamano_lote):
+        def funcion_medida(elemento):
+            inicio = time.perf_counter()
+            try:
+                return funcion(elemento)
+            finally:
+                medir(nombre, time.perf_counter() - inicio, len(elemento) if tamano_lote is not None else 1)
+        return funcion_medida
+
+    # 🔹 Leer de la cola un lote: espera al primer elemento y como mucho espera_lote segundos al resto
+    def leer_lote(entrada, tamano_lote):
+        lote = []
+        elemento = entrada.get()
+        while elemento is not FIN:
+            lote.append(elemento)
+            if len(lote) >= tamano_lote:
+                break
+            try:
+                elemento = entrada.get(timeout=espera_lote)
+            except queue.Empty:
+                break
+        return lote, elemento is FIN
+
+    def crear_trabajador(indice, nombre, funcion, tamano_lote):
+        if medir is not None:
+            funcion = medida(nombre, funcion, tamano_lote)
+        entrada, salida = colas[indice], colas[indice + 1]
+        # El último trabajador de la etapa avisa a todos los de la siguiente
+        siguientes = etapas[indice + 1][2] if indice + 1 < len(etapas) else 1
+        pendientes = pendientes_por_etapa[indice]
+
+        def trabajador():
+            while True:
+                if tamano_lote is None:
+                    elemento = entrada.get()
+                    if elemento is FIN:
+                        break
+                    try:
+                        salida.put(funcion(elemento))
+                    except Exception as e:
+                        registrar_fallo(elemento, nombre, e)
+                    continue
+
+                lote, terminado = leer_lote(entrada, tamano_lote)
+                if lote:
+                    try:
+                        for resultado in funcion(lote):
+                            salida.put(resultado)
+                    except Exception as e:
+                        for elemento in lote:
+                            registrar_fallo(elemento, nombre, e)
+                if terminado:
+                    break
+
+            with pendientes["lock"]:
+                pendientes["vivos"] -= 1
+                ultimo = pendientes["vivos"] == 0
+            if ultimo:
+                for _ in range(siguientes):
+                    salida.put(FIN)
+
+        return trabajador
+
+    pendientes_por_etapa = [{"vivos": etapa[2], "lock": threading.Lock()} for etapa in etapas]
+
+    hilos = [threading.Thread(target=productor, daemon=True)]
+    for indice, etapa in enumerate(etapas):
+        nombre, funcion, trabajadores = etapa[:3]
+        tamano_lote = etapa[3] if len(etapa) > 3 else None
+        for _ in range(trabajadores):
+            hilos.append(threading.Thread(target=crear_trabajador(indice, nombre, funcion, tamano_lote), daemon=True))
+
+    for hilo in hilos:
+        hilo.start()
+
+    # Recoger los resultados de la última etapa hasta recibir la marca de fin
+    resultados = []
+    while True:
+        elemento = colas[-1].get()
+        if elemento is FIN:
+            break
+        resultados.append(elemento)
+        if al_terminar is not None:
+            al_terminar(elemento, None)
+
+    for hilo in hilos:
+        hilo.join()
+
+    return resultados, fallos
@@ -0,0 +1,150 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from metricas import log, observar
+
+# Fichero donde se guarda, para cada etapa, la huella de sus entradas en la última ejecución correcta
+RUTA_ESTADO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "estado_etapas.json")
+
+# Estados en los que puede terminar una etapa
+EJECUTADA, SALTADA, FALLIDA, CANCELADA = "ejecutada", "saltada", "fallida", "cancelada"
+
+# 🔹 Etapa del poblado
+# funcion(contexto) hace el trabajo y lo que devuelve se guarda en contexto[nombre] para las
+# etapas que dependen de ella. huella(contexto), si se indica, resume las entradas de la etapa
+# (cualquier valor que se pueda pasar a JSON): si coincide con la de la última ejecución correcta,
+# la etapa se salta. Las etapas sin huella se ejecutan siempre. La huella se calcula antes de ejecutar la
+# etapa y es la que se guarda, así que no debe depender de lo que escribe la propia etapa: si no, no
+# coincidiría nunca en la siguiente ejecución.
+class Etapa:
+    def __init__(self, nombre, funcion, depende_de=(), huella=None, descripcion=""):
+        self.nombre = nombre
+        self.funcion = funcion
+        self.depende_de = list(depende_de)
+        self.huella = huella
+        self.descripcion = descripcion
+
+def leer_estado(ruta=RUTA_ESTADO):
+    if not ruta or not os.path.exists(ruta):
+        return {}
+    with open(ruta, encoding="utf-8") as f:
+        return json.load(f)
+
+def guardar_estado(estado, ruta=RUTA_ESTADO):
+    temporal = f"{ruta}.tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(estado, f, indent=2, ensure_ascii=False)
+    os.replace(temporal, ruta)
+
+# 🔹 Comprobar que las dependencias existen y que no hay ciclos; devuelve las etapas por nombre
+def validar_etapas(etapas):
+    por_nombre = {etapa.nombre: etapa for etapa in etapas}
+    for etapa in etapas:
+        for dependencia in etapa.depende_de:
+            if dependencia not in por_nombre:
+                raise Exception(f"La etapa {etapa.nombre} depende de {dependencia}, que no existe")
+
+    visitadas, en_curso = set(), set()
+    def visitar(nombre):
+        if nombre in en_curso:
+            raise Exception(f"Hay un ciclo de dependencias en la etapa {nombre}")
+        if nombre not in visitadas:
+            en_curso.add(nombre)
+            for dependencia in por_nombre[nombre].depende_de:
+                visitar(dependencia)
+            en_curso.discard(nombre)
+            visitadas.add(nombre)
+    for nombre in por_nombre:
+        visitar(nombre)
+    return por_nombre
+
+# Etapas pedidas y, si se indica, todas aquellas de las que dependen
+def seleccionar(por_nombre, objetivos, con_dependencias):
+    if objetivos is None:
+        return set(por_nombre)
+    for objetivo in objetivos:
+        if objetivo not in por_nombre:
+            raise Exception(f"No existe la etapa {objetivo}")
+
+    seleccionadas = set()
+    pendientes = list(objetivos)
+    while pendientes:
+        nombre = pendientes.pop()
+        if nombre not in seleccionadas:
+            seleccionadas.add(nombre)
+            if con_dependencias:
+                pendientes.extend(por_nombre[nombre].depende_de)
+    return seleccionadas
+
+def huella_json(huella):
+    return json.dumps(huella, sort_keys=True, default=str)
+
+# 🔹 Ejecutar las etapas respetando sus dependencias, con las independientes en paralelo
+# Con objetivos solo se ejecutan esas etapas (y las suyas previas salvo con_dependencias=False,
+# que permite repetir una etapa sin volver a hacer todo lo anterior). Una etapa cuya dependencia
+# falla no se ejecuta. Con forzar=True no se salta ninguna etapa. Si se pasa medir, se llama como
+# medir(etapa, segundos, 1) tras cada etapa ejecutada.
+# Devuelve {nombre: estado} con las etapas seleccionadas.
+def ejecutar_etapas(etapas, objetivos=None, con_dependencias=True, forzar=False, paralelo=4,
+                    contexto=None, ruta_estado=RUTA_ESTADO, medir=None):
+    por_nombre = validar_etapas(etapas)
+    seleccionadas = seleccionar(por_nombre, objetivos, con_dependencias)
+    contexto = contexto if contexto is not None else {}
+    estado_guardado = leer_estado(ruta_estado)
+    lock_estado = threading.Lock()
+    resultados = {}
+
+    def ejecutar(etapa):
+        # Sin fichero de estado no hay con qué comparar, así que no se calcula la huella
+        huella = huella_json(etapa.huella(contexto)) if etapa.huella is not None and ruta_estado else None
+        anterior = estado_guardado.get(etapa.nombre, {}).get("huella")
+        if not forzar and huella is not None and huella == anterior:
+            log(f"⏭️ Etapa {etapa.nombre} sin cambios en sus entradas")
+            return SALTADA
+
+        log(f"▶️ Etapa {etapa.nombre}")
+        inicio = time.perf_counter()
+        contexto[etapa.nombre] = etapa.funcion(contexto)
+        segundos = time.perf_counter() - inicio
+        observar(f"etapa.{etapa.nombre}", segundos)
+        if medir is not None:
+            medir(etapa.nombre, segundos, 1)
+
+        if ruta_estado:
+            with lock_estado:
+                estado_guardado[etapa.nombre] = {"huella": huella, "fin": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                                                 "segundos": round(segundos, 3)}
+                guardar_estado(estado_guardado, ruta_estado)
+        log(f"✅ Etapa {etapa.nombre} terminada en {segundos:.1f} s")
+        return EJECUTADA
+
+    # Solo cuentan las dependencias que también se van a ejecutar
+    dependencias = {nombre: [d for d in por_nombre[nombre].depende_de if d in seleccionadas] for nombre in seleccionadas}
+    pendientes = set(seleccionadas)
+    en_curso = {}
+    with ThreadPoolExecutor(max_workers=max(1, paralelo)) as executor:
+        while pendientes or en_curso:
+            for nombre in sorted(pendientes):
+                estados = [resultados.get(d) for d in dependencias[nombre]]
+                if any(e in (FALLIDA, CANCELADA) for e in estados):
+                    log(f"⏹️ Etapa {nombre} cancelada porque falló una etapa previa")
+                    resultados[nombre] = CANCELADA
+                    pendientes.discard(nombre)
+                elif all(e in (EJECUTADA, SALTADA) for e in estados):
+                    en_curso[executor.submit(ejecutar, por_nombre[nombre])] = nombre
+                    pendientes.discard(nombre)
+
+            if not en_curso:
+                continue
+            terminadas, _ = wait(en_curso, return_when=FIRST_COMPLETED)
+            for futuro in terminadas:
+                nombre = en_curso.pop(futuro)
+                try:
+                    resultados[nombre] = futuro.result()
+                except Exception as e:
+                    print(f"❌ Error en la etapa {nombre}: {str(e)}")
+                    resultados[nombre] = FALLIDA
+
+    return resultados
@@ -0,0 +1,70 @@
+import io
+import mimetypes
+import os
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from almacenContenido import subir_datos_por_contenido, subir_fichero_por_contenido
+from metricas import log
+
+# Lados (en píxeles) de las versiones reducidas de cada portada, de mayor a menor
+RESOLUCIONES = (640, 256, 64)
+CALIDAD_JPEG = 85
+CALIDAD_WEBP = 80
+# Generar también versiones WebP, que ocupan bastante menos que las JPEG
+GENERAR_WEBP = os.getenv("POBLADO_PORTADAS_WEBP", "1") == "1"
+TRABAJADORES = int(os.getenv("POBLADO_TRABAJADORES_PORTADAS", "8"))
+
+def codificar(imagen, formato, calidad):
+    buffer = io.BytesIO()
+    imagen.save(buffer, format=formato, quality=calidad, optimize=True)
+    return buffer.getvalue()
+
+# 🔹 Función para generar las versiones reducidas de una imagen
+# La imagen se decodifica una sola vez y cada versión se obtiene reduciendo la anterior.
+# Devuelve el content type del original, según el formato que detecta PIL, y una lista de
+# (clave, datos, extension, content_type), p. ej. ("256", ...) o ("256.webp", ...)
+def generar_variantes(ruta_archivo, webp=GENERAR_WEBP):
+    variantes = []
+    with Image.open(ruta_archivo) as original:
+        content_type = Image.MIME.get(original.format) or mimetypes.guess_type(ruta_archivo)[0]
+        # En JPEG se decodifica directamente a una escala cercana a la mayor resolución
+        original.draft("RGB", (RESOLUCIONES[0], RESOLUCIONES[0]))
+        imagen = original.convert("RGB")
+
+    for lado in RESOLUCIONES:
+        imagen.thumbnail((lado, lado), Image.LANCZOS)
+        variantes.append((str(lado), codificar(imagen, "JPEG", CALIDAD_JPEG), ".jpg", "image/jpeg"))
+        if webp:
+            variantes.append((f"{lado}.webp", codificar(imagen, "WEBP", CALIDAD_WEBP), ".webp", "image/webp"))
+
+    return content_type, variantes
+
+# 🔹 Función para subir una portada y sus versiones reducidas
+# Devuelve (url_original, {clave: url}) con las URLs de cada versión
+def procesar_portada(contenedor, ruta_archivo):
+    content_type_original, variantes = generar_variantes(ruta_archivo)
+    url_original = subir_fichero_por_contenido(contenedor, ruta_archivo, content_type=content_type_original)
+    urls = {}
+    for clave, datos, extension, content_type in variantes:
+        urls[clave] = subir_datos_por_contenido(contenedor, datos, extension, content_type)
+    return url_original, urls
+
+# 🔹 Función para procesar muchas portadas a la vez
+# Devuelve un diccionario {ruta: (url_original, {clave: url})}; las que fallan se quedan fuera
+def procesar_portadas(contenedor, rutas, trabajadores=TRABAJADORES):
+    resultados = {}
+
+    def procesar(ruta):
+        try:
+            return ruta, procesar_portada(contenedor, ruta)
+        except Exception as e:
+            print(f"❌ Error al procesar la portada {os.path.basename(ruta)}: {str(e)}")
+            return ruta, None
+
+    with ThreadPoolExecutor(max_workers=trabajadores) as executor:
+        for ruta, resultado in executor.map(procesar, rutas):
+            if resultado is not None:
+                resultados[ruta] = resultado
+
+    log(f"✅ {len(resultados)} portadas procesadas con {len(RESOLUCIONES)} resoluciones")
+    return resultados
@@ -0,0 +1,308 @@
+import argparse
+import numpy as np
+import scipy.sparse as sp
+from conexiones import cargar_entorno, get_db_connection
+# Al ejecutarlo directamente, el .env tiene que estar cargado antes de importar los módulos que
+# leen sus opciones (POBLADO_*, JAMENDO_*)
+if __name__ == "__main__":
+    cargar_entorno()
+from copia import copiar
+from metricas import contar, cronometro, emitir_resumen, log
+
+# Cálculo por lotes de las recomendaciones que lee el backend:
+#   CancionSimilar        las canciones más parecidas a cada canción
+#   RecomendacionUsuario  la lista "para ti" de cada usuario
+# Dos canciones se parecen si aparecen en las mismas listas de reproducción y las escuchan los mismos
+# usuarios (similitud del coseno entre sus columnas de la matriz contexto × canción). La lista de cada
+# usuario suma las similares de lo que ha escuchado, da más peso a los géneros de sus preferencias y
+# se completa con lo más escuchado de esos géneros. Cada lista se lee con una sola búsqueda por la
+# clave primaria: WHERE "IdCancion" = ? ORDER BY "Posicion" (o "EmailUsuario" = ?).
+#
+#   python recomendaciones.py --similares 20 --recomendaciones 30
+
+# Bytes de la salida de COPY que se acumulan antes de convertirlos a números
+TAMANO_TROZO = 8 * 1024 * 1024
+
+# Multiplicaciones de cada bloque del producto de matrices: limita la memoria del resultado intermedio,
+# que con canciones muy populares puede tener casi tantas columnas como canciones hay
+TRABAJO_POR_BLOQUE = 20_000_000
+
+# Índices de usuarios y géneros en orden alfabético; el género 0 es "sin género"
+USUARIOS = 'SELECT "Email", ROW_NUMBER() OVER (ORDER BY "Email") - 1 AS i FROM "Usuario"'
+GENEROS = 'SELECT "NombreGenero", ROW_NUMBER() OVER (ORDER BY "NombreGenero") AS i FROM "Genero"'
+
+CONSULTA_CANCIONES = f"""
+    SELECT c."Id", COALESCE(g.i, 0), c."NumReproducciones"
+    FROM "Cancion" c
+    LEFT JOIN ({GENEROS}) g ON g."NombreGenero" = c."Genero"
+    ORDER BY c."Id"
+"""
+CONSULTA_LISTAS = """
+    SELECT pc."IdLista", pc."IdCancion"
+    FROM "PosicionCancion" pc
+    JOIN "ListaReproduccion" lr ON lr."Id" = pc."IdLista"
+"""
+CONSULTA_ESCUCHAS = f"""
+    SELECT u.i, ce."IdCancion", ce."NumReproducciones"
+    FROM "CancionEscuchada" ce
+    JOIN ({USUARIOS}) u ON u."Email" = ce."EmailUsuario"
+"""
+CONSULTA_PREFERENCIAS = f"""
+    SELECT u.i, g.i
+    FROM "Preferencia" p
+    JOIN ({USUARIOS}) u ON u."Email" = p."Email"
+    JOIN ({GENEROS}) g ON g."NombreGenero" = p."NombreGenero"
+"""
+
+# 🔹 Fichero de solo escritura que recibe la salida de COPY TO STDOUT y la convierte en columnas
+# de enteros por trozos, sin guardar todo el texto en memoria
+class ColumnasCopy:
+    def __init__(self, columnas):
+        self.columnas = columnas
+        self._pendiente = []
+        self._tamano = 0
+        self._trozos = []
+
+    def write(self, datos):
+        self._pendiente.append(datos)
+        self._tamano += len(datos)
+        if self._tamano >= TAMANO_TROZO:
+            self._convertir()
+
+    def _convertir(self):
+        datos = b"".join(self._pendiente)
+        corte = datos.rfind(b"\n") + 1
+        self._pendiente = [datos[corte:]] if corte < len(datos) else []
+        self._tamano = len(datos) - corte
+        if corte:
+            self._trozos.append(np.array(datos[:corte].split(), dtype=np.int64).reshape(-1, self.columnas))
+
+    def resultado(self):
+        self._convertir()
+        tabla = np.concatenate(self._trozos) if self._trozos else np.empty((0, self.columnas), dtype=np.int64)
+        return tuple(tabla[:, i] for i in range(self.columnas))
+
+def leer_columnas(cursor, nombre, consulta, columnas):
+    salida = ColumnasCopy(columnas)
+    with cronometro(f"lectura.{nombre}"):
+        cursor.copy_expert(f"COPY ({consulta}) TO STDOUT", salida, size=TAMANO_TROZO)
+    resultado = salida.resultado()
+    contar(f"filas.{nombre}", len(resultado[0]))
+    log(f"✅ {len(resultado[0])} filas leídas de {nombre}")
+    return resultado
+
+# Intervalos [inicio, fin) de filas cuyo trabajo suma como mucho limite (o una sola fila si ella sola lo supera)
+def bloques(trabajo, limite):
+    acumulado = np.cumsum(trabajo, dtype=np.float64)
+    inicio = 0
+    while inicio < len(trabajo):
+        base = acumulado[inicio - 1] if inicio else 0
+        fin = max(inicio + 1, int(np.searchsorted(acumulado, base + limite, side="right")))
+        yield inicio, fin
+        inicio = fin
+
+# Las k mayores puntuaciones positivas de cada fila de una matriz CSR: (fila, columna, puntuación, posición)
+# Los empates se deshacen por la columna para que el resultado no dependa del orden del producto
+def mejores_por_fila(matriz, k):
+    filas = np.repeat(np.arange(matriz.shape[0]), np.diff(matriz.indptr))
+    columnas, datos = matriz.indices, matriz.data
+    positivas = datos > 0
+    filas, columnas, datos = filas[positivas], columnas[positivas], datos[positivas]
+    orden = np.lexsort((columnas, -datos, filas))
+    filas, columnas, datos = filas[orden], columnas[orden], datos[orden]
+    posiciones = np.arange(len(filas)) - np.searchsorted(filas, filas)
+    elegidas = posiciones < k
+    return filas[elegidas], columnas[elegidas], datos[elegidas], posiciones[elegidas]
+
+# Cada fila dividida por su norma (las filas vacías se quedan como están)
+def normalizar_filas(matriz):
+    normas = np.sqrt(np.asarray(matriz.multiply(matriz).sum(axis=1)).ravel())
+    normas[normas == 0] = 1
+    return sp.diags(1 / normas) @ matriz
+
+# Las listas largas y los usuarios que lo escuchan todo dicen menos de cada par de canciones
+def amortiguar_filas(matriz):
+    return sp.diags(1 / np.log2(2 + np.diff(matriz.indptr))) @ matriz
+
+# 🔹 Recomendador: carga las interacciones, calcula las dos tablas y sabe escribirlas
+class Recomendador:
+    def __init__(self, similares=20, recomendaciones=30, peso_listas=1.0, peso_escuchas=1.0, impulso_genero=0.5):
+        self.k_similares = similares
+        self.k_recomendaciones = recomendaciones
+        self.peso_listas = peso_listas
+        self.peso_escuchas = peso_escuchas
+        self.impulso_genero = impulso_genero
+        self.similares = []
+        self.recomendaciones = []
+
+    # Todas las lecturas ven la misma foto de la base de datos, así que los índices de usuario coinciden
+    def cargar(self, conn):
+        with conn.cursor() as cursor:
+            cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+            self.ids_canciones, self.generos, self.reproducciones = leer_columnas(cursor, "canciones", CONSULTA_CANCIONES, 3)
+            cursor.execute('SELECT "Email" FROM "Usuario" ORDER BY "Email"')
+            self.emails = [fila[0] for fila in cursor.fetchall()]
+            listas, canciones_listas = leer_columnas(cursor, "listas", CONSULTA_LISTAS, 2)
+            usuarios, canciones_escuchadas, veces = leer_columnas(cursor, "escuchas", CONSULTA_ESCUCHAS, 3)
+            usuarios_preferencias, generos_preferidos = leer_columnas(cursor, "preferencias", CONSULTA_PREFERENCIAS, 2)
+        conn.rollback()
+
+        n_canciones, n_usuarios = len(self.ids_canciones), len(self.emails)
+        _, indices_listas = np.unique(listas, return_inverse=True)
+        self.listas = sp.csr_matrix((np.ones(len(listas)), (indices_listas, np.searchsorted(self.ids_canciones, canciones_listas))),
+                                    shape=(indices_listas.max() + 1 if len(listas) else 0, n_canciones))
+        # Escuchar una canción cien veces no la hace cien veces más relevante que escucharla una
+        self.escuchas = sp.csr_matrix((np.log1p(np.maximum(veces, 1)), (usuarios, np.searchsorted(self.ids_canciones, canciones_escuchadas))),
+                                      shape=(n_usuarios, n_canciones))
+        n_generos = max(self.generos.max(initial=0), generos_preferidos.max(initial=0)) + 1
+        self.preferencias = np.zeros((n_usuarios, n_generos), dtype=bool)
+        self.preferencias[usuarios_preferencias, generos_preferidos] = True
+
+    # 🔹 Similitud del coseno entre canciones, calculada por bloques de filas de la matriz canción × contexto
+    def calcular_similares(self):
+        contextos = sp.vstack([self.peso_listas * amortiguar_filas(self.listas),
+                               self.peso_escuchas * amortiguar_filas(self.escuchas)]).tocsr()
+        canciones = normalizar_filas(contextos.T.tocsr()).tocsr()
+        traspuesta = canciones.T.tocsr()
+
+        # Trabajo de cada canción: cuántas canciones comparten contexto con ella, contando repeticiones
+        por_contexto = np.diff(traspuesta.indptr)
+        estructura = sp.csr_matrix((por_contexto[canciones.indices], canciones.indices, canciones.indptr), shape=canciones.shape)
+        trabajo = np.asarray(estructura.sum(axis=1)).ravel()
+
+        self.similares = []
+        for inicio, fin in bloques(trabajo, TRABAJO_POR_BLOQUE):
+            with cronometro("calculo.similares"):
+                bloque = (canciones[inicio:fin] @ traspuesta).tocsr()
+                # La propia canción no cuenta como similar
+                filas_bloque = np.repeat(np.arange(inicio, fin), np.diff(bloque.indptr))
+                bloque.data[bloque.indices == filas_bloque] = 0
+                filas, columnas, puntuaciones, posiciones = mejores_por_fila(bloque, self.k_similares)
+                self.similares.append((filas + inicio, columnas, puntuaciones, posiciones))
+        total = sum(len(filas) for filas, _, _, _ in self.similares)
+        contar("recomendaciones.similares", total)
+        log(f"✅ {total} pares de canciones similares")
+
+    # 🔹 Lista "para ti" de cada usuario a partir de las similares de lo que ha escuchado
+    def calcular_para_ti(self):
+        n_canciones = len(self.ids_canciones)
+        similitud = sp.csr_matrix((n_canciones, n_canciones))
+        if self.similares:
+            filas, columnas, puntuaciones, _ = (np.concatenate(partes) for partes in zip(*self.similares))
+            similitud = sp.csr_matrix((puntuaciones, (filas, columnas)), shape=(n_canciones, n_canciones))
+        escuchas = normalizar_filas(self.escuchas).tocsr()
+        populares = self.populares_por_genero()
+
+        self.recomendaciones = []
+        trabajo = np.diff(escuchas.indptr) * self.k_similares
+        for inicio, fin in bloques(trabajo, TRABAJO_POR_BLOQUE):
+            with cronometro("calculo.para_ti"):
+                escuchadas = escuchas[inicio:fin]
+                bloque = (escuchadas @ similitud).tocsr()
+                # Fuera lo que el usuario ya ha escuchado
+                bloque = (bloque - bloque.multiply(escuchadas > 0)).tocsr()
+                bloque.eliminate_zeros()
+                usuarios_bloque = np.repeat(np.arange(inicio, fin), np.diff(bloque.indptr))
+                bloque.data *= 1 + self.impulso_genero * self.preferencias[usuarios_bloque, self.generos[bloque.indices]]
+                usuarios, canciones, puntuaciones, posiciones = mejores_por_fila(bloque, self.k_recomendaciones)
+                usuarios += inicio
+                usuarios, canciones, puntuaciones, posiciones = self.completar(usuarios, canciones, puntuaciones, posiciones,
+                                                                               inicio, fin, populares)
+                self.recomendaciones.append((usuarios, canciones, puntuaciones, posiciones))
+        total = sum(len(usuarios) for usuarios, _, _, _ in self.recomendaciones)
+        contar("recomendaciones.usuarios", total)
+        log(f"✅ {total} recomendaciones para los usuarios")
+
+    # Las canciones más escuchadas de cada género, de más a menos, con margen para descartar las ya escuchadas
+    def populares_por_genero(self):
+        populares = {}
+        for genero in range(1, self.preferencias.shape[1]):
+            del_genero = np.flatnonzero(self.generos == genero)
+            orden = np.argsort(-self.reproducciones[del_genero], kind="stable")[:self.k_recomendaciones * 4]
+            populares[genero] = del_genero[orden]
+        return populares
+
+    # Los usuarios con preferencias que no llegan a k_recomendaciones se completan con lo más escuchado de sus géneros
+    # (con puntuación 0, detrás de las recomendaciones calculadas)
+    def completar(self, usuarios, canciones, puntuaciones, posiciones, inicio, fin, populares):
+        cuantas = np.bincount(usuarios - inicio, minlength=fin - inicio)
+        incompletos = np.flatnonzero((cuantas < self.k_recomendaciones) & self.preferencias[inicio:fin].any(axis=1)) + inicio
+        if len(incompletos) == 0:
+            return usuarios, canciones, puntuaciones, posiciones
+
+        extra_usuarios, extra_canciones, extra_posiciones = [], [], []
+        for usuario in incompletos.tolist():
+            generos = np.flatnonzero(self.preferencias[usuario])
+            candidatas = np.concatenate([populares.get(genero, np.empty(0, dtype=np.int64)) for genero in generos])
+            candidatas = candidatas[np.argsort(-self.reproducciones[candidatas], kind="stable")]
+            ya_tiene = set(self.escuchas.indices[self.escuchas.indptr[usuario]:self.escuchas.indptr[usuario + 1]].tolist())
+            # Las recomendaciones llegan ordenadas por usuario
+            desde, hasta = np.searchsorted(usuarios, [usuario, usuario + 1])
+            ya_tiene.update(canciones[desde:hasta].tolist())
+            posicion = int(cuantas[usuario - inicio])
+            for cancion in candidatas.tolist():
+                if posicion >= self.k_recomendaciones:
+                    break
+                if cancion not in ya_tiene:
+                    ya_tiene.add(cancion)
+                    extra_usuarios.append(usuario)
+                    extra_canciones.append(cancion)
+                    extra_posiciones.append(posicion)
+                    posicion += 1
+
+        contar("recomendaciones.completadas", len(extra_usuarios))
+        return (np.concatenate([usuarios, np.array(extra_usuarios, dtype=np.int64)]),
+                np.concatenate([canciones, np.array(extra_canciones, dtype=np.int64)]),
+                np.concatenate([puntuaciones, np.zeros(len(extra_usuarios))]),
+                np.concatenate([posiciones, np.array(extra_posiciones, dtype=np.int64)]))
+
+    # 🔹 Filas de cada tabla (la posición empieza en 1, como en PosicionCancion)
+    def filas_cancion_similar(self):
+        for filas, columnas, puntuaciones, posiciones in self.similares:
+            yield from zip(self.ids_canciones[filas].tolist(), (posiciones + 1).tolist(),
+                           self.ids_canciones[columnas].tolist(), np.round(puntuaciones, 6).tolist())
+
+    def filas_recomendacion_usuario(self):
+        for usuarios, canciones, puntuaciones, posiciones in self.recomendaciones:
+            yield from zip((self.emails[u] for u in usuarios.tolist()), (posiciones + 1).tolist(),
+                           self.ids_canciones[canciones].tolist(), np.round(puntuaciones, 6).tolist())
+
+    # Sustituye las dos tablas en una transacción. Se borra con DELETE y no con TRUNCATE para que el backend
+    # pueda seguir leyendo las filas anteriores mientras tanto. Si entre la lectura y la escritura se borra
+    # una canción o un usuario, la clave ajena hace fallar la copia sin cambiar nada y basta con repetirla.
+    def guardar(self, cursor):
+        cursor.execute('DELETE FROM "CancionSimilar"')
+        copiar(cursor, "CancionSimilar", ["IdCancion", "Posicion", "IdSimilar", "Puntuacion"], self.filas_cancion_similar())
+        cursor.execute('DELETE FROM "RecomendacionUsuario"')
+        copiar(cursor, "RecomendacionUsuario", ["EmailUsuario", "Posicion", "IdCancion", "Puntuacion"],
+               self.filas_recomendacion_usuario())
+
+# 🔹 Calcular y guardar las recomendaciones
+def generar_recomendaciones(recomendador):
+    with get_db_connection() as conn:
+        recomendador.cargar(conn)
+    recomendador.calcular_similares()
+    recomendador.calcular_para_ti()
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            recomendador.guardar(cursor)
+        conn.commit()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calcula las canciones similares y las recomendaciones de cada usuario")
+    parser.add_argument("--similares", type=int, default=20, help="canciones similares por canción")
+    parser.add_argument("--recomendaciones", type=int, default=30, help="canciones recomendadas por usuario")
+    parser.add_argument("--peso-listas", type=float, default=1.0, help="peso de coincidir en listas de reproducción")
+    parser.add_argument("--peso-escuchas", type=float, default=1.0, help="peso de que las escuchen los mismos usuarios")
+    parser.add_argument("--impulso-genero", type=float, default=0.5,
+                        help="aumento relativo de la puntuación de las canciones de los géneros preferidos")
+    args = parser.parse_args(argv)
+
+    try:
+        generar_recomendaciones(Recomendador(args.similares, args.recomendaciones, args.peso_listas,
+                                             args.peso_escuchas, args.impulso_genero))
+    finally:
+        emitir_resumen()
+
+if __name__ == "__main__":
+    main()
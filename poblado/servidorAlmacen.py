@@ -0,0 +1,133 @@
+import argparse
+import email.utils
+import os
+import re
+import urllib.parse
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from conexiones import cargar_entorno
+# Al ejecutarlo directamente, el .env tiene que estar cargado antes de importar los módulos que
+# leen sus opciones (POBLADO_*, JAMENDO_*)
+if __name__ == "__main__":
+    cargar_entorno()
+from almacenamiento import RUTA_LOCAL, AlmacenLocal
+
+# Servidor HTTP de solo lectura para el almacén local (POBLADO_ALMACEN=local). Atiende GET y HEAD en
+# /<cuenta>/<contenedor>/<blob> como Azure Blob Storage, con rangos (Range o x-ms-range) y las cabeceras
+# que leen los SDK de Azure, así que el AzureBlobService del backend lo usa con la cadena de conexión
+# de Azurite (BlobEndpoint=http://127.0.0.1:10000/devstoreaccount1) sin cambios.
+# Los blobs se proyectan en memoria y se envían desde el mapa sin copiarlos; las subidas del almacén
+# local sustituyen el fichero entero, así que una descarga en curso sigue viendo el contenido anterior.
+#
+#   python servidorAlmacen.py --raiz almacen_local --puerto 10000
+
+VERSION_API = "2021-12-02"
+# Único formato de rango que se sirve, como en Azure: bytes=inicio- o bytes=inicio-fin
+RANGO = re.compile(r"bytes=(\d+)-(\d*)$")
+
+class ManejadorAlmacen(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_HEAD(self):
+        self.servir(cuerpo=False)
+
+    def do_GET(self):
+        self.servir(cuerpo=True)
+
+    def servir(self, cuerpo):
+        partes = urllib.parse.unquote(urllib.parse.urlsplit(self.path).path).lstrip("/").split("/", 2)
+        if len(partes) < 3 or not partes[2]:
+            return self.error(400, "InvalidUri")
+        _, contenedor, blob = partes
+
+        almacen = self.server.almacen
+        try:
+            vista, estado = almacen.proyectar(contenedor, blob)
+        except (FileNotFoundError, IsADirectoryError, NotADirectoryError):
+            return self.error(404, "BlobNotFound")
+        except Exception:
+            return self.error(400, "InvalidResourceName")
+
+        with vista:
+            total = len(vista)
+            # x-ms-range tiene preferencia sobre Range, como en Azure. Un rango con otro formato (varios
+            # rangos, sufijos bytes=-n, otras unidades) se ignora y se sirve el blob entero (RFC 9110);
+            # solo un rango válido que empieza después del final se responde con 416
+            coincidencia = RANGO.match((self.headers.get("x-ms-range") or self.headers.get("Range") or "").strip())
+            desde, hasta = coincidencia.groups() if coincidencia else (None, None)
+            # bytes=5-3 tampoco es un rango válido
+            rango = coincidencia is not None and (not hasta or int(hasta) >= int(desde))
+            inicio, fin = 0, total
+            if rango:
+                inicio = int(desde)
+                fin = min(total, int(hasta) + 1) if hasta else total
+                if inicio >= fin:
+                    return self.error(416, "InvalidRange", {"Content-Range": f"bytes */{total}"})
+
+            self.send_response(206 if rango else 200)
+            self.send_header("Content-Type", almacen.content_type(blob))
+            self.send_header("Content-Length", str(fin - inicio))
+            if rango:
+                self.send_header("Content-Range", f"bytes {inicio}-{fin - 1}/{total}")
+            self.send_header("Accept-Ranges", "bytes")
+            self.send_header("ETag", f'"0x{estado.st_mtime_ns:X}{estado.st_size:X}"')
+            self.send_header("Last-Modified", email.utils.formatdate(estado.st_mtime, usegmt=True))
+            self.send_header("x-ms-blob-type", "BlockBlob")
+            self.cabeceras_azure()
+            self.end_headers()
+
+            if cuerpo:
+                with vista[inicio:fin] as trozo:
+                    try:
+                        self.wfile.write(trozo)
+                    except ConnectionError:
+                        # El cliente ha cortado la descarga (por ejemplo, al saltar en el streaming)
+                        self.close_connection = True
+
+    def error(self, estado, codigo, cabeceras=None):
+        cuerpo = (f'<?xml version="1.0" encoding="utf-8"?><Error><Code>{codigo}</Code></Error>'.encode()
+                  if self.command != "HEAD" else b"")
+        self.send_response(estado)
+        self.send_header("Content-Type", "application/xml")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.send_header("x-ms-error-code", codigo)
+        for nombre, valor in (cabeceras or {}).items():
+            self.send_header(nombre, valor)
+        self.cabeceras_azure()
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def cabeceras_azure(self):
+        self.send_header("x-ms-version", VERSION_API)
+        self.send_header("x-ms-request-id", str(uuid.uuid4()))
+        if "x-ms-client-request-id" in self.headers:
+            self.send_header("x-ms-client-request-id", self.headers["x-ms-client-request-id"])
+
+    def log_message(self, format, *args):
+        pass
+
+# 🔹 Crea el servidor (puerto 0 para que el sistema elija uno libre)
+def crear_servidor(raiz=RUTA_LOCAL, host="127.0.0.1", puerto=0):
+    servidor = ThreadingHTTPServer((host, puerto), ManejadorAlmacen)
+    servidor.daemon_threads = True
+    servidor.almacen = AlmacenLocal(raiz)
+    return servidor
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sirve el almacén local de blobs con la API de lectura de Azure")
+    parser.add_argument("--raiz", default=os.getenv("POBLADO_RUTA_ALMACEN", RUTA_LOCAL), help="directorio del almacén")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=10000)
+    args = parser.parse_args(argv)
+
+    servidor = crear_servidor(args.raiz, args.host, args.puerto)
+    print(f"🗄️ Almacén local {os.path.abspath(args.raiz)} en http://{args.host}:{servidor.server_address[1]}/devstoreaccount1/")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,89 @@
-from azure.storage.blob import BlobServiceClient
+import hashlib
 import requests
-import os
-from dotenv import load_dotenv
+import tempfile
+import time
+from almacenContenido import blob_existe, get_manifiesto, nombre_por_contenido
+from almacenamiento import BLOQUES_EN_VUELO, TAMANO_BLOQUE, get_almacen
+from indiceMp3 import AnalizadorMp3
+from metricas import contar, cronometro, log, sumar_bytes
 
-# Obtener la ruta correcta del archivo .env
-env_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "echo-beat-backend", ".env"))
+# Contenedor de las canciones
+CONTAINER_NAME = "cancionespsoft"
 
-# Cargar el archivo .env desde la ubicación correcta
-load_dotenv(env_path)
+TAMANO_LECTURA = 64 * 1024
 
-# Configuración de Azure Blob Storage
-AZURE_CONNECTION_STRING = os.getenv("AZURE_STORAGE_CONNECTION_STRING")
-CONTAINER_NAME = "cancionespsoft"
+# Nombre del blob con el índice de búsqueda de una canción
+def nombre_indice(nombre_blob):
+    return f"{nombre_blob}.idx"
+
+# 🔹 Función para transferir una canción desde su URL al almacén sin cargarla entera en memoria
+# El blob se nombra con el SHA-256 del audio, así que dos canciones con el mismo título no se
+# pisan y un mismo audio solo se guarda una vez. Si el manifiesto local ya conoce la URL no se
+# descarga nada, y si el contenido ya está en el contenedor no se sube.
+# Mientras se descarga se recorren los frames del MP3 para medir la duración y el bitrate reales
+# y se sube al lado un índice tiempo → byte (ver indiceMp3) para que el streaming pueda saltar.
+def transferir_cancion(nombre_archivo, url_audio, tamano_bloque=TAMANO_BLOQUE, bloques_en_vuelo=BLOQUES_EN_VUELO):
+    almacen = get_almacen()
+    manifiesto = get_manifiesto()
+    nombre_blob = manifiesto.blob_de_origen(CONTAINER_NAME, url_audio)
+    if nombre_blob is not None:
+        log(f"⏭️ Ya estaba en el almacén: {nombre_archivo}")
+        contar("audio.ya_transferidos")
+        duracion, bitrate = manifiesto.medidas(CONTAINER_NAME, nombre_blob)
+        return {"url": almacen.url(CONTAINER_NAME, nombre_blob), "bytes": 0, "segundos": 0,
+                "duracion": duracion, "bitrate": bitrate}
+
+    inicio = time.perf_counter()
+
+    with requests.get(url_audio, stream=True, timeout=(10, 60)) as response:
+        if response.status_code != 200:
+            return None
+
+        # Descargar calculando el hash; lo que no cabe en un bloque se vuelca a disco
+        sha = hashlib.sha256()
+        analizador = AnalizadorMp3()
+        total_bytes = 0
+        with tempfile.SpooledTemporaryFile(max_size=tamano_bloque) as temporal:
+            with cronometro("audio.descarga"):
+                for trozo in response.iter_content(chunk_size=TAMANO_LECTURA):
+                    sha.update(trozo)
+                    analizador.alimentar(trozo)
+                    temporal.write(trozo)
+                    total_bytes += len(trozo)
+            sumar_bytes("audio.descargados", total_bytes)
+
+            nombre_blob = nombre_por_contenido(sha.hexdigest(), ".mp3")
+            subido = not blob_existe(CONTAINER_NAME, nombre_blob)
+            if subido:
+                temporal.seek(0)
+                with cronometro("audio.subida"):
+                    almacen.subir(CONTAINER_NAME, nombre_blob, temporal, "audio/mpeg", tamano_bloque, bloques_en_vuelo)
+                sumar_bytes("audio.subidos", total_bytes)
+            else:
+                contar("audio.repetidos")
+
+    if analizador.frames:
+        if subido or not blob_existe(CONTAINER_NAME, nombre_indice(nombre_blob)):
+            indice = analizador.serializar()
+            with cronometro("audio.subida_indice"):
+                almacen.subir(CONTAINER_NAME, nombre_indice(nombre_blob), indice, "application/octet-stream")
+            sumar_bytes("audio.subidos", len(indice))
+            manifiesto.registrar(CONTAINER_NAME, nombre_indice(nombre_blob))
+        manifiesto.guardar_medidas(CONTAINER_NAME, nombre_blob, analizador.segundos, analizador.bitrate)
+
+    manifiesto.registrar(CONTAINER_NAME, nombre_blob, url_audio)
+
+    segundos = time.perf_counter() - inicio
+    velocidad = total_bytes / segundos if segundos > 0 else 0
+    estado = "subida al almacén" if subido else "ya estaba en el almacén"
+    log(f"✅ Canción {estado}: {nombre_archivo} ({total_bytes} bytes, {velocidad / 1024:.0f} KB/s, "
+          f"{analizador.segundos:.1f} s a {analizador.bitrate // 1000} kbps)")
 
-# 🔹 Función para subir canción a Azure
-def subir_a_azure(nombre_archivo, url_audio):
-    # Descargar la canción desde la URL
-    response = requests.get(url_audio)
-    if response.status_code == 200:
-        blob_service_client = BlobServiceClient.from_connection_string(AZURE_CONNECTION_STRING)
-        blob_client = blob_service_client.get_blob_client(container=CONTAINER_NAME, blob=nombre_archivo)
-
-        # Subir archivo al blob
-        blob_client.upload_blob(response.content, overwrite=True)
-        print(f"✅ Canción subida a Azure: {nombre_archivo}")
-
-        # Devolver la URL pública del archivo
-        return f"https://{blob_service_client.account_name}.blob.core.windows.net/{CONTAINER_NAME}/{nombre_archivo}"
-    else:
-        print(f"❌ Error al descargar {nombre_archivo}")
-        return None
+    # Devolver la URL pública del archivo junto con los datos de la transferencia
+    return {
+        "url": almacen.url(CONTAINER_NAME, nombre_blob),
+        "bytes": total_bytes,
+        "segundos": segundos,
+        "duracion": analizador.segundos if analizador.frames else None,
+        "bitrate": analizador.bitrate if analizador.frames else None,
+    }
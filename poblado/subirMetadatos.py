@@ -1,30 +1,7 @@
-import os
-import urllib.parse
-import psycopg2
 import random
-from dotenv import load_dotenv
-
-# Cargar variables de entorno
-env_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "echo-beat-backend", ".env"))
-load_dotenv(env_path)
-
-# Obtener la URL de conexión y codificar correctamente los caracteres especiales
-database_url = os.getenv("DATABASE_URL")
-
-if not database_url:
-    print("Error: No se encontró DATABASE_URL en el archivo .env")
-    exit()
-
-# Codificar correctamente la contraseña si es necesario
-parsed_url = urllib.parse.urlparse(database_url)
-password = urllib.parse.quote(parsed_url.password) if parsed_url.password else ""
-database_url_fixed = database_url.replace(parsed_url.password, password) if password else database_url
-
-# Conectar a la base de datos
-def get_db_connection():
-    conn = psycopg2.connect(database_url_fixed)
-    conn.cursor().execute("SET search_path TO public;") 
-    return conn
+from psycopg2.extras import execute_values
+from conexiones import get_db_connection
+from metricas import contar, cronometro, log
 
 GENEROS_FIJOS = [
     "Rock", "Pop", "Jazz", "Blues", "Hip-Hop", 
@@ -32,190 +9,220 @@ GENEROS_FIJOS = [
     "Metal", "Clásica"
 ]
 
-# Función para insertar metadatos en PostgreSQL
-def insertar_metadata(nombre, artistas, album, duracion, licencia, url_blob, fecha_publicacion, generos):
-    try:
-        with get_db_connection() as conn, conn.cursor() as cursor:
-
-            # Verificar e insertar cada artista
-            for artista in artistas:
-                cursor.execute("SELECT \"Nombre\" FROM \"Artista\" WHERE \"Nombre\" = %s", (artista,))
-                artista_existe = cursor.fetchone()
-                if not artista_existe:
-                    cursor.execute("INSERT INTO \"Artista\" (\"Nombre\", \"Biografia\", \"FotoPerfil\") VALUES (%s, %s, %s)", 
-                                (artista, 'Biografía no disponible', 'URL_por_defecto'))
-
-
-            # Verificar si el álbum ya existe
-            cursor.execute("SELECT \"Nombre\" FROM \"Lista\" WHERE \"Nombre\" = %s AND \"Id\" IN (SELECT \"Id\" FROM \"Album\")", (album,))
-            album_existe = cursor.fetchone()
-
-            if not album_existe:
-                cursor.execute("""
-                    INSERT INTO \"Lista\" (\"Nombre\", \"NumCanciones\", \"Duracion\", \"NumLikes\", \"Descripcion\", \"Portada\", \"TipoLista\")
-                    VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING \"Id\"
-                """, (album, 0, '0', 0, 'Álbum musical', 'URL_por_defecto', 'Album'))
-
-                album_row = cursor.fetchone()
-
-                if album_row is None:
-                    raise Exception("ERROR: `RETURNING Id` devolvió None. La inserción puede haber fallado.")
+# Función para reservar n ids de la secuencia autoincremental de una tabla
+def reservar_ids(cursor, tabla, n):
+    cursor.execute("SELECT nextval(pg_get_serial_sequence(%s, 'Id')) FROM generate_series(1, %s)", (f'"{tabla}"', n))
+    return [fila[0] for fila in cursor.fetchall()]
 
-                album_id = album_row[0]
-                print(f"✅ Álbum insertado correctamente con ID: {album_id}")
+# Función para insertar los metadatos de un lote de canciones en una sola transacción
+# Cada canción es un diccionario con las claves nombre, artistas, album, duracion, fecha_publicacion y url_blob.
+# Si se pasa una CacheCatalogo, los artistas y álbumes que ya conoce no se consultan.
+# Devuelve una lista con (id_cancion, id_album) para cada canción, en el mismo orden, o None si falla.
+def insertar_metadata_lote(canciones, cache=None):
+    if not canciones:
+        return []
 
+    nombres_album = list(dict.fromkeys(cancion["album"] for cancion in canciones))
+    try:
+        with get_db_connection() as conn, conn.cursor() as cursor:
+            try:
+                with cronometro("sql.lote"):
+                    resultado, artistas_nuevos = escribir_lote(cursor, canciones, nombres_album, cache)
+                    with cronometro("sql.commit"):
+                        conn.commit()
+            except Exception:
+                # Olvidar los álbumes tocados antes de deshacer la transacción y soltar sus bloqueos
+                if cache is not None:
+                    cache.invalidar_albumes(nombres_album)
+                raise
 
-                # Si el álbum no existe, crear el `Album` en la base de datos
-                cursor.execute("""
-                    INSERT INTO \"Album\" (\"Id\", \"FechaLanzamiento\") 
-                    VALUES (%s, %s)
-                """, (album_id, fecha_publicacion))
-                num_canciones_album = 0  # Es la primera canción en este álbum
-            else:
-                cursor.execute("""
-                    SELECT COUNT(*) 
-                    FROM \"PosicionCancion\" pc
-                    JOIN \"Lista\" l ON pc.\"IdLista\" = l.\"Id\"
-                    WHERE l.\"Nombre\" = %s
-                """, (album,))  # 🔹 Aquí `album` es el nombre del álbum
-                num_canciones_album = cursor.fetchone()[0]
-
-            # Escoger un genero aleatorio si no se especifica
-            genero_aleatorio = random.choice(GENEROS_FIJOS)
-
-            # Insertar la canción
-            cursor.execute("""
-                INSERT INTO \"Cancion\" (\"Nombre\", \"Duracion\", \"NumReproducciones\", \"NumFavoritos\", \"Portada\", \"Genero\") 
-                VALUES (%s, %s, 0, 0, %s, %s) 
-                RETURNING \"Id\"
-            """, (nombre, duracion, 'URL', genero_aleatorio))
-            cancion_id = cursor.fetchone()[0]
+        # Los artistas solo se guardan en la caché cuando ya están confirmados en la base de datos
+        if cache is not None:
+            cache.agregar_artistas(artistas_nuevos)
 
+        contar("canciones.insertadas", len(canciones))
+        log(f"✅ Metadata de {len(canciones)} canciones insertada en PostgreSQL")
+        return resultado
 
-            # Obtener el ID del álbum en la tabla Lista basado en su nombre
+    except Exception as e:
+        print(f"Error al insertar el lote en PostgreSQL: {str(e)}")
+        return None
+
+def escribir_lote(cursor, canciones, nombres_album, cache):
+    # Bloquear los álbumes del lote para que dos lotes simultáneos no creen el mismo álbum
+    # ni repitan posiciones (el bloqueo se libera al terminar la transacción)
+    with cronometro("sql.bloqueo_albumes"):
+        cursor.execute("""
+            SELECT pg_advisory_xact_lock(h)
+            FROM (SELECT DISTINCT hashtext(n) AS h FROM unnest(%s::text[]) n ORDER BY 1) bloqueos
+        """, (nombres_album,))
+
+    # Insertar los artistas que no existan
+    artistas = sorted({artista for cancion in canciones for artista in cancion["artistas"]})
+    if cache is not None:
+        artistas = cache.artistas_desconocidos(artistas)
+    if artistas:
+        with cronometro("sql.artistas"):
+            execute_values(cursor, """
+                INSERT INTO \"Artista\" (\"Nombre\", \"Biografia\", \"FotoPerfil\") VALUES %s
+                ON CONFLICT (\"Nombre\") DO NOTHING
+            """, [(artista, 'Biografía no disponible', 'URL_por_defecto') for artista in artistas], page_size=1000)
+
+    # Buscar los álbumes ya existentes y la última posición ocupada en cada uno. La caché solo da el
+    # id: la posición se lee siempre aquí, con el álbum ya bloqueado, porque otro proceso de ingesta
+    # puede haber añadido canciones desde que se guardó.
+    albumes = {}
+    conocidos = cache.buscar_albumes(nombres_album) if cache is not None else {}
+    if conocidos:
+        with cronometro("sql.posiciones_albumes"):
             cursor.execute("""
-                SELECT \"Id\" FROM \"Lista\" WHERE \"Nombre\" = %s AND \"Id\" IN (SELECT \"Id\" FROM \"Album\")
-            """, (album,))
-            album_row = cursor.fetchone()
-
-            if album_row is None:
-                raise Exception(f"ERROR: No se encontró un álbum con nombre '{album}' en la tabla Lista.")
-
-            album_id = album_row[0]  #  ID real del álbum
-            print(f"Id del album =: {album_id}")
-
-
-            # Insertar la posición de la canción en el álbum
-            posicion_cancion = num_canciones_album + 1
+                SELECT a.id, COALESCE(MAX(pc.\"Posicion\"), 0)
+                FROM unnest(%s::int[]) a(id)
+                LEFT JOIN \"PosicionCancion\" pc ON pc.\"IdLista\" = a.id
+                GROUP BY a.id
+            """, (list(conocidos.values()),))
+            ultimas = dict(cursor.fetchall())
+        albumes.update({nombre: [album_id, ultimas[album_id]] for nombre, album_id in conocidos.items()})
+    pendientes = [nombre for nombre in nombres_album if nombre not in albumes]
+    if pendientes:
+        with cronometro("sql.buscar_albumes"):
             cursor.execute("""
-                INSERT INTO \"PosicionCancion\" (\"IdLista\", \"IdCancion\", \"Posicion\") 
-                VALUES (%s, %s, %s)
-            """, (album_id, cancion_id, posicion_cancion))  
-
-
-            # Relacionar canción con cada artista
-            for artista in artistas:
-                cursor.execute("INSERT INTO \"AutorCancion\" (\"IdCancion\", \"NombreArtista\") VALUES (%s, %s)", 
-                            (cancion_id, artista))
-            
-
-            conn.commit()
-            print(f"✅ Metadata insertada en PostgreSQL: {nombre}")
-
-    except Exception as e:
-        print(f"Error al insertar en PostgreSQL: {str(e)}")
-
-    finally:
-        cursor.close()
-        conn.close()
-
-# Función para verificar todos los álbumes al final y asignar el autor si es posible, sera posible cuando un autor aparezca en todas las canciones de un album
-def verificar_autores_de_todos_los_albumes():
+                SELECT DISTINCT ON (l.\"Nombre\") l.\"Nombre\", l.\"Id\",
+                       (SELECT COALESCE(MAX(pc.\"Posicion\"), 0) FROM \"PosicionCancion\" pc WHERE pc.\"IdLista\" = l.\"Id\")
+                FROM \"Lista\" l
+                JOIN \"Album\" a ON a.\"Id\" = l.\"Id\"
+                WHERE l.\"Nombre\" = ANY(%s)
+                ORDER BY l.\"Nombre\", l.\"Id\"
+            """, (pendientes,))
+            albumes.update({nombre: [album_id, ultima_posicion] for nombre, album_id, ultima_posicion in cursor.fetchall()})
+
+    # Crear de una vez los álbumes que faltan
+    nuevos = [nombre for nombre in nombres_album if nombre not in albumes]
+    if nuevos:
+        fechas = {}
+        for cancion in canciones:
+            fechas.setdefault(cancion["album"], cancion["fecha_publicacion"])
+
+        with cronometro("sql.albumes"):
+            for nombre, album_id in zip(nuevos, reservar_ids(cursor, "Lista", len(nuevos))):
+                albumes[nombre] = [album_id, 0]
+
+            execute_values(cursor, """
+                INSERT INTO \"Lista\" (\"Id\", \"Nombre\", \"NumCanciones\", \"Duracion\", \"NumLikes\", \"Descripcion\", \"Portada\", \"TipoLista\")
+                VALUES %s
+            """, [(albumes[nombre][0], nombre, 0, 0, 0, 'Álbum musical', 'URL_por_defecto', 'Album') for nombre in nuevos], page_size=1000)
+            execute_values(cursor, """
+                INSERT INTO \"Album\" (\"Id\", \"FechaLanzamiento\") VALUES %s
+            """, [(albumes[nombre][0], fechas[nombre]) for nombre in nuevos], page_size=1000)
+        contar("sql.albumes_nuevos", len(nuevos))
+        log(f"✅ {len(nuevos)} álbumes insertados")
+
+    # Insertar las canciones con ids reservados para poder relacionarlas sin consultas extra
+    with cronometro("sql.canciones"):
+        ids_canciones = reservar_ids(cursor, "Cancion", len(canciones))
+        execute_values(cursor, """
+            INSERT INTO \"Cancion\" (\"Id\", \"Nombre\", \"Duracion\", \"NumReproducciones\", \"NumFavoritos\", \"Portada\", \"Genero\", \"UrlAudio\")
+            VALUES %s
+        """, [(cancion_id, cancion["nombre"], cancion["duracion"], 0, 0, 'URL', random.choice(GENEROS_FIJOS), cancion.get("url_blob"))
+              for cancion_id, cancion in zip(ids_canciones, canciones)], page_size=1000)
+
+    # Asignar las posiciones dentro de cada álbum en el mismo recorrido
+    posiciones = []
+    autores = []
+    resultado = []
+    for cancion_id, cancion in zip(ids_canciones, canciones):
+        album = albumes[cancion["album"]]
+        album[1] += 1
+        posiciones.append((album[0], cancion_id, album[1]))
+        autores.extend((cancion_id, artista) for artista in dict.fromkeys(cancion["artistas"]))
+        resultado.append((cancion_id, album[0]))
+
+    with cronometro("sql.posiciones_autores"):
+        execute_values(cursor, """
+            INSERT INTO \"PosicionCancion\" (\"IdLista\", \"IdCancion\", \"Posicion\") VALUES %s
+            ON CONFLICT DO NOTHING
+        """, posiciones, page_size=1000)
+        execute_values(cursor, """
+            INSERT INTO \"AutorCancion\" (\"IdCancion\", \"NombreArtista\") VALUES %s
+            ON CONFLICT DO NOTHING
+        """, autores, page_size=1000)
+
+    # Actualizar la caché mientras se mantiene el bloqueo de los álbumes
+    if cache is not None:
+        cache.guardar_albumes({nombre: albumes[nombre][0] for nombre in nombres_album})
+
+    return resultado, artistas
+
+# Función para verificar los álbumes al final y asignar el autor si es posible, sera posible cuando un autor aparezca en todas las canciones de un album
+# Se resuelve en una sola consulta para todos los álbumes sin autor. Si se pasan ids_albumes
+# (p. ej. los álbumes tocados en la ingesta actual) solo se revisan esos.
+def verificar_autores_de_todos_los_albumes(ids_albumes=None):
+    if ids_albumes is not None and not ids_albumes:
+        return
+
+    filtro = "AND a.\"Id\" = ANY(%s)" if ids_albumes is not None else ""
+    parametros = (list(ids_albumes),) if ids_albumes is not None else ()
     try:
         with get_db_connection() as conn, conn.cursor() as cursor:
-
-            # Obtener todos los álbumes en la base de datos
-            cursor.execute("SELECT \"Id\" FROM \"Album\"")
-            albumes = cursor.fetchall()
-
-            for (album_id,) in albumes:
-                # Verificar si ya tiene un autor
-                cursor.execute("SELECT 1 FROM \"AutorAlbum\" WHERE \"IdAlbum\" = %s", (album_id,))
-                if cursor.fetchone():
-                    continue  # Si ya tiene un autor, pasamos al siguiente álbum
-
-                # Contar el número total de canciones en el álbum
-                cursor.execute("SELECT COUNT(*) FROM \"PosicionCancion\" WHERE \"IdLista\" = %s", (album_id,))
-                total_canciones = cursor.fetchone()[0]
-
-                # Obtener los artistas y cuántas canciones tienen en este álbum
-                cursor.execute("""
-                    SELECT ac.\"NombreArtista\", COUNT(ac.\"IdCancion\") 
-                    FROM \"AutorCancion\" ac
-                    JOIN \"PosicionCancion\" pc ON ac.\"IdCancion\" = pc.\"IdCancion\"
-                    WHERE pc.\"IdLista\" = %s
-                    GROUP BY ac.\"NombreArtista\"
-                """, (album_id,))
-                
-                artistas_frecuencia = cursor.fetchall()
-
-                # Buscar un artista que aparezca en todas las canciones
-                for artista, num_canciones in artistas_frecuencia:
-                    if num_canciones == total_canciones:
-                        cursor.execute("INSERT INTO \"AutorAlbum\" (\"IdAlbum\", \"NombreArtista\") VALUES (%s, %s)", 
-                                    (album_id, artista))
-                        conn.commit()
-                        print(f"✅ {artista} ha sido asignado como autor del álbum {album_id}")
-                        break  # Solo necesitamos un artista, así que terminamos aquí
-
-                print(f"⚠️ No hay un único artista en todas las canciones del álbum {album_id}, no se asigna autor.")
+            cursor.execute(f"""
+                WITH totales AS (
+                    SELECT pc.\"IdLista\", COUNT(*) AS total
+                    FROM \"PosicionCancion\" pc
+                    JOIN \"Album\" a ON a.\"Id\" = pc.\"IdLista\"
+                    WHERE NOT EXISTS (SELECT 1 FROM \"AutorAlbum\" aa WHERE aa.\"IdAlbum\" = a.\"Id\")
+                    {filtro}
+                    GROUP BY pc.\"IdLista\"
+                )
+                INSERT INTO \"AutorAlbum\" (\"IdAlbum\", \"NombreArtista\")
+                SELECT DISTINCT ON (pc.\"IdLista\") pc.\"IdLista\", ac.\"NombreArtista\"
+                FROM \"PosicionCancion\" pc
+                JOIN totales t ON t.\"IdLista\" = pc.\"IdLista\"
+                JOIN \"AutorCancion\" ac ON ac.\"IdCancion\" = pc.\"IdCancion\"
+                GROUP BY pc.\"IdLista\", ac.\"NombreArtista\", t.total
+                HAVING COUNT(*) = t.total
+                ORDER BY pc.\"IdLista\", ac.\"NombreArtista\"
+                ON CONFLICT DO NOTHING
+            """, parametros)
+            asignados = cursor.rowcount
+            conn.commit()
+            log(f"✅ Autor asignado a {asignados} álbumes")
 
     except Exception as e:
         print(f"Error al verificar autores de álbumes: {str(e)}")
 
-    finally:
-        cursor.close()
-        conn.close()
-
 
 # Función para actualizar el número de canciones y la duración total de cada lista
-def actualizar_listas():
+# Se recalculan todas las listas con un único UPDATE. Si se pasan ids_listas (p. ej. las listas
+# en las que se han insertado canciones en esta ejecución) solo se recalculan esas.
+def actualizar_listas(ids_listas=None):
+    if ids_listas is not None and not ids_listas:
+        return
+
+    filtro = "WHERE l2.\"Id\" = ANY(%s)" if ids_listas is not None else ""
+    parametros = (list(ids_listas),) if ids_listas is not None else ()
     try:
         with get_db_connection() as conn, conn.cursor() as cursor:
-            # Obtener todas las listas
-            cursor.execute("SELECT \"Id\", \"Nombre\" FROM \"Lista\"")
-            listas = cursor.fetchall()
-
-            for lista_id, lista_nombre in listas:
-                # Contar el número de canciones en la lista, quitar el ::INTEGER cuando se haya hecho la nueva migracion
-                cursor.execute("""
-                    SELECT COUNT(*), SUM(c.\"Duracion\"::INTEGER)   
-                    FROM \"PosicionCancion\" pc
-                    JOIN \"Cancion\" c ON pc.\"IdCancion\" = c.\"Id\"
-                    WHERE pc.\"IdLista\" = %s
-                """, (lista_id,))
-                
-                num_canciones, duracion_total = cursor.fetchone()
-
-                duracion_total = duracion_total if duracion_total is not None else 0
-
-                # Actualizar la tabla Lista con los nuevos valores
-                cursor.execute("""
-                    UPDATE \"Lista\"
-                    SET \"NumCanciones\" = %s, \"Duracion\" = %s
-                    WHERE \"Id\" = %s
-                """, (num_canciones, duracion_total, lista_id))
-
-                print(f"✅ Lista '{lista_nombre}' actualizada - NumCanciones: {num_canciones}, Duracion: {duracion_total}")
-
+            cursor.execute(f"""
+                UPDATE \"Lista\" l
+                SET \"NumCanciones\" = t.num_canciones, \"Duracion\" = t.duracion_total
+                FROM (
+                    SELECT l2.\"Id\", COUNT(c.\"Id\") AS num_canciones, COALESCE(SUM(c.\"Duracion\"), 0) AS duracion_total
+                    FROM \"Lista\" l2
+                    LEFT JOIN \"PosicionCancion\" pc ON pc.\"IdLista\" = l2.\"Id\"
+                    LEFT JOIN \"Cancion\" c ON c.\"Id\" = pc.\"IdCancion\"
+                    {filtro}
+                    GROUP BY l2.\"Id\"
+                ) t
+                WHERE l.\"Id\" = t.\"Id\"
+                  AND (l.\"NumCanciones\", l.\"Duracion\") IS DISTINCT FROM (t.num_canciones, t.duracion_total)
+            """, parametros)
+            actualizadas = cursor.rowcount
             conn.commit()
+            log(f"✅ {actualizadas} listas actualizadas")
 
     except Exception as e:
         print(f"Error al actualizar listas: {str(e)}")
 
-    finally:
-        cursor.close()
-        conn.close()
 
 def insertar_generos_aleatorios():
     try:
@@ -231,10 +238,7 @@ def insertar_generos_aleatorios():
                     cursor.execute("INSERT INTO \"Genero\" (\"NombreGenero\") VALUES (%s)", (genero,))
             
             conn.commit()
-            print(f"✅ Se insertaron 10 géneros en la tabla Genero.")
+            log(f"✅ Se insertaron 10 géneros en la tabla Genero.")
     
     except Exception as e:
         print(f"Error al insertar géneros: {str(e)}")
-    finally:
-        cursor.close()
-        conn.close()    
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Los scripts del poblado se importan entre sí por su nombre (from conexiones import ...), así que
+# las pruebas necesitan el directorio poblado en la ruta de importación
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
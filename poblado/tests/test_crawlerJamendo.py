@@ -0,0 +1,142 @@
+import json
+import pytest
+
+# crawlerJamendo pide las páginas con requests (ver requirements.txt)
+pytest.importorskip("requests")
+
+import crawlerJamendo
+from crawlerJamendo import MAX_INTENTOS, RecorridoJamendo, leer_checkpoint
+
+# Catálogo falso: la canción i se publica el día i // 2 + 1, así que hay dos canciones por fecha
+CATALOGO = [{"id": i, "releasedate": f"2024-01-{i // 2 + 1:02d}"} for i in range(1, 21)]
+
+@pytest.fixture(autouse=True)
+def jamendo_falso(monkeypatch):
+    peticiones = []
+    def pedir_pagina(offset, limitador, desde=None, limite=None):
+        peticiones.append((offset, desde))
+        # Como Jamendo con datebetween: lo publicado desde esa fecha (incluida), por fecha
+        tracks = [track for track in CATALOGO if desde is None or track["releasedate"] >= desde]
+        return tracks[offset:offset + crawlerJamendo.LIMITE_PAGINA]
+
+    monkeypatch.setattr(crawlerJamendo, "LIMITE_PAGINA", 3)
+    monkeypatch.setattr(crawlerJamendo, "pedir_pagina", pedir_pagina)
+    return peticiones
+
+@pytest.fixture
+def ruta(tmp_path):
+    return str(tmp_path / "checkpoint.json")
+
+def recorrido(ruta, max_canciones=None):
+    return RecorridoJamendo(max_canciones, paginas_concurrentes=2, peticiones_por_segundo=0, ruta_checkpoint=ruta)
+
+def ids(tracks):
+    return [track["id"] for track in tracks]
+
+def test_recorrido_completo(ruta):
+    r = recorrido(ruta)
+    entregadas = ids(r.canciones())
+    assert entregadas == list(range(1, 21))
+    for id_track in entregadas:
+        r.terminar(id_track)
+
+    checkpoint = leer_checkpoint(ruta)
+    assert checkpoint["ultima_fecha"] == "2024-01-11"
+    assert checkpoint["ids_ultima_fecha"] == [20]
+    assert checkpoint["adelantadas"] == [] and checkpoint["fallidas"] == []
+    assert ids(recorrido(ruta).canciones()) == []
+
+def test_max_canciones(ruta):
+    r = recorrido(ruta, max_canciones=4)
+    entregadas = ids(r.canciones())
+    assert entregadas == [1, 2, 3, 4]
+    for id_track in entregadas:
+        r.terminar(id_track)
+    assert ids(recorrido(ruta, max_canciones=4).canciones()) == [5, 6, 7, 8]
+
+def test_terminadas_en_desorden(ruta):
+    r = recorrido(ruta, max_canciones=6)
+    assert ids(r.canciones()) == [1, 2, 3, 4, 5, 6]
+
+    # Terminar 5 y 3 antes que 1: la marca de agua no se mueve y quedan como adelantadas
+    r.terminar(5)
+    r.terminar(3)
+    checkpoint = leer_checkpoint(ruta)
+    assert checkpoint["ultima_fecha"] is None
+    assert sorted(checkpoint["adelantadas"]) == [[3, "2024-01-02"], [5, "2024-01-03"]]
+
+    r.terminar(1)
+    r.terminar(2)
+    checkpoint = leer_checkpoint(ruta)
+    assert checkpoint["ultima_fecha"] == "2024-01-02"
+    assert checkpoint["ids_ultima_fecha"] == [2, 3]
+    assert checkpoint["adelantadas"] == [[5, "2024-01-03"]]
+
+    r.terminar(6)
+    r.terminar(4)
+    checkpoint = leer_checkpoint(ruta)
+    assert checkpoint["ultima_fecha"] == "2024-01-04"
+    assert checkpoint["ids_ultima_fecha"] == [6]
+    assert checkpoint["adelantadas"] == []
+
+def test_terminar_dos_veces_o_algo_no_entregado(ruta):
+    r = recorrido(ruta, max_canciones=2)
+    list(r.canciones())
+    r.terminar(1)
+    r.terminar(1)
+    r.terminar(99)
+    assert leer_checkpoint(ruta)["ids_ultima_fecha"] == [1]
+
+def test_reanudar_tras_interrumpirse(ruta, jamendo_falso):
+    r = recorrido(ruta, max_canciones=8)
+    assert ids(r.canciones()) == list(range(1, 9))
+    # Solo llegan a guardarse algunas antes de que se corte la ejecución
+    for id_track in (1, 2, 3, 5, 8):
+        r.terminar(id_track)
+
+    # Se vuelve a pedir desde la marca de agua y se salta lo ya terminado
+    jamendo_falso.clear()
+    siguiente = recorrido(ruta)
+    assert ids(siguiente.canciones()) == [4, 6, 7] + list(range(9, 21))
+    assert jamendo_falso[0] == (0, "2024-01-02")
+
+def test_un_fallo_en_medio_no_frena_la_marca(ruta):
+    r = recorrido(ruta, max_canciones=4)
+    list(r.canciones())
+    r.terminar(1)
+    r.terminar(2, Exception("error al subir"))
+    r.terminar(3)
+    r.terminar(4)
+
+    checkpoint = leer_checkpoint(ruta)
+    assert checkpoint["ultima_fecha"] == "2024-01-03"
+    assert checkpoint["ids_ultima_fecha"] == [4]
+    assert checkpoint["fallidas"] == [{"track": CATALOGO[1], "intentos": 1}]
+
+    # La siguiente ejecución empieza por la fallida y no la entrega otra vez como nueva
+    siguiente = recorrido(ruta, max_canciones=3)
+    assert ids(siguiente.canciones()) == [2, 5, 6]
+    siguiente.terminar(2)
+    assert leer_checkpoint(ruta)["fallidas"] == []
+
+def test_fallida_reintentada_hasta_max_intentos(ruta):
+    r = recorrido(ruta, max_canciones=1)
+    list(r.canciones())
+    r.terminar(1, Exception("fallo 1"))
+
+    for intento in range(2, MAX_INTENTOS + 1):
+        r = recorrido(ruta, max_canciones=1)
+        assert ids(r.canciones()) == [1]
+        r.terminar(1, Exception(f"fallo {intento}"))
+        fallidas = leer_checkpoint(ruta)["fallidas"]
+        if intento < MAX_INTENTOS:
+            assert fallidas == [{"track": CATALOGO[0], "intentos": intento}]
+
+    # Tras MAX_INTENTOS se da por perdida y no se vuelve a pedir
+    assert leer_checkpoint(ruta)["fallidas"] == []
+    assert ids(recorrido(ruta, max_canciones=1).canciones()) == [2]
+
+def test_checkpoint_antiguo_sin_campos_nuevos(ruta):
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump({"ultima_fecha": "2024-01-10", "ids_ultima_fecha": [18, 19]}, f)
+    assert ids(recorrido(ruta).canciones()) == [20]
@@ -0,0 +1,43 @@
+import pytest
+
+# indiceBusqueda importa conexiones, que necesita las dependencias de requirements.txt
+for modulo in ("psycopg2", "azure.storage.blob", "dotenv"):
+    pytest.importorskip(modulo)
+
+from indiceBusqueda import normalizar, terminos, terminos_consulta
+
+@pytest.mark.parametrize("texto, esperado", [
+    ("Canción", "cancion"),
+    ("  ÁRBOL  Niño ", "arbol nino"),
+    ("AC/DC", "ac dc"),
+    ("rock_and-roll!!", "rock and roll"),
+    ("Beyoncé feat. Jay-Z", "beyonce feat jay z"),
+    ("Straße", "straße"),
+    ("¿?¡!", ""),
+])
+def test_normalizar(texto, esperado):
+    assert normalizar(texto) == esperado
+
+def test_terminos():
+    assert terminos("rock") == {"^r", "^ro", "roc", "ock"}
+    assert terminos("a") == {"^a"}
+    assert terminos("de la") == {"^d", "^de", "^l", "^la"}
+    assert terminos("") == set()
+
+def test_terminos_consulta():
+    assert terminos_consulta("r") == {"^r"}
+    assert terminos_consulta("ro") == {"^ro"}
+    assert terminos_consulta("rock") == {"roc", "ock"}
+    assert terminos_consulta("la rock") == {"^la", "roc", "ock"}
+
+@pytest.mark.parametrize("nombre, consulta", [
+    ("Bohemian Rhapsody", "bohem"),
+    ("Bohemian Rhapsody", "rhap"),
+    ("Bohemian Rhapsody", "b"),
+    ("Bohemian Rhapsody", "bohemian rh"),
+    ("Canción de la Tierra", "TIERRA"),
+    ("Canción de la Tierra", "cancion de"),
+])
+def test_una_consulta_que_esta_en_el_nombre_tiene_todos_sus_terminos(nombre, consulta):
+    # El índice solo encuentra la entrada si sus términos contienen todos los de la consulta
+    assert terminos_consulta(normalizar(consulta)) <= terminos(normalizar(nombre))
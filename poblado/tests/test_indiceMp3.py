@@ -0,0 +1,98 @@
+import pytest
+from indiceMp3 import AnalizadorMp3, leer_cabecera, leer_indice
+
+# Frame MPEG-1 capa III a 128 kbps y 44,1 kHz: 417 bytes (418 con relleno) y 1152 muestras
+CABECERA = b"\xff\xfb\x90\x00"
+CABECERA_CON_RELLENO = b"\xff\xfb\x92\x00"
+SEGUNDOS_FRAME = 1152 / 44100
+
+def frame(relleno=False):
+    cabecera = CABECERA_CON_RELLENO if relleno else CABECERA
+    return cabecera + bytes((418 if relleno else 417) - len(cabecera))
+
+def etiqueta_id3(tamano):
+    # El tamaño de ID3v2 va en cuatro bytes de 7 bits
+    sincronizado = bytes((tamano >> desplazamiento) & 0x7F for desplazamiento in (21, 14, 7, 0))
+    return b"ID3\x04\x00\x00" + sincronizado + b"\x00" * tamano
+
+def analizar(datos, tamano_trozo, intervalo=1.0):
+    analizador = AnalizadorMp3(intervalo)
+    for i in range(0, len(datos), tamano_trozo):
+        analizador.alimentar(datos[i:i + tamano_trozo])
+    return analizador
+
+def test_leer_cabecera():
+    assert leer_cabecera(frame(), 0) == (417, 1152, 44100)
+    assert leer_cabecera(frame(relleno=True), 0) == (418, 1152, 44100)
+    # MPEG-2 capa III a 64 kbps y 22,05 kHz
+    assert leer_cabecera(b"\xff\xf3\x80\x00", 0) == (208, 576, 22050)
+
+@pytest.mark.parametrize("cabecera", [
+    b"\x00\xfb\x90\x00",  # sin sincronización
+    b"\xff\xfb\x00\x00",  # bitrate libre
+    b"\xff\xfb\xf0\x00",  # bitrate no válido
+    b"\xff\xfb\x9c\x00",  # frecuencia reservada
+    b"\xff\xf9\x90\x00",  # capa reservada
+    b"\xff\xeb\x90\x00",  # versión reservada
+])
+def test_cabeceras_no_validas(cabecera):
+    assert leer_cabecera(cabecera, 0) is None
+
+@pytest.mark.parametrize("tamano_trozo", [1, 3, 417, 1000, 1 << 20])
+def test_duracion_e_indice_no_dependen_de_los_trozos(tamano_trozo):
+    frames = [frame(relleno=i % 3 == 0) for i in range(200)]
+    inicio_audio = len(etiqueta_id3(300))
+    datos = etiqueta_id3(300) + b"".join(frames)
+
+    analizador = analizar(datos, tamano_trozo)
+    assert analizador.frames == 200
+    assert analizador.segundos == pytest.approx(200 * SEGUNDOS_FRAME)
+    assert analizador.bytes_audio == sum(map(len, frames))
+
+    # Una entrada por segundo con el byte del frame que suena en ese instante
+    inicios = [inicio_audio + sum(map(len, frames[:i])) for i in range(200)]
+    esperado = []
+    for i in range(200):
+        while i * SEGUNDOS_FRAME >= len(esperado):
+            esperado.append(inicios[i])
+    assert analizador.indice == esperado
+    assert analizador.indice[0] == inicio_audio
+    assert len(analizador.indice) == 6
+
+def test_resincroniza_tras_basura():
+    basura = b"\xff\x00basura\xff\xfb"
+    datos = frame() * 3 + basura + frame() * 3
+    for tamano_trozo in (1, 5, len(datos)):
+        analizador = analizar(datos, tamano_trozo, intervalo=SEGUNDOS_FRAME)
+        assert analizador.frames == 6
+        assert analizador.indice == [0, 417, 834, 1251 + len(basura), 1668 + len(basura), 2085 + len(basura)]
+
+def test_falsa_sincronizacion_al_principio():
+    # Una cabecera válida que no va seguida de otro frame no se cuenta
+    datos = CABECERA + b"\x00" * 10 + frame() * 2
+    analizador = analizar(datos, 7, intervalo=SEGUNDOS_FRAME)
+    assert analizador.frames == 2
+    assert analizador.indice == [14, 14 + 417]
+
+def test_frame_incompleto_al_final():
+    analizador = analizar(frame() * 4 + frame()[:200], 64)
+    assert analizador.frames == 4
+
+def test_bitrate():
+    analizador = analizar(frame() * 100, 4096)
+    assert analizador.bitrate == pytest.approx(128000, rel=0.01)
+    assert AnalizadorMp3().bitrate == 0
+
+def test_serializar_y_leer():
+    analizador = analizar(etiqueta_id3(20) + frame() * 120, 500, intervalo=0.5)
+    intervalo, duracion, bitrate, entradas = leer_indice(analizador.serializar())
+    assert intervalo == 0.5
+    assert duracion == pytest.approx(analizador.segundos, abs=0.001)
+    assert bitrate == analizador.bitrate
+    assert entradas == analizador.indice
+
+def test_leer_indice_no_valido():
+    datos = bytearray(analizar(frame() * 10, 417).serializar())
+    datos[:4] = b"XXXX"
+    with pytest.raises(ValueError):
+        leer_indice(bytes(datos))
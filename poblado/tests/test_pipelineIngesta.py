@@ -0,0 +1,109 @@
+import threading
+import time
+from pipelineIngesta import ejecutar_pipeline
+
+def test_pasa_cada_elemento_por_todas_las_etapas():
+    etapas = [("doble", lambda x: x * 2, 3), ("mas_uno", lambda x: x + 1, 2)]
+    resultados, fallos = ejecutar_pipeline(range(100), etapas, capacidad=4)
+    assert sorted(resultados) == [x * 2 + 1 for x in range(100)]
+    assert fallos == []
+
+def test_sin_elementos():
+    assert ejecutar_pipeline([], [("nada", lambda x: x, 2)]) == ([], [])
+
+def test_un_fallo_no_detiene_al_resto():
+    def dividir(x):
+        return 10 // x
+
+    resultados, fallos = ejecutar_pipeline([0, 1, 2, 5], [("dividir", dividir, 2)])
+    assert sorted(resultados) == [2, 5, 10]
+    assert len(fallos) == 1
+    assert fallos[0]["elemento"] == 0
+    assert fallos[0]["etapa"] == "dividir"
+    assert "division" in fallos[0]["error"]
+
+def test_fallo_del_origen():
+    def elementos():
+        yield 1
+        raise ValueError("origen roto")
+
+    resultados, fallos = ejecutar_pipeline(elementos(), [("igual", lambda x: x, 1)])
+    assert resultados == [1]
+    assert fallos == [{"elemento": None, "etapa": "origen", "error": "origen roto"}]
+
+def test_lotes():
+    lotes = []
+    def sumar_lote(lote):
+        lotes.append(len(lote))
+        return [x + 100 for x in lote]
+
+    resultados, fallos = ejecutar_pipeline(range(25), [("lote", sumar_lote, 1, 10)], espera_lote=1)
+    assert sorted(resultados) == [x + 100 for x in range(25)]
+    assert fallos == []
+    assert max(lotes) <= 10
+    assert sum(lotes) == 25
+
+def test_fallo_de_un_lote_marca_todos_sus_elementos():
+    def lote_roto(lote):
+        if 3 in lote:
+            raise RuntimeError("lote con 3")
+        return lote
+
+    resultados, fallos = ejecutar_pipeline(range(6), [("lote", lote_roto, 1, 2)], espera_lote=1)
+    fallidos = sorted(fallo["elemento"] for fallo in fallos)
+    assert 3 in fallidos
+    assert sorted(resultados + fallidos) == list(range(6))
+    assert all(fallo["etapa"] == "lote" for fallo in fallos)
+
+def test_al_terminar_se_llama_una_vez_por_elemento():
+    terminados = {}
+    lock = threading.Lock()
+    def al_terminar(elemento, error):
+        with lock:
+            assert elemento not in terminados
+            terminados[elemento] = error
+
+    def falla_con_multiplos_de_7(x):
+        if x % 7 == 0:
+            raise ValueError(x)
+        return x
+
+    etapas = [("igual", lambda x: x, 2), ("filtro", falla_con_multiplos_de_7, 3)]
+    resultados, fallos = ejecutar_pipeline(range(50), etapas, al_terminar=al_terminar)
+    assert set(terminados) == set(range(50))
+    assert {x for x, error in terminados.items() if error is not None} == {x for x in range(50) if x % 7 == 0}
+    assert len(resultados) + len(fallos) == 50
+
+def test_medir():
+    medidas = []
+    lock = threading.Lock()
+    def medir(etapa, segundos, elementos):
+        with lock:
+            medidas.append((etapa, elementos))
+
+    etapas = [("uno", lambda x: x, 2), ("lote", lambda lote: lote, 1, 4)]
+    ejecutar_pipeline(range(10), etapas, espera_lote=1, medir=medir)
+    assert sum(n for etapa, n in medidas if etapa == "uno") == 10
+    assert sum(n for etapa, n in medidas if etapa == "lote") == 10
+
+def test_la_capacidad_limita_los_elementos_en_vuelo():
+    producidos = []
+    def elementos():
+        for x in range(40):
+            producidos.append(x)
+            yield x
+
+    maximo = []
+    procesados = []
+    def lenta(x):
+        # Elementos que ya ha sacado el productor y que esta etapa aún no ha terminado
+        maximo.append(len(producidos) - len(procesados))
+        time.sleep(0.005)
+        procesados.append(x)
+        return x
+
+    capacidad, trabajadores = 3, 1
+    resultados, _ = ejecutar_pipeline(elementos(), [("lenta", lenta, trabajadores)], capacidad=capacidad)
+    assert sorted(resultados) == list(range(40))
+    # La cola, el trabajador y el elemento que el productor tiene esperando para entrar
+    assert max(maximo) <= capacidad + trabajadores + 1
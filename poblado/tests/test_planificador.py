@@ -0,0 +1,130 @@
+import threading
+import pytest
+from planificador import CANCELADA, EJECUTADA, FALLIDA, SALTADA, Etapa, ejecutar_etapas, leer_estado
+
+def registrar(orden, nombre, valor=None):
+    def funcion(contexto):
+        orden.append(nombre)
+        return valor
+    return funcion
+
+def fallar(contexto):
+    raise RuntimeError("fallo")
+
+@pytest.fixture
+def ruta_estado(tmp_path):
+    return str(tmp_path / "estado.json")
+
+def test_respeta_las_dependencias(ruta_estado):
+    orden = []
+    etapas = [
+        Etapa("c", registrar(orden, "c"), depende_de=["a", "b"]),
+        Etapa("a", registrar(orden, "a")),
+        Etapa("b", registrar(orden, "b"), depende_de=["a"]),
+    ]
+    assert ejecutar_etapas(etapas, ruta_estado=ruta_estado) == {"a": EJECUTADA, "b": EJECUTADA, "c": EJECUTADA}
+    assert orden == ["a", "b", "c"]
+
+def test_las_independientes_van_en_paralelo(ruta_estado):
+    barrera = threading.Barrier(3, timeout=5)
+    etapas = [Etapa(nombre, lambda contexto: barrera.wait()) for nombre in "xyz"]
+    assert set(ejecutar_etapas(etapas, paralelo=3, ruta_estado=ruta_estado).values()) == {EJECUTADA}
+
+def test_el_resultado_pasa_a_las_siguientes_por_el_contexto(ruta_estado):
+    contexto = {"base": 2}
+    etapas = [
+        Etapa("doble", lambda c: c["base"] * 2),
+        Etapa("mas_uno", lambda c: c["doble"] + 1, depende_de=["doble"]),
+    ]
+    ejecutar_etapas(etapas, contexto=contexto, ruta_estado=ruta_estado)
+    assert contexto["mas_uno"] == 5
+
+def test_un_fallo_cancela_las_dependientes(ruta_estado):
+    orden = []
+    etapas = [
+        Etapa("a", fallar),
+        Etapa("b", registrar(orden, "b"), depende_de=["a"]),
+        Etapa("c", registrar(orden, "c"), depende_de=["b"]),
+        Etapa("libre", registrar(orden, "libre")),
+    ]
+    resultados = ejecutar_etapas(etapas, ruta_estado=ruta_estado)
+    assert resultados == {"a": FALLIDA, "b": CANCELADA, "c": CANCELADA, "libre": EJECUTADA}
+    assert orden == ["libre"]
+    # Solo se guarda el estado de las etapas correctas
+    assert set(leer_estado(ruta_estado)) == {"libre"}
+
+def test_dependencia_inexistente_o_ciclo(ruta_estado):
+    with pytest.raises(Exception, match="no existe"):
+        ejecutar_etapas([Etapa("a", fallar, depende_de=["b"])], ruta_estado=ruta_estado)
+    with pytest.raises(Exception, match="ciclo"):
+        ejecutar_etapas([Etapa("a", fallar, depende_de=["b"]), Etapa("b", fallar, depende_de=["a"])],
+                        ruta_estado=ruta_estado)
+    with pytest.raises(Exception, match="No existe"):
+        ejecutar_etapas([Etapa("a", fallar)], objetivos=["z"], ruta_estado=ruta_estado)
+
+def test_objetivos(ruta_estado):
+    orden = []
+    etapas = [
+        Etapa("a", registrar(orden, "a")),
+        Etapa("b", registrar(orden, "b"), depende_de=["a"]),
+        Etapa("otra", registrar(orden, "otra")),
+    ]
+    assert ejecutar_etapas(etapas, objetivos=["b"], ruta_estado=ruta_estado) == {"a": EJECUTADA, "b": EJECUTADA}
+    assert ejecutar_etapas(etapas, objetivos=["b"], con_dependencias=False, ruta_estado=ruta_estado) == {"b": EJECUTADA}
+    assert orden == ["a", "b", "b"]
+
+def test_se_salta_si_la_huella_no_cambia(ruta_estado):
+    orden = []
+    entradas = {"version": 1}
+    etapas = [
+        Etapa("con_huella", registrar(orden, "con_huella"), huella=lambda c: entradas),
+        Etapa("sin_huella", registrar(orden, "sin_huella")),
+    ]
+    assert ejecutar_etapas(etapas, ruta_estado=ruta_estado) == {"con_huella": EJECUTADA, "sin_huella": EJECUTADA}
+    assert ejecutar_etapas(etapas, ruta_estado=ruta_estado) == {"con_huella": SALTADA, "sin_huella": EJECUTADA}
+    assert ejecutar_etapas(etapas, forzar=True, ruta_estado=ruta_estado)["con_huella"] == EJECUTADA
+
+    entradas["version"] = 2
+    assert ejecutar_etapas(etapas, ruta_estado=ruta_estado)["con_huella"] == EJECUTADA
+    assert orden.count("con_huella") == 3
+    assert orden.count("sin_huella") == 4
+
+def test_una_saltada_no_cancela_las_siguientes(ruta_estado):
+    etapas = [
+        Etapa("a", lambda c: None, huella=lambda c: "fija"),
+        Etapa("b", lambda c: None, depende_de=["a"]),
+    ]
+    ejecutar_etapas(etapas, ruta_estado=ruta_estado)
+    assert ejecutar_etapas(etapas, ruta_estado=ruta_estado) == {"a": SALTADA, "b": EJECUTADA}
+
+def test_una_fallida_no_guarda_su_huella(ruta_estado):
+    veces = []
+    def a_veces_falla(contexto):
+        veces.append(1)
+        if len(veces) == 1:
+            raise RuntimeError("primera vez")
+
+    etapas = [Etapa("a", a_veces_falla, huella=lambda c: "fija")]
+    assert ejecutar_etapas(etapas, ruta_estado=ruta_estado) == {"a": FALLIDA}
+    assert ejecutar_etapas(etapas, ruta_estado=ruta_estado) == {"a": EJECUTADA}
+    assert ejecutar_etapas(etapas, ruta_estado=ruta_estado) == {"a": SALTADA}
+
+def test_fichero_de_estado(ruta_estado):
+    ejecutar_etapas([Etapa("a", lambda c: None, huella=lambda c: {"n": 1, "m": [1, 2]})], ruta_estado=ruta_estado)
+    estado = leer_estado(ruta_estado)
+    assert estado["a"]["huella"] == '{"m": [1, 2], "n": 1}'
+    assert estado["a"]["segundos"] >= 0
+    assert leer_estado(ruta_estado + ".no_existe") == {}
+
+def test_sin_fichero_de_estado_no_se_salta_nada():
+    orden = []
+    etapas = [Etapa("a", registrar(orden, "a"), huella=lambda c: "fija")]
+    ejecutar_etapas(etapas, ruta_estado=None)
+    ejecutar_etapas(etapas, ruta_estado=None)
+    assert orden == ["a", "a"]
+
+def test_medir(ruta_estado):
+    medidas = []
+    ejecutar_etapas([Etapa("a", lambda c: None)], ruta_estado=ruta_estado,
+                    medir=lambda etapa, segundos, elementos: medidas.append((etapa, elementos)))
+    assert medidas == [("a", 1)]
@@ -0,0 +1,143 @@
+import http.client
+import io
+import os
+import threading
+import pytest
+
+# almacenamiento importa conexiones, que necesita las dependencias de requirements.txt
+for modulo in ("psycopg2", "azure.storage.blob", "dotenv"):
+    pytest.importorskip(modulo)
+
+from almacenamiento import AlmacenLocal
+from servidorAlmacen import crear_servidor
+
+DATOS = b"0123456789"
+
+@pytest.fixture
+def raiz(tmp_path):
+    almacen = AlmacenLocal(str(tmp_path))
+    almacen.crear_contenedor("audios")
+    almacen.subir("audios", "cancion.mp3", DATOS)
+    return str(tmp_path)
+
+@pytest.fixture
+def pedir(raiz):
+    servidor = crear_servidor(raiz)
+    threading.Thread(target=servidor.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True).start()
+
+    def pedir(ruta, cabeceras=None, metodo="GET"):
+        conexion = http.client.HTTPConnection("127.0.0.1", servidor.server_address[1], timeout=5)
+        try:
+            conexion.request(metodo, ruta, headers=cabeceras or {})
+            respuesta = conexion.getresponse()
+            return respuesta.status, dict(respuesta.getheaders()), respuesta.read()
+        finally:
+            conexion.close()
+
+    yield pedir
+    servidor.shutdown()
+    servidor.server_close()
+
+RUTA = "/devstoreaccount1/audios/cancion.mp3"
+
+def test_blob_entero(pedir):
+    estado, cabeceras, cuerpo = pedir(RUTA)
+    assert estado == 200
+    assert cuerpo == DATOS
+    assert cabeceras["Content-Type"] == "audio/mpeg"
+    assert cabeceras["Accept-Ranges"] == "bytes"
+    assert "Content-Range" not in cabeceras
+
+def test_head(pedir):
+    estado, cabeceras, cuerpo = pedir(RUTA, metodo="HEAD")
+    assert estado == 200
+    assert cabeceras["Content-Length"] == str(len(DATOS))
+    assert cuerpo == b""
+
+@pytest.mark.parametrize("rango, cuerpo, content_range", [
+    ("bytes=2-5", b"2345", "bytes 2-5/10"),
+    ("bytes=7-", b"789", "bytes 7-9/10"),
+    ("bytes=0-0", b"0", "bytes 0-0/10"),
+    # Un final más allá del blob se recorta
+    ("bytes=5-100", b"56789", "bytes 5-9/10"),
+])
+def test_rangos_servidos(pedir, rango, cuerpo, content_range):
+    for cabecera in ("Range", "x-ms-range"):
+        estado, cabeceras, recibido = pedir(RUTA, {cabecera: rango})
+        assert estado == 206
+        assert recibido == cuerpo
+        assert cabeceras["Content-Range"] == content_range
+        assert cabeceras["Content-Length"] == str(len(cuerpo))
+
+def test_x_ms_range_tiene_preferencia(pedir):
+    estado, _, cuerpo = pedir(RUTA, {"Range": "bytes=0-1", "x-ms-range": "bytes=8-9"})
+    assert estado == 206
+    assert cuerpo == b"89"
+
+@pytest.mark.parametrize("rango", [
+    "bytes=-3",          # sufijo
+    "bytes=0-1,4-5",     # varios rangos
+    "items=0-3",         # otra unidad
+    "bytes=5-3",         # final antes del inicio
+    "bytes=a-b",
+    "",
+])
+def test_rangos_ignorados(pedir, rango):
+    estado, cabeceras, cuerpo = pedir(RUTA, {"Range": rango})
+    assert estado == 200
+    assert cuerpo == DATOS
+    assert "Content-Range" not in cabeceras
+
+@pytest.mark.parametrize("rango", ["bytes=10-", "bytes=10-20", "bytes=50-60"])
+def test_rango_que_empieza_despues_del_final(pedir, rango):
+    estado, cabeceras, _ = pedir(RUTA, {"Range": rango})
+    assert estado == 416
+    assert cabeceras["Content-Range"] == "bytes */10"
+    assert cabeceras["x-ms-error-code"] == "InvalidRange"
+
+@pytest.mark.parametrize("ruta, estado", [
+    ("/devstoreaccount1/audios/no_existe.mp3", 404),
+    ("/devstoreaccount1/no_existe/cancion.mp3", 404),
+    ("/devstoreaccount1/audios/", 400),
+    ("/devstoreaccount1/.temporales/x", 400),
+    ("/devstoreaccount1/audios/..%2F..%2Fsecreto", 400),
+])
+def test_errores(pedir, ruta, estado):
+    assert pedir(ruta)[0] == estado
+
+@pytest.mark.parametrize("contenedor, blob", [
+    ("audios", "../otro/cancion.mp3"),
+    ("audios", "a/../../fuera"),
+    ("audios", "/etc/passwd"),
+    ("audios", ".."),
+    (".temporales", "subiendo-x"),
+    (".ocultos", "x"),
+    ("a/b", "x"),
+    ("", "x"),
+])
+def test_nombres_que_se_salen_del_contenedor(raiz, contenedor, blob):
+    with pytest.raises(Exception, match="no válido"):
+        AlmacenLocal(raiz).ruta(contenedor, blob)
+
+def test_nombres_validos(raiz):
+    almacen = AlmacenLocal(raiz)
+    assert almacen.ruta("audios", "dir/x.mp3") == os.path.join(raiz, "audios", "dir", "x.mp3")
+    assert almacen.ruta("audios", "a/../x.mp3") == os.path.join(raiz, "audios", "x.mp3")
+
+def test_subir_sin_dejar_temporales_en_el_contenedor(raiz):
+    almacen = AlmacenLocal(raiz)
+    almacen.subir("audios", "grande.bin", io.BytesIO(b"x" * 1000), tamano_bloque=64)
+    assert bytes(almacen.leer("audios", "grande.bin")) == b"x" * 1000
+    assert sorted(os.listdir(os.path.join(raiz, "audios"))) == ["cancion.mp3", "grande.bin"]
+    assert os.listdir(os.path.join(raiz, ".temporales")) == []
+
+def test_subida_fallida_no_toca_el_blob(raiz):
+    class Roto(io.BytesIO):
+        def read(self, *args):
+            raise OSError("lectura cortada")
+
+    almacen = AlmacenLocal(raiz)
+    with pytest.raises(OSError):
+        almacen.subir("audios", "cancion.mp3", Roto())
+    assert bytes(almacen.leer("audios", "cancion.mp3")) == DATOS
+    assert os.listdir(os.path.join(raiz, ".temporales")) == []